@@ -13,21 +13,52 @@ LLMのコンテキストとして提供します。
 from __future__ import annotations
 
 import ast
+import asyncio
+import functools
 import hashlib
+import json
+import mmap
 import os
 import re
+import sqlite3
 from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
+from itertools import repeat
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+
+try:
+    import xxhash  # 任意: 非暗号学的な高速ハッシュ（チャンクID生成用）
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3  # 任意: SIMD 実装の高速ハッシュ（チャンクID生成用）
+except ImportError:
+    blake3 = None
+
+try:
+    import faiss  # 任意: 大規模インデックス向けの SIMD/BLAS 最適化内積検索
+except ImportError:
+    faiss = None
+
+try:
+    import simsimd  # 任意: SIMD 最適化されたコサイン距離（int8 対応）
+except ImportError:
+    simsimd = None
+
 
 # =============================================================================
 # データ構造
 # =============================================================================
 
 
-@dataclass
+@dataclass(slots=True)
 class CodeChunk:
     """コードのチャンク（断片）"""
 
@@ -39,7 +70,9 @@ class CodeChunk:
     chunk_type: str  # function, class, module, block
     name: str = ""  # 関数名、クラス名など
     metadata: dict = field(default_factory=dict)
-    embedding: list[float] | None = None
+    # 検索用のベクトルは CodeIndex の行列に保持する。ここは事前計算済みの
+    # 埋め込みを CodeIndex.add に渡すための入力としてのみ使う
+    embedding: np.ndarray | None = field(default=None, repr=False, compare=False)
 
     @property
     def location(self) -> str:
@@ -55,7 +88,7 @@ class CodeChunk:
 """
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """検索結果"""
 
@@ -69,6 +102,21 @@ class SearchResult:
 # =============================================================================
 
 
+def _chunk_id(key: str) -> str:
+    """
+    チャンクの決定的なIDを生成
+
+    IDに暗号学的な強度は不要なので xxh3_64 を優先し、
+    なければ blake3、最後に標準ライブラリの blake2b を使う。
+    """
+    data = key.encode()
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(data)
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()[:16]
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
 class ChunkingStrategy(ABC):
     """チャンキング戦略の抽象基底クラス"""
 
@@ -77,6 +125,30 @@ class ChunkingStrategy(ABC):
         pass
 
 
+class _SourceLines:
+    """
+    ソースの行オフセット表
+
+    改行位置を一度だけ求めておき、任意の行範囲を元のバイト列から1回の
+    スライスで取り出す（行リストへの分割と "\n".join を繰り返さない）。
+    UTF-8 では改行バイトがマルチバイト文字の途中に現れないため、
+    行境界で安全に切れる。
+    """
+
+    def __init__(self, content: str):
+        self.data = content.encode()
+        newlines = np.flatnonzero(np.frombuffer(self.data, dtype=np.uint8) == 0x0A)
+        self.starts: list[int] = [0, *(newlines + 1).tolist()]
+        self.ends: list[int] = [*newlines.tolist(), len(self.data)]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def slice(self, first: int, last: int) -> str:
+        """first 行目から last 行目まで（1始まり、両端を含む）のテキスト"""
+        return self.data[self.starts[first - 1] : self.ends[last - 1]].decode()
+
+
 class FixedSizeChunker(ChunkingStrategy):
     """固定サイズでチャンク化"""
 
@@ -85,16 +157,15 @@ class FixedSizeChunker(ChunkingStrategy):
         self.overlap = overlap
 
     def chunk(self, content: str, file_path: str) -> list[CodeChunk]:
-        lines = content.split("\n")
+        lines = _SourceLines(content)
+        num_lines = len(lines)
         chunks = []
 
-        for i in range(0, len(lines), self.chunk_size - self.overlap):
-            chunk_lines = lines[i : i + self.chunk_size]
-            chunk_content = "\n".join(chunk_lines)
+        for i in range(0, num_lines, self.chunk_size - self.overlap):
+            last = min(i + self.chunk_size, num_lines) - 1
+            chunk_content = lines.slice(i + 1, last + 1)
 
-            chunk_id = hashlib.md5(
-                f"{file_path}:{i}:{chunk_content}".encode()
-            ).hexdigest()[:12]
+            chunk_id = _chunk_id(f"{file_path}:{i}:{chunk_content}")
 
             chunks.append(
                 CodeChunk(
@@ -102,7 +173,7 @@ class FixedSizeChunker(ChunkingStrategy):
                     content=chunk_content,
                     file_path=file_path,
                     start_line=i + 1,
-                    end_line=i + len(chunk_lines),
+                    end_line=last + 1,
                     chunk_type="block",
                 )
             )
@@ -110,42 +181,150 @@ class FixedSizeChunker(ChunkingStrategy):
         return chunks
 
 
+class ParseCache:
+    """
+    ファイル内容の SHA-256 をキーにしたチャンク化結果のキャッシュ（SQLite）
+
+    変更のないファイルの再インデックス化では ast.parse とAST走査を省略する。
+    キーにはスキーマバージョンとチャンカーの設定も含めるため、CodeChunk の
+    フィールドや min_lines/max_lines を変えると古いエントリは参照されなくなる。
+
+    接続はプロセスごとに遅延して開くので、ProcessPoolExecutor の
+    ワーカーにもチャンカーごとそのまま渡せる。
+
+    チャンクは JSON で保存する（pickle と違い、読み込んでもコードは実行されない）。
+    """
+
+    SCHEMA_VERSION = 3
+    DEFAULT_PATH = Path.home() / ".coderag" / "parse-cache.sqlite"
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else self.DEFAULT_PATH
+        self._conn: sqlite3.Connection | None = None
+
+    def key(self, content: str, file_path: str, *settings: Any) -> bytes:
+        """キャッシュキー（スキーマ・設定・パス・内容の SHA-256）"""
+        header = f"{self.SCHEMA_VERSION}:{settings}:{file_path}\0"
+        return hashlib.sha256((header + content).encode()).digest()
+
+    def get(self, key: bytes) -> list[CodeChunk] | None:
+        row = self._connection().execute(
+            "SELECT chunks FROM parse_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return [CodeChunk(**fields) for fields in json.loads(row[0])]
+
+    def put(self, key: bytes, chunks: list[CodeChunk]) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, chunks) VALUES (?, ?)",
+                (key, json.dumps([self._fields(chunk) for chunk in chunks])),
+            )
+
+    @staticmethod
+    def _fields(chunk: CodeChunk) -> dict:
+        # 埋め込みはチャンク化の結果ではないので保存しない
+        return {
+            "id": chunk.id,
+            "content": chunk.content,
+            "file_path": chunk.file_path,
+            "start_line": chunk.start_line,
+            "end_line": chunk.end_line,
+            "chunk_type": chunk.chunk_type,
+            "name": chunk.name,
+            "metadata": chunk.metadata,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 並列ワーカーからの同時書き込みに備えて WAL モードで待ち合わせる
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS parse_cache (key BLOB PRIMARY KEY, chunks BLOB)"
+            )
+        return self._conn
+
+    def __getstate__(self) -> dict:
+        # 接続はプロセス間で共有できないため、パスだけを渡す
+        return {"path": self.path, "_conn": None}
+
+
+class _ChunkVisitor(ast.NodeVisitor):
+    """
+    関数・クラス定義だけを訪問してチャンクを集める
+
+    チャンクにできた定義の本体には降りない（内側の関数やメソッドを
+    重複してチャンク化しない）。サイズ制限で外れた定義だけ中に降りて、
+    内側の定義をチャンク候補にする。
+    """
+
+    def __init__(self, chunker: ASTChunker, lines: _SourceLines, file_path: str):
+        self.chunker = chunker
+        self.lines = lines
+        self.file_path = file_path
+        self.chunks: list[CodeChunk] = []
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        self._emit_or_descend(node, "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._emit_or_descend(node, "class")
+
+    def _emit_or_descend(self, node: ast.AST, chunk_type: str) -> None:
+        chunk = self.chunker._extract_chunk(
+            node, self.lines, self.file_path, chunk_type, node.name
+        )
+        if chunk:
+            self.chunks.append(chunk)
+        else:
+            self.generic_visit(node)
+
+
 class ASTChunker(ChunkingStrategy):
     """AST（抽象構文木）ベースでチャンク化（Python用）"""
 
-    def __init__(self, min_lines: int = 5, max_lines: int = 100):
+    def __init__(
+        self,
+        min_lines: int = 5,
+        max_lines: int = 100,
+        cache: ParseCache | None = None,
+    ):
         self.min_lines = min_lines
         self.max_lines = max_lines
+        self.cache = cache
 
     def chunk(self, content: str, file_path: str) -> list[CodeChunk]:
-        chunks = []
+        if self.cache is None:
+            return self._chunk_uncached(content, file_path)
+
+        key = self.cache.key(content, file_path, self.min_lines, self.max_lines)
+        chunks = self.cache.get(key)
+        if chunks is None:
+            chunks = self._chunk_uncached(content, file_path)
+            self.cache.put(key, chunks)
+        return chunks
 
+    def _chunk_uncached(self, content: str, file_path: str) -> list[CodeChunk]:
         try:
             tree = ast.parse(content)
         except SyntaxError:
             # パース失敗時は固定サイズにフォールバック
             return FixedSizeChunker().chunk(content, file_path)
 
-        lines = content.split("\n")
+        lines = _SourceLines(content)
 
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                chunk = self._extract_chunk(
-                    node, lines, file_path, "function", node.name
-                )
-                if chunk:
-                    chunks.append(chunk)
-
-            elif isinstance(node, ast.ClassDef):
-                chunk = self._extract_chunk(
-                    node, lines, file_path, "class", node.name
-                )
-                if chunk:
-                    chunks.append(chunk)
+        visitor = _ChunkVisitor(self, lines, file_path)
+        visitor.visit(tree)
+        chunks = visitor.chunks
 
         # チャンクがない場合はモジュール全体を1チャンクに
         if not chunks:
-            chunk_id = hashlib.md5(f"{file_path}:module".encode()).hexdigest()[:12]
+            chunk_id = _chunk_id(f"{file_path}:module")
             chunks.append(
                 CodeChunk(
                     id=chunk_id,
@@ -162,7 +341,7 @@ class ASTChunker(ChunkingStrategy):
     def _extract_chunk(
         self,
         node: ast.AST,
-        lines: list[str],
+        lines: _SourceLines,
         file_path: str,
         chunk_type: str,
         name: str,
@@ -176,10 +355,8 @@ class ASTChunker(ChunkingStrategy):
         if num_lines < self.min_lines or num_lines > self.max_lines:
             return None
 
-        content = "\n".join(lines[start_line - 1 : end_line])
-        chunk_id = hashlib.md5(
-            f"{file_path}:{chunk_type}:{name}".encode()
-        ).hexdigest()[:12]
+        content = lines.slice(start_line, end_line)
+        chunk_id = _chunk_id(f"{file_path}:{chunk_type}:{name}")
 
         return CodeChunk(
             id=chunk_id,
@@ -201,11 +378,12 @@ class EmbeddingProvider(ABC):
     """埋め込みベクトル生成の抽象基底クラス"""
 
     @abstractmethod
-    def embed(self, text: str) -> list[float]:
+    def embed(self, text: str) -> np.ndarray:
         pass
 
     @abstractmethod
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """(len(texts), D) の埋め込み行列を返す"""
         pass
 
 
@@ -215,22 +393,162 @@ class DummyEmbeddingProvider(EmbeddingProvider):
     def __init__(self, dimension: int = 128):
         self.dimension = dimension
 
-    def embed(self, text: str) -> list[float]:
-        """テキストのハッシュに基づく疑似埋め込み"""
-        hash_bytes = hashlib.sha256(text.encode()).digest()
-        embedding = []
-        for i in range(0, min(self.dimension * 4, len(hash_bytes)), 4):
-            value = int.from_bytes(hash_bytes[i : i + 4], "big")
-            embedding.append((value / (2**32)) * 2 - 1)
+    def embed(self, text: str) -> np.ndarray:
+        """テキストのハッシュに基づく疑似埋め込み（embed_batch と同じベクトル化処理）"""
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """全テキストのハッシュを1つのバッファに連結し、一括で (N, D) 行列に変換"""
+        digest_size = hashlib.sha256().digest_size
+        buffer = b"".join(hashlib.sha256(text.encode()).digest() for text in texts)
+        values = np.frombuffer(buffer, dtype=">u4").reshape(len(texts), digest_size // 4)
+
+        # ハッシュで埋まらない次元はゼロのまま（パディング）
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        width = min(self.dimension, values.shape[1])
+        embeddings[:, :width] = values[:, :width] / (2**32) * 2 - 1
+        return embeddings
 
-        # 次元が足りない場合はパディング
-        while len(embedding) < self.dimension:
-            embedding.append(0.0)
 
-        return embedding[: self.dimension]
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """
+    Gemini の埋め込み API を使うプロバイダー
 
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        return [self.embed(text) for text in texts]
+    embed_batch はテキストを batch_size 件ずつ1リクエストにまとめ、
+    複数のリクエストを同時実行数 concurrency までで並行に送る。
+    結果は事前確保した (len(texts), D) 行列の該当行に直接書き込む。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str = "text-embedding-004",
+        batch_size: int = 64,
+        concurrency: int = 8,
+    ):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    def embed(self, text: str) -> np.ndarray:
+        response = self.client.models.embed_content(model=self.model, contents=text)
+        return np.asarray(response.embeddings[0].values, dtype=np.float32)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """同期版（イベントループ内からは aembed_batch を使う）"""
+        return asyncio.run(self.aembed_batch(texts))
+
+    async def aembed_batch(self, texts: list[str]) -> np.ndarray:
+        """テキストをバッチに分割し、並行に埋め込みを生成"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # 次元は最初の応答で確定するため、行列はそこで一度だけ確保する
+        out: np.ndarray | None = None
+
+        async def embed_slice(start: int) -> None:
+            nonlocal out
+            async with semaphore:
+                response = await self.client.aio.models.embed_content(
+                    model=self.model,
+                    contents=texts[start : start + self.batch_size],
+                )
+            for offset, embedding in enumerate(response.embeddings):
+                if out is None:
+                    out = np.empty((len(texts), len(embedding.values)), dtype=np.float32)
+                out[start + offset] = embedding.values
+
+        await asyncio.gather(
+            *(embed_slice(start) for start in range(0, len(texts), self.batch_size))
+        )
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+
+# =============================================================================
+# 埋め込みキャッシュ
+# =============================================================================
+
+
+class EmbeddingCache:
+    """
+    チャンク本文の SHA-256 をキーにした永続埋め込みキャッシュ（SQLite）
+
+    変更のないリポジトリを再インデックス化しても埋め込みAPIを呼ばずに済む。
+    キャッシュファイルはモデルごとに分け、記録されたモデルIDまたは次元が
+    変わった場合は全エントリを破棄する。
+    """
+
+    DEFAULT_DIR = Path.home() / ".coderag" / "embed-cache"
+
+    def __init__(self, model_id: str, path: str | Path | None = None):
+        """
+        Args:
+            model_id: 埋め込みモデルの識別子（異なるモデルの結果を混ぜないため）
+            path: キャッシュファイル（省略時は ~/.coderag/embed-cache/{model_id}.sqlite）
+        """
+        self.model_id = model_id
+        if path is None:
+            path = self.DEFAULT_DIR / (re.sub(r"[^\w.-]", "_", model_id) + ".sqlite")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS embeddings (sha256 BLOB PRIMARY KEY, vec BLOB);
+            """
+        )
+        if self._get_meta("model_id") != model_id:
+            self._reset(model_id=model_id)
+        dim = self._get_meta("dim")
+        self.dim: int | None = int(dim) if dim is not None else None
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        """キャッシュキー（本文の SHA-256 ダイジェスト）"""
+        return hashlib.sha256(text.encode()).digest()
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        """キャッシュにあるキーの埋め込みを返す（ないキーは含まれない）"""
+        if not keys or self.dim is None:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT sha256, vec FROM embeddings WHERE sha256 IN ({placeholders})",
+            keys,
+        )
+        return {key: np.frombuffer(vec, dtype=np.float32) for key, vec in rows}
+
+    def put_many(self, keys: list[bytes], embeddings: np.ndarray) -> None:
+        """埋め込みをまとめて保存（1トランザクション）"""
+        if not keys:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dim != vectors.shape[1]:
+            # 次元が変わった（モデルの設定変更など）場合は古いエントリを破棄
+            self._reset(model_id=self.model_id, dim=vectors.shape[1])
+            self.dim = vectors.shape[1]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (sha256, vec) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in zip(keys, vectors)],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _reset(self, model_id: str, dim: int | None = None) -> None:
+        """全エントリを破棄し、メタ情報を書き直す"""
+        with self._conn:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("INSERT INTO meta VALUES ('model_id', ?)", (model_id,))
+            if dim is not None:
+                self._conn.execute("INSERT INTO meta VALUES ('dim', ?)", (str(dim),))
 
 
 # =============================================================================
@@ -238,46 +556,202 @@ class DummyEmbeddingProvider(EmbeddingProvider):
 # =============================================================================
 
 
-class SimpleVectorStore:
-    """シンプルなベクトルストア（教育用）"""
+class CodeIndex:
+    """
+    コードチャンクのベクトルインデックス（教育用）
 
-    def __init__(self):
-        self.chunks: list[CodeChunk] = []
+    埋め込みはチャンクごとに持たせず（AoS）、全チャンク分を1つの
+    (N, D) 行列にまとめて保持する（SoA）。チャンクのメタデータは
+    同じ行番号で chunks に並ぶ。
+
+    各行は挿入時に正規化し、行ごとのスケールで int8 に量子化する
+    （float32 の1/4のメモリ）。検索は int8 の行列ベクトル積を整数で
+    累積し、最後に行スケールとクエリのスケールを掛けて戻す。
+
+    faiss がインストールされていれば正規化済みの float32 ベクトルを
+    IndexFlatIP にも追加し、件数が FAISS_MIN_ITEMS 以上のときはそちらで
+    厳密な内積検索を行う（内積 = コサイン類似度）。さらに規模が大きい場合は
+    同じAPIの IndexHNSWFlat / IndexIVFPQ に差し替えられる。
+
+    環境変数 CODERAG_USE_GPU=1 かつ faiss-gpu が使える場合、件数が
+    GPU_MIN_ITEMS 以上になった時点で IndexFlatIP を GPU に複製し
+    （格納は float16）、以降の検索と追加は GPU 側で行う。
+    """
+
+    INITIAL_CAPACITY = 64
+    QUANT_LEVELS = 127.0  # int8 の正側の最大値
+    FAISS_MIN_ITEMS = 10_000  # これ未満は int8 の全件走査で十分速い
+    GPU_MIN_ITEMS = 100_000  # これ未満では転送コストに見合わない
 
-    def add(self, chunk: CodeChunk) -> None:
-        self.chunks.append(chunk)
+    def __init__(self, use_faiss: bool = True, use_gpu: bool | None = None):
+        """
+        Args:
+            use_faiss: faiss が利用可能な場合に IndexFlatIP を併用するか
+            use_gpu: 大規模時に faiss-gpu を使うか（None なら CODERAG_USE_GPU=1 で有効）
+        """
+        if use_gpu is None:
+            use_gpu = os.environ.get("CODERAG_USE_GPU") == "1"
+        self.chunks: list[CodeChunk] = []
+        self.type_counts: Counter[str] = Counter()  # chunk_type ごとの件数（追加時に更新）
+        self.use_faiss = use_faiss and faiss is not None
+        self._matrix: np.ndarray | None = None  # (capacity, dim) int8
+        self._scales: np.ndarray | None = None  # (capacity,) float32
+        self._faiss_index = None  # 次元が確定する最初の add で初期化
+        self.use_gpu = (
+            use_gpu and self.use_faiss and hasattr(faiss, "StandardGpuResources")
+        )
+        self._gpu_resources = None
+        self._gpu_index = None  # GPU_MIN_ITEMS に達した最初の検索で複製
 
-    def add_batch(self, chunks: list[CodeChunk]) -> None:
+    @property
+    def embeddings(self) -> np.ndarray:
+        """格納済みの正規化埋め込み（N, D）を float32 に戻したもの"""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        n = len(self.chunks)
+        return self._matrix[:n].astype(np.float32) * self._scales[:n, np.newaxis]
+
+    def add(self, chunk: CodeChunk, embedding: np.ndarray | None = None) -> None:
+        """チャンクを追加（embedding 省略時は chunk.embedding を使う）"""
+        self.add_batch([chunk], None if embedding is None else [embedding])
+
+    def add_batch(
+        self, chunks: list[CodeChunk], embeddings: np.ndarray | None = None
+    ) -> None:
+        """複数のチャンクをまとめて追加（正規化・量子化・コピーを1回で行う）"""
+        if not chunks:
+            return
+
+        if embeddings is None:
+            if any(chunk.embedding is None for chunk in chunks):
+                raise ValueError("chunks without embedding require explicit embeddings")
+            embeddings = [chunk.embedding for chunk in chunks]
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(chunks):
+            raise ValueError("embeddings must be a (len(chunks), dim) array")
+
+        start = len(self.chunks)
+        stop = start + len(chunks)
+        self._reserve(vectors.shape[1], stop)
+        normalized = self._normalize(vectors)
+        self._matrix[start:stop], self._scales[start:stop] = self._quantize(normalized)
+        if self.use_faiss:
+            if self._faiss_index is None:
+                self._faiss_index = faiss.IndexFlatIP(vectors.shape[1])
+            normalized = np.ascontiguousarray(normalized, dtype=np.float32)
+            self._faiss_index.add(normalized)
+            if self._gpu_index is not None:
+                self._gpu_index.add(normalized)
         self.chunks.extend(chunks)
+        self.type_counts.update(chunk.chunk_type for chunk in chunks)
+
+    def truncate(self, size: int) -> None:
+        """先頭の size 件だけを残し、それ以降に追加したチャンクを取り除く"""
+        removed = self.chunks[size:]
+        if not removed:
+            return
+        del self.chunks[size:]
+        self.type_counts.subtract(chunk.chunk_type for chunk in removed)
+        self.type_counts += Counter()  # 0 件になった種類を消す
+        # int8 行列は len(self.chunks) 行目以降を使わないのでそのままでよい
+        if self._faiss_index is not None:
+            self._faiss_index.remove_ids(faiss.IDSelectorRange(size, self._faiss_index.ntotal))
+        # GPU 側の複製は削除に対応しないので、次の検索で複製し直す
+        self._gpu_index = None
+        self._gpu_resources = None
+
+    def _reserve(self, dim: int, size: int) -> None:
+        """size 行を格納できるよう行列を確保し、足りなければ容量を倍々に拡張する"""
+        if self._matrix is None:
+            self._matrix = np.empty((self.INITIAL_CAPACITY, dim), dtype=np.int8)
+            self._scales = np.empty(self.INITIAL_CAPACITY, dtype=np.float32)
+        elif dim != self._matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension mismatch: expected {self._matrix.shape[1]}, got {dim}"
+            )
+
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        n = len(self.chunks)
+        matrix = np.empty((capacity, dim), dtype=np.int8)
+        matrix[:n] = self._matrix[:n]
+        scales = np.empty(capacity, dtype=np.float32)
+        scales[:n] = self._scales[:n]
+        self._matrix, self._scales = matrix, scales
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """単位ベクトルに正規化（コサイン類似度を内積だけで計算できるようにする）"""
+        return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+    @classmethod
+    def _quantize(cls, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """行ごとのスケール（最大絶対値 / 127）で int8 に量子化"""
+        scales = np.abs(vectors).max(axis=-1) / cls.QUANT_LEVELS
+        scales = np.where(scales > 0, scales, 1.0)  # ゼロベクトルは全要素0のまま
+        quantized = np.rint(vectors / scales[..., np.newaxis]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _faiss_search_index(self, n: int):
+        """検索に使う faiss インデックス（GPU を使う規模なら GPU 側の複製）"""
+        if not self.use_gpu or n < self.GPU_MIN_ITEMS:
+            return self._faiss_index
+        if self._gpu_index is None:
+            # 全件を一度だけ転送し、以降の add は GPU 側にも直接追加する
+            self._gpu_resources = faiss.StandardGpuResources()
+            options = faiss.GpuClonerOptions()
+            options.useFloat16 = True  # 格納を float16 にしてメモリと帯域を半減
+            self._gpu_index = faiss.index_cpu_to_gpu(
+                self._gpu_resources, 0, self._faiss_index, options
+            )
+        return self._gpu_index
 
     def search(
-        self, query_embedding: list[float], k: int = 10
+        self, query_embedding: np.ndarray, k: int = 10
     ) -> list[tuple[CodeChunk, float]]:
-        """コサイン類似度で検索"""
-        if not self.chunks:
+        """コサイン類似度で検索（全件を1回の行列ベクトル積で計算）"""
+        n = len(self.chunks)
+        if n == 0 or k <= 0:
             return []
 
-        results = []
-        for chunk in self.chunks:
-            if chunk.embedding:
-                similarity = self._cosine_similarity(query_embedding, chunk.embedding)
-                results.append((chunk, similarity))
-
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:k]
-
-    def _cosine_similarity(self, a: list[float], b: list[float]) -> float:
-        if len(a) != len(b):
-            return 0.0
-        dot_product = sum(x * y for x, y in zip(a, b))
-        norm_a = sum(x * x for x in a) ** 0.5
-        norm_b = sum(x * x for x in b) ** 0.5
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return dot_product / (norm_a * norm_b)
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        if query.size != self._matrix.shape[1]:
+            return []
+
+        k = min(k, n)
+        if self._faiss_index is not None and n >= self.FAISS_MIN_ITEMS:
+            query = np.ascontiguousarray(self._normalize(query)[np.newaxis], dtype=np.float32)
+            scores, labels = self._faiss_search_index(n).search(query, k)
+            return [(self.chunks[i], float(score)) for i, score in zip(labels[0], scores[0])]
+
+        query, query_scale = self._quantize(self._normalize(query))
+        if simsimd is not None:
+            # int8 専用の SIMD カーネルでコサイン距離を一括計算
+            # （コサインはスケールに依存しないため行スケールは不要）
+            distances = simsimd.cdist(self._matrix[:n], query[np.newaxis], metric="cosine")
+            scores = 1.0 - np.asarray(distances, dtype=np.float32).ravel()
+        else:
+            # 整数で累積し、最後に行スケールとクエリのスケールを掛けて戻す
+            dots = self._matrix[:n] @ query.astype(np.int32)
+            scores = dots.astype(np.float32) * (self._scales[:n] * query_scale)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.chunks[i], float(scores[i])) for i in top]
 
     def clear(self) -> None:
         self.chunks = []
+        self.type_counts.clear()
+        self._matrix = None
+        self._scales = None
+        self._faiss_index = None
+        self._gpu_index = None
 
 
 # =============================================================================
@@ -285,6 +759,68 @@ class SimpleVectorStore:
 # =============================================================================
 
 
+def _scan_directory(path: str) -> tuple[list[str], list[str]]:
+    """ディレクトリ直下のサブディレクトリ名とファイル名を返す（読めなければ空）"""
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return dirs, files
+
+
+# これ以上のサイズのファイルは mmap 経由で読み込む
+MMAP_MIN_BYTES = 1 << 20
+
+
+def _read_source(file_path: str) -> str:
+    """
+    ソースファイルを UTF-8 で読み込む
+
+    大きなファイルは mmap したページから直接デコードし、ファイル全体の
+    bytes コピーを作らない。改行はテキストモードの open と同じく \\n に揃える。
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                content = str(mm, "utf-8")
+        else:
+            content = f.read().decode("utf-8")
+
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+
+def _parse_file_to_chunks(
+    file_path: str, chunking_strategy: ChunkingStrategy
+) -> tuple[list[CodeChunk], str | None]:
+    """
+    ファイルを読み込んでチャンク化（ワーカープロセスで実行される）
+
+    読み込めないファイルは空リストを返す。チャンク化中の例外は
+    プロセス境界を越えて送れるよう、メッセージ文字列として返す。
+    """
+    try:
+        content = _read_source(file_path)
+    except (OSError, UnicodeDecodeError):
+        return [], None
+
+    try:
+        return chunking_strategy.chunk(content, file_path), None
+    except Exception as e:
+        return [], str(e)
+
+
 class CodeRAG:
     """
     コードベース用 RAG
@@ -296,38 +832,47 @@ class CodeRAG:
         context = rag.build_context(results)
     """
 
+    # これ未満のファイル数ではプロセス起動コストの方が大きいため並列化しない
+    PARALLEL_MIN_FILES = 8
+    # 1回の embed_batch に渡すチャンク数（ファイルをまたいでまとめる）
+    EMBED_BATCH_SIZE = 256
+    # ディレクトリ走査のスレッド数（I/O 待ちが主なので CPU 数より多くする）
+    SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+    # クエリ埋め込み・再ランキング結果のキャッシュ上限
+    QUERY_CACHE_SIZE = 1024
+    # 再ランキングに渡す候補数とプレビュー文字数の上限（精度は頭打ちでトークンだけ増えるため）
+    RERANK_MAX_CANDIDATES = 20
+    RERANK_PREVIEW_CHARS = 120
+
     def __init__(
         self,
         embedding_provider: EmbeddingProvider | None = None,
         chunking_strategy: ChunkingStrategy | None = None,
+        embedding_cache: EmbeddingCache | None = None,
     ):
         self.embedding_provider = embedding_provider or DummyEmbeddingProvider()
         self.chunking_strategy = chunking_strategy or ASTChunker()
-        self.vector_store = SimpleVectorStore()
+        self.embedding_cache = embedding_cache
+        self.vector_store = CodeIndex()
         self.indexed_files: set[str] = set()
+        # 同じクエリの繰り返しでは埋め込みも再ランキングもやり直さない
+        self._embed_query = functools.lru_cache(maxsize=self.QUERY_CACHE_SIZE)(
+            self.embedding_provider.embed
+        )
+        # (query, 候補チャンクID列, k) -> LLM が返したインデックス列（LRU）
+        self._rerank_cache: OrderedDict[tuple, tuple[int, ...]] = OrderedDict()
 
     def index_file(self, file_path: str) -> int:
         """ファイルをインデックス化"""
         if file_path in self.indexed_files:
             return 0
 
-        try:
-            with open(file_path, encoding="utf-8") as f:
-                content = f.read()
-        except (OSError, UnicodeDecodeError):
-            return 0
-
-        # チャンク化
-        chunks = self.chunking_strategy.chunk(content, file_path)
+        chunks, error = _parse_file_to_chunks(file_path, self.chunking_strategy)
+        if error is not None:
+            raise ValueError(error)
 
-        # 埋め込みを生成
-        for chunk in chunks:
-            chunk.embedding = self.embedding_provider.embed(chunk.content)
-
-        # ベクトルストアに追加
-        self.vector_store.add_batch(chunks)
+        self._add_chunks(chunks)
         self.indexed_files.add(file_path)
-
         return len(chunks)
 
     def index_directory(
@@ -335,37 +880,186 @@ class CodeRAG:
         directory: str,
         extensions: list[str] = None,
         exclude_patterns: list[str] = None,
+        max_workers: int | None = None,
     ) -> dict:
-        """ディレクトリを再帰的にインデックス化"""
+        """
+        ディレクトリを再帰的にインデックス化
+
+        ファイルの読み込みとAST解析（CPUバウンド）は ProcessPoolExecutor で
+        ファイル単位に並列化し、GILを回避する。埋め込みは全チャンクを
+        集約してからまとめて生成する。
+
+        Args:
+            directory: 対象ディレクトリ
+            extensions: 対象とする拡張子
+            exclude_patterns: 除外するディレクトリ名のパターン
+            max_workers: 解析ワーカー数（None で CPU 数、1 で並列化しない）
+        """
         extensions = extensions or [".py"]
         exclude_patterns = exclude_patterns or ["__pycache__", ".git", "venv", ".venv"]
 
+        # パターンは1つの正規表現に、拡張子はタプルにまとめ、
+        # エントリごとの判定をC実装の1回の呼び出しで済ませる
+        exclude_re = re.compile("|".join(map(re.escape, exclude_patterns)))
+        extension_tuple = tuple(extensions)
+
         stats = {"files": 0, "chunks": 0, "errors": 0}
+        file_paths = []
 
-        for root, dirs, files in os.walk(directory):
+        for root, dirs, files in self._walk(directory):
             # 除外パターンに一致するディレクトリをスキップ
-            dirs[:] = [
-                d
-                for d in dirs
-                if not any(pattern in d for pattern in exclude_patterns)
-            ]
+            dirs[:] = [d for d in dirs if not exclude_re.search(d)]
 
             for file in files:
-                if not any(file.endswith(ext) for ext in extensions):
+                if not file.endswith(extension_tuple):
                     continue
 
                 file_path = os.path.join(root, file)
-
-                try:
-                    num_chunks = self.index_file(file_path)
+                if file_path in self.indexed_files:
                     stats["files"] += 1
-                    stats["chunks"] += num_chunks
-                except Exception as e:
-                    stats["errors"] += 1
-                    print(f"Error indexing {file_path}: {e}")
+                else:
+                    file_paths.append(file_path)
 
+        # ファイル単位の解析を並列に実行
+        if max_workers == 1 or len(file_paths) < self.PARALLEL_MIN_FILES:
+            parsed = map(_parse_file_to_chunks, file_paths, repeat(self.chunking_strategy))
+            results = list(zip(file_paths, parsed))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                parsed = executor.map(
+                    _parse_file_to_chunks,
+                    file_paths,
+                    repeat(self.chunking_strategy),
+                    chunksize=16,
+                )
+                results = list(zip(file_paths, parsed))
+
+        all_chunks = []
+        indexed = []
+        for file_path, (chunks, error) in results:
+            if error is not None:
+                stats["errors"] += 1
+                print(f"Error indexing {file_path}: {error}")
+                continue
+            all_chunks.extend(chunks)
+            indexed.append(file_path)
+
+        # 集約したチャンクの埋め込みをまとめて生成
+        try:
+            self._add_chunks(all_chunks)
+        except Exception as e:
+            stats["errors"] += len(indexed)
+            print(f"Error embedding chunks from {directory}: {e}")
+            return stats
+
+        self.indexed_files.update(indexed)
+        stats["files"] += len(indexed)
+        stats["chunks"] += len(all_chunks)
         return stats
 
+    def _walk(self, directory: str) -> Iterator[tuple[str, list[str], list[str]]]:
+        """
+        os.walk 相当のトラバーサル（同じ階層のディレクトリを並列に走査）
+
+        幅優先で1階層ずつ os.scandir をスレッドプールで並列に実行する。
+        os.walk と同様に、呼び出し側が dirs を書き換えると降りる先を絞り込める。
+        """
+        level = [directory]
+        with ThreadPoolExecutor(max_workers=self.SCAN_WORKERS) as executor:
+            while level:
+                next_level = []
+                for root, (dirs, files) in zip(level, executor.map(_scan_directory, level)):
+                    yield root, dirs, files
+                    next_level.extend(os.path.join(root, d) for d in dirs)
+                level = next_level
+
+    def _add_chunks(self, chunks: list[CodeChunk]) -> None:
+        """
+        チャンクの埋め込みを EMBED_BATCH_SIZE 件ずつのマイクロバッチで生成し、
+        インデックスの行列に直接格納
+
+        定型コード（`if __name__ == "__main__":` や自動生成ファイルなど）のように
+        既に見た本文と同じチャンクは埋め込みを再計算せず、最初のベクトルを使い回す。
+        使い回し用の float32 ベクトルはこの呼び出しの間だけ保持する
+        （インデックスは int8 で持つので、全チャンク分を残すとメモリ削減が相殺される）。
+
+        途中のバッチで失敗した場合は、この呼び出しで追加した分をインデックスから
+        取り除いてから例外を送出する（呼び出し側はファイルを未登録のまま残すので、
+        再実行で同じチャンクが二重に追加されないようにする）。
+        """
+        added_from = len(self.vector_store.chunks)
+        try:
+            self._add_chunk_batches(chunks)
+        except BaseException:
+            self.vector_store.truncate(added_from)
+            raise
+
+    def _add_chunk_batches(self, chunks: list[CodeChunk]) -> None:
+        # 本文の SHA-256 -> 埋め込み（同一内容のチャンクは最初の1回だけ埋め込む）
+        content_to_vec: dict[bytes, np.ndarray] = {}
+        for start in range(0, len(chunks), self.EMBED_BATCH_SIZE):
+            batch = chunks[start : start + self.EMBED_BATCH_SIZE]
+            keys = [EmbeddingCache.key(chunk.content) for chunk in batch]
+            pending: dict[bytes, str] = {}  # 未知の本文（重複を除き出現順）
+            for key, chunk in zip(keys, batch):
+                if key not in content_to_vec:
+                    pending.setdefault(key, chunk.content)
+
+            if pending:
+                texts = list(pending.values())
+                if self.embedding_cache is None:
+                    fresh = self.embedding_provider.embed_batch(texts)
+                else:
+                    fresh = self._embed_with_cache(list(pending), texts)
+                fresh = np.asarray(fresh, dtype=np.float32)
+                content_to_vec.update(zip(pending, fresh))
+
+            embeddings = np.stack([content_to_vec[key] for key in keys])
+            self.vector_store.add_batch(batch, embeddings)
+
+    def _embed_with_cache(self, keys: list[bytes], texts: list[str]) -> np.ndarray:
+        """
+        キャッシュにない本文だけを embed_batch に渡し、結果を保存
+
+        キャッシュの次元がプロバイダーの出力と違う場合（同じ model_id のまま
+        出力次元を変えたなど）は、キャッシュのベクトルを使わずにすべて埋め込み直す。
+        """
+        cached_dim = self.embedding_cache.dim
+        provider_dim = getattr(self.embedding_provider, "dimension", None)
+        if provider_dim is not None and cached_dim != provider_dim:
+            hits = {}
+        else:
+            hits = self.embedding_cache.get_many(keys)
+        misses = [i for i, key in enumerate(keys) if key not in hits]
+
+        fresh = None
+        if misses:
+            fresh = np.asarray(
+                self.embedding_provider.embed_batch([texts[i] for i in misses]),
+                dtype=np.float32,
+            )
+            if hits and fresh.shape[1] != cached_dim:
+                # キャッシュのベクトルは次元が違うので使えない。ヒットした本文も埋め込み直す
+                stale = [i for i, key in enumerate(keys) if key in hits]
+                combined = np.empty((len(keys), fresh.shape[1]), dtype=np.float32)
+                combined[misses] = fresh
+                combined[stale] = self.embedding_provider.embed_batch([texts[i] for i in stale])
+                hits = {}
+                misses = list(range(len(keys)))
+                fresh = combined
+            self.embedding_cache.put_many([keys[i] for i in misses], fresh)
+        if not hits:
+            return fresh
+
+        dim = fresh.shape[1] if fresh is not None else len(next(iter(hits.values())))
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in hits:
+                embeddings[i] = hits[key]
+        if misses:
+            embeddings[misses] = fresh
+        return embeddings
+
     def search(
         self,
         query: str,
@@ -386,7 +1080,7 @@ class CodeRAG:
             SearchResult のリスト
         """
         # Stage 1: Vector Search
-        query_embedding = self.embedding_provider.embed(query)
+        query_embedding = self._embed_query(query)
         candidates = self.vector_store.search(query_embedding, k=k * 3)
 
         results = [
@@ -395,6 +1089,7 @@ class CodeRAG:
         ]
 
         # Stage 2: LLM Re-ranking (オプション)
+        # 候補が k 件以下なら並べ替えても結果は変わらないので LLM を呼ばない
         if rerank and llm and len(results) > k:
             results = self._rerank_with_llm(query, results, k, llm)
         else:
@@ -409,10 +1104,42 @@ class CodeRAG:
         k: int,
         llm: Any,
     ) -> list[SearchResult]:
-        """LLMで検索結果を再ランキング"""
+        """LLMで検索結果を再ランキング（同じ候補に対する結果はキャッシュを使う）"""
+        results = results[: max(k, self.RERANK_MAX_CANDIDATES)]
+        key = (query, tuple(r.chunk.id for r in results), k)
+        indices = self._rerank_cache.get(key)
+        if indices is None:
+            try:
+                indices = self._request_rerank(query, results, k, llm)
+            except Exception:
+                # 再ランキング失敗時は元の順序を返す
+                return results[:k]
+            self._rerank_cache[key] = indices
+            if len(self._rerank_cache) > self.QUERY_CACHE_SIZE:
+                self._rerank_cache.popitem(last=False)
+        else:
+            self._rerank_cache.move_to_end(key)
+
+        # 結果を再順序付け
+        reranked = []
+        for idx in indices[:k]:
+            if 0 <= idx < len(results):
+                results[idx].match_type = "reranked"
+                reranked.append(results[idx])
+
+        return reranked
+
+    def _request_rerank(
+        self,
+        query: str,
+        results: list[SearchResult],
+        k: int,
+        llm: Any,
+    ) -> tuple[int, ...]:
+        """LLMに候補のランク付けを依頼し、インデックス列を返す"""
         # 候補をフォーマット
         candidates_text = "\n\n".join(
-            f"[{i}] {r.chunk.location}\n{r.chunk.content[:200]}..."
+            f"[{i}] {r.chunk.location}\n{r.chunk.content[: self.RERANK_PREVIEW_CHARS]}..."
             for i, r in enumerate(results)
         )
 
@@ -427,28 +1154,14 @@ class CodeRAG:
 例: 2,0,5,1,3
 """
 
-        try:
-            response = llm.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt,
-            )
-
-            # インデックスをパース
-            indices_str = response.text.strip()
-            indices = [int(i.strip()) for i in indices_str.split(",") if i.strip().isdigit()]
-
-            # 結果を再順序付け
-            reranked = []
-            for idx in indices[:k]:
-                if 0 <= idx < len(results):
-                    results[idx].match_type = "reranked"
-                    reranked.append(results[idx])
-
-            return reranked
+        response = llm.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=prompt,
+        )
 
-        except Exception:
-            # 再ランキング失敗時は元の順序を返す
-            return results[:k]
+        # インデックスをパース
+        indices_str = response.text.strip()
+        return tuple(int(i.strip()) for i in indices_str.split(",") if i.strip().isdigit())
 
     def build_context(
         self,
@@ -487,10 +1200,7 @@ class CodeRAG:
         }
 
     def _count_chunk_types(self) -> dict:
-        counts = {}
-        for chunk in self.vector_store.chunks:
-            counts[chunk.chunk_type] = counts.get(chunk.chunk_type, 0) + 1
-        return counts
+        return dict(self.vector_store.type_counts)
 
 
 # =============================================================================
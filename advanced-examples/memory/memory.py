@@ -12,12 +12,33 @@
 
 from __future__ import annotations
 
+import hashlib
+import heapq
+import itertools
 import json
 import time
 from abc import ABC, abstractmethod
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
 from typing import Any
 
+import numpy as np
+
+try:
+    import hnswlib  # 任意: 大規模アーカイブ向けの近似最近傍（HNSW）インデックス
+except ImportError:
+    hnswlib = None
+
+try:
+    import simsimd  # 任意: SIMD 最適化されたコサイン距離（int8 対応）
+except ImportError:
+    simsimd = None
+
+try:
+    from numba import njit, prange  # 任意: 全件走査カーネルの JIT コンパイル
+except ImportError:
+    njit = None
+
 
 # =============================================================================
 # データ構造
@@ -32,18 +53,32 @@ class MemoryItem:
     timestamp: float = field(default_factory=time.time)
     importance: float = 0.5  # 0.0 - 1.0
     metadata: dict = field(default_factory=dict)
-    embedding: list[float] | None = None
+    # float32 配列で保持し、NumPy/SIMD にそのまま渡せるようにする
+    embedding: np.ndarray | None = field(default=None, repr=False, compare=False)
+    _tokens: frozenset[str] | None = field(default=None, init=False, repr=False, compare=False)
+
+    def tokens(self) -> frozenset[str]:
+        """キーワード検索用の単語集合（初回のみ計算してキャッシュ）"""
+        if self._tokens is None:
+            self._tokens = frozenset(self.content.lower().split())
+        return self._tokens
 
     def to_dict(self) -> dict:
-        return {
+        data = {
             "content": self.content,
             "timestamp": self.timestamp,
             "importance": self.importance,
             "metadata": self.metadata,
         }
+        if self.embedding is not None:
+            data["embedding"] = self.embedding.tolist()
+        return data
 
     @classmethod
     def from_dict(cls, data: dict) -> "MemoryItem":
+        data = dict(data)
+        if data.get("embedding") is not None:
+            data["embedding"] = np.asarray(data["embedding"], dtype=np.float32)
         return cls(**data)
 
 
@@ -72,11 +107,11 @@ class EmbeddingProvider(ABC):
     """埋め込みベクトル生成の抽象基底クラス"""
 
     @abstractmethod
-    def embed(self, text: str) -> list[float]:
+    def embed(self, text: str) -> np.ndarray:
         pass
 
     @abstractmethod
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
         pass
 
 
@@ -96,19 +131,24 @@ class WorkingMemory(MemoryStore):
     """
 
     def __init__(self, max_tokens: int = 4000):
-        self.items: list[MemoryItem] = []
+        self.items: deque[MemoryItem] = deque()
         self.max_tokens = max_tokens
+        # トークン数は追加時に一度だけ計算し、合計を差分更新する
+        self._token_counts: deque[int] = deque()
+        self._total_tokens = 0
 
     def add(self, item: MemoryItem) -> None:
+        tokens = self._estimate_tokens(item.content)
         self.items.append(item)
+        self._token_counts.append(tokens)
+        self._total_tokens += tokens
         self._enforce_limit()
 
     def _enforce_limit(self) -> None:
         """トークン制限を超えた場合、古いものから削除"""
-        total_tokens = sum(self._estimate_tokens(i.content) for i in self.items)
-        while total_tokens > self.max_tokens and self.items:
-            removed = self.items.pop(0)
-            total_tokens -= self._estimate_tokens(removed.content)
+        while self._total_tokens > self.max_tokens and self.items:
+            self.items.popleft()
+            self._total_tokens -= self._token_counts.popleft()
 
     def _estimate_tokens(self, text: str) -> int:
         """トークン数を概算（1トークン ≈ 4文字）"""
@@ -116,14 +156,17 @@ class WorkingMemory(MemoryStore):
 
     def search(self, query: str, k: int = 5) -> list[MemoryItem]:
         """最近のk件を返す（単純な実装）"""
-        return self.items[-k:]
+        n = len(self.items)
+        return [self.items[i] for i in range(max(n - k, 0), n)]
 
     def get_context(self) -> str:
         """現在のコンテキストを文字列として取得"""
         return "\n".join(item.content for item in self.items)
 
     def clear(self) -> None:
-        self.items = []
+        self.items.clear()
+        self._token_counts.clear()
+        self._total_tokens = 0
 
 
 # =============================================================================
@@ -142,43 +185,78 @@ class MainMemory(MemoryStore):
     """
 
     def __init__(self, max_items: int = 100):
-        self.items: list[MemoryItem] = []
         self.max_items = max_items
+        # (importance, seq, item) の最小ヒープ。先頭が最も重要度の低い項目
+        self._heap: list[tuple[float, int, MemoryItem]] = []
+        self._seq = itertools.count()
+        # 転置インデックス: 単語 -> その単語を含む項目の seq
+        self._postings: defaultdict[str, set[int]] = defaultdict(set)
+        self._items_by_seq: dict[int, MemoryItem] = {}
+
+    @property
+    def items(self) -> list[MemoryItem]:
+        """保持中の項目（タイムスタンプ順）"""
+        entries = sorted(self._heap, key=lambda e: (e[2].timestamp, e[1]))
+        return [item for _, _, item in entries]
 
     def add(self, item: MemoryItem) -> None:
-        self.items.append(item)
-        self._enforce_limit()
-
-    def _enforce_limit(self) -> None:
-        """制限を超えた場合、重要度の低いものから削除"""
-        if len(self.items) > self.max_items:
-            # 重要度でソートし、低いものを削除
-            self.items.sort(key=lambda x: x.importance, reverse=True)
-            self.items = self.items[: self.max_items]
-            # タイムスタンプで再ソート
-            self.items.sort(key=lambda x: x.timestamp)
+        seq = next(self._seq)
+        entry = (item.importance, seq, item)
+        evicted = None
+        if len(self._heap) < self.max_items:
+            heapq.heappush(self._heap, entry)
+        else:
+            # 制限を超える場合、重要度の最も低いものを削除（O(log N)）
+            evicted = heapq.heappushpop(self._heap, entry)
+            if evicted is entry:
+                return
+
+        self._index(seq, item)
+        if evicted is not None:
+            self._unindex(evicted[1])
+
+    def _index(self, seq: int, item: MemoryItem) -> None:
+        """転置インデックスに登録"""
+        self._items_by_seq[seq] = item
+        for word in item.tokens():
+            self._postings[word].add(seq)
+
+    def _unindex(self, seq: int) -> None:
+        """削除された項目を転置インデックスから除去"""
+        for word in self._items_by_seq.pop(seq).tokens():
+            postings = self._postings[word]
+            postings.discard(seq)
+            if not postings:
+                del self._postings[word]
 
     def search(self, query: str, k: int = 5) -> list[MemoryItem]:
-        """キーワードマッチングで検索"""
+        """キーワードマッチングで検索（クエリ語を含む項目だけを採点）"""
         query_words = set(query.lower().split())
+        if not query_words:
+            return []
+
+        candidates = set().union(*(self._postings.get(w, ()) for w in query_words))
         scored = []
 
-        for item in self.items:
-            content_words = set(item.content.lower().split())
-            overlap = len(query_words & content_words)
-            if overlap > 0:
-                score = overlap / len(query_words)
-                scored.append((score, item))
+        for seq in sorted(candidates):
+            item = self._items_by_seq[seq]
+            overlap = len(query_words & item.tokens())
+            score = overlap / len(query_words)
+            scored.append((score, item))
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [item for _, item in scored[:k]]
+        top = heapq.nlargest(k, scored, key=lambda x: x[0])
+        return [item for _, item in top]
 
     def get_recent(self, k: int = 10) -> list[MemoryItem]:
-        """最近のk件を取得"""
-        return self.items[-k:]
+        """最近のk件を取得（返すk件だけをタイムスタンプ順に並べる）"""
+        recent = heapq.nlargest(k, self._heap, key=lambda e: (e[2].timestamp, e[1]))
+        return [item for _, _, item in reversed(recent)]
 
     def clear(self) -> None:
-        self.items = []
+        self._heap = []
+        self._seq = itertools.count()
+        self._postings.clear()
+        self._items_by_seq.clear()
 
 
 # =============================================================================
@@ -186,45 +264,176 @@ class MainMemory(MemoryStore):
 # =============================================================================
 
 
+if njit is not None:
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _int8_dot_scores(matrix, query):
+        """int8 行列の各行とクエリの内積を整数で累積して計算"""
+        n, dim = matrix.shape
+        scores = np.empty(n, dtype=np.int64)
+        for i in prange(n):
+            acc = 0
+            for j in range(dim):
+                acc += np.int64(matrix[i, j]) * np.int64(query[j])
+            scores[i] = acc
+        return scores
+
+    # JIT コンパイルのコストをインポート時に1回だけ払う
+    _int8_dot_scores(np.zeros((1, 1), dtype=np.int8), np.zeros(1, dtype=np.int8))
+else:
+    _int8_dot_scores = None
+
+
 class SimpleVectorStore:
     """
     シンプルなベクトルストア（教育用）
 
     本番環境では Pinecone, Weaviate, pgvector 等を使用してください。
+
+    hnswlib がインストールされていれば HNSW インデックスを併用し、
+    件数が HNSW_MIN_ITEMS 以上のときは全件走査の代わりに近似検索を行う。
     """
 
-    def __init__(self):
-        self.items: list[tuple[list[float], MemoryItem]] = []
+    INITIAL_CAPACITY = 64
+    QUANT_SCALE = 127.0  # 単位ベクトルの各成分 [-1, 1] を int8 に写す係数
+    HNSW_MIN_ITEMS = 1000  # これ未満は全件走査の方が速い
+    HNSW_M = 16
+    HNSW_EF_CONSTRUCTION = 64
+    HNSW_EF_SEARCH = 100
 
-    def add(self, embedding: list[float], item: MemoryItem) -> None:
-        self.items.append((embedding, item))
+    def __init__(self, use_hnsw: bool = True):
+        """
+        Args:
+            use_hnsw: hnswlib が利用可能な場合に HNSW インデックスを使うか
+        """
+        self.items: list[MemoryItem] = []
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        # 埋め込みは単位ベクトルに正規化して int8 に量子化し、
+        # (capacity, dim) の行列に格納する（float32 の1/4のメモリ）
+        self._matrix: np.ndarray | None = None
+        self._index = None  # 次元が確定する最初の add で初期化
+
+    def add(self, embedding: np.ndarray, item: MemoryItem) -> None:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        n = len(self.items)
+        self._reserve(vector.size, n + 1)
+
+        normalized = self._normalize(vector)
+        self._matrix[n] = self._quantize(normalized)
+        if self.use_hnsw:
+            self._add_to_index(normalized[np.newaxis], n)
+        self.items.append(item)
+
+    def add_batch(self, embeddings: np.ndarray, items: list[MemoryItem]) -> None:
+        """複数の埋め込みをまとめて追加（正規化・コピーを1回で行う）"""
+        if not items:
+            return
 
-    def search(self, query_embedding: list[float], k: int = 5) -> list[MemoryItem]:
-        """コサイン類似度で検索"""
-        if not self.items:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(items):
+            raise ValueError("embeddings must be a (len(items), dim) array")
+
+        start = len(self.items)
+        stop = start + len(items)
+        self._reserve(vectors.shape[1], stop)
+
+        normalized = self._normalize(vectors)
+        self._matrix[start:stop] = self._quantize(normalized)
+        if self.use_hnsw:
+            self._add_to_index(normalized, start)
+        self.items.extend(items)
+
+    def _reserve(self, dim: int, size: int) -> None:
+        """size 行を格納できるよう行列を確保・拡張する"""
+        if self._matrix is None:
+            self._matrix = np.empty((self.INITIAL_CAPACITY, dim), dtype=np.int8)
+        elif dim != self._matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension mismatch: expected {self._matrix.shape[1]}, got {dim}"
+            )
+
+        if size > self._matrix.shape[0]:
+            self._grow(size)
+
+    def _add_to_index(self, vectors: np.ndarray, start: int) -> None:
+        """正規化済みの float32 ベクトルを HNSW インデックスに追加（内積 = コサイン類似度）"""
+        if self._index is None:
+            self._index = hnswlib.Index(space="ip", dim=self._matrix.shape[1])
+            self._index.init_index(
+                max_elements=self._matrix.shape[0],
+                ef_construction=self.HNSW_EF_CONSTRUCTION,
+                M=self.HNSW_M,
+            )
+        elif self._index.get_max_elements() < self._matrix.shape[0]:
+            self._index.resize_index(self._matrix.shape[0])
+
+        self._index.add_items(vectors, np.arange(start, start + len(vectors)))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """単位ベクトルに正規化（コサイン類似度を内積だけで計算できるようにする）"""
+        return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+    @classmethod
+    def _quantize(cls, vectors: np.ndarray) -> np.ndarray:
+        """単位ベクトルを int8 に量子化"""
+        return np.clip(np.rint(vectors * cls.QUANT_SCALE), -128, 127).astype(np.int8)
+
+    def _grow(self, size: int) -> None:
+        """size 以上になるまで容量を倍々にし、コピーは1回だけ行う"""
+        capacity = self._matrix.shape[0]
+        while capacity < size:
+            capacity *= 2
+        matrix = np.empty((capacity, self._matrix.shape[1]), dtype=np.int8)
+        matrix[: len(self.items)] = self._matrix[: len(self.items)]
+        self._matrix = matrix
+
+    def search(self, query_embedding: np.ndarray, k: int = 5) -> list[MemoryItem]:
+        """コサイン類似度で検索（全件を1回の行列ベクトル積で計算）"""
+        n = len(self.items)
+        if n == 0 or k <= 0:
             return []
 
-        scored = []
-        for embedding, item in self.items:
-            similarity = self._cosine_similarity(query_embedding, embedding)
-            scored.append((similarity, item))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [item for _, item in scored[:k]]
-
-    def _cosine_similarity(self, a: list[float], b: list[float]) -> float:
-        """コサイン類似度を計算"""
-        if len(a) != len(b):
-            return 0.0
-        dot_product = sum(x * y for x, y in zip(a, b))
-        norm_a = sum(x * x for x in a) ** 0.5
-        norm_b = sum(x * x for x in b) ** 0.5
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return dot_product / (norm_a * norm_b)
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        if query.size != self._matrix.shape[1]:
+            return []
+
+        query = self._normalize(query)
+        if self._index is not None and n >= self.HNSW_MIN_ITEMS:
+            k = min(k, n)
+            self._index.set_ef(max(self.HNSW_EF_SEARCH, k))
+            labels, _ = self._index.knn_query(query, k=k)
+            return [self.items[i] for i in labels[0]]
+
+        query = self._quantize(query)
+        if simsimd is not None:
+            # int8 専用の SIMD カーネルでコサイン距離を一括計算
+            distances = simsimd.cdist(self._matrix[:n], query[np.newaxis], metric="cosine")
+            similarities = 1.0 - np.asarray(distances, dtype=np.float32).ravel()
+            return [self.items[i] for i in self._top_k(similarities, k)]
+
+        # 整数で累積し、最後にスケールを戻す
+        if _int8_dot_scores is not None:
+            dots = _int8_dot_scores(self._matrix[:n], query)
+        else:
+            dots = self._matrix[:n] @ query.astype(np.int32)
+        similarities = dots.astype(np.float32) / (self.QUANT_SCALE * self.QUANT_SCALE)
+        return [self.items[i] for i in self._top_k(similarities, k)]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """スコア上位k件のインデックスを降順で返す（全件ソートしない）"""
+        k = min(k, scores.size)
+        if k < scores.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.size)
+        return top[np.argsort(-scores[top], kind="stable")]
 
     def clear(self) -> None:
         self.items = []
+        self._matrix = None
+        self._index = None
 
 
 class ArchiveMemory(MemoryStore):
@@ -247,11 +456,29 @@ class ArchiveMemory(MemoryStore):
 
     def add(self, item: MemoryItem) -> None:
         if self.embedding_provider and item.embedding is None:
-            item.embedding = self.embedding_provider.embed(item.content)
+            item.embedding = np.asarray(
+                self.embedding_provider.embed(item.content), dtype=np.float32
+            )
 
-        if item.embedding:
+        if item.embedding is not None:
             self.vector_store.add(item.embedding, item)
 
+    def add_many(self, items: list[MemoryItem]) -> None:
+        """複数の項目をまとめて追加（埋め込みは embed_batch で1回だけ生成）"""
+        if self.embedding_provider:
+            to_embed = [item for item in items if item.embedding is None]
+            if to_embed:
+                embeddings = np.asarray(
+                    self.embedding_provider.embed_batch([item.content for item in to_embed]),
+                    dtype=np.float32,
+                )
+                for item, embedding in zip(to_embed, embeddings):
+                    item.embedding = embedding
+
+        embedded = [item for item in items if item.embedding is not None]
+        if embedded:
+            self.vector_store.add_batch(np.stack([item.embedding for item in embedded]), embedded)
+
     def search(self, query: str, k: int = 5) -> list[MemoryItem]:
         if not self.embedding_provider:
             return []
@@ -278,6 +505,9 @@ class HierarchicalMemory:
         results = memory.recall("プログラミング言語の好み")
     """
 
+    MAIN_THRESHOLD = 0.5  # これ以上の重要度で Main Memory にも保存
+    ARCHIVE_THRESHOLD = 0.8  # これ以上の重要度で Archive にも保存
+
     def __init__(
         self,
         working_max_tokens: int = 4000,
@@ -308,17 +538,41 @@ class HierarchicalMemory:
             metadata=metadata or {},
         )
 
+        # Archive 行きの項目は埋め込みを1回だけ計算し、同じオブジェクトを各層で共有
+        provider = self.archive.embedding_provider
+        if importance >= self.ARCHIVE_THRESHOLD and provider and item.embedding is None:
+            item.embedding = np.asarray(provider.embed(content), dtype=np.float32)
+
+        self._add_to_working_and_main(item)
+
+        # 重要度が0.8以上ならArchiveにも追加
+        if importance >= self.ARCHIVE_THRESHOLD:
+            self.archive.add(item)
+
+    def remember_many(self, items: list[MemoryItem]) -> None:
+        """
+        複数の項目をまとめて記憶
+
+        Archive 行きの項目の埋め込みは embed_batch の1回の呼び出しで生成します。
+
+        Args:
+            items: 記憶する項目のリスト
+        """
+        for item in items:
+            self._add_to_working_and_main(item)
+
+        self.archive.add_many(
+            [item for item in items if item.importance >= self.ARCHIVE_THRESHOLD]
+        )
+
+    def _add_to_working_and_main(self, item: MemoryItem) -> None:
         # 常にWorking Memoryに追加
         self.working.add(item)
 
         # 重要度が0.5以上ならMain Memoryにも追加
-        if importance >= 0.5:
+        if item.importance >= self.MAIN_THRESHOLD:
             self.main.add(item)
 
-        # 重要度が0.8以上ならArchiveにも追加
-        if importance >= 0.8:
-            self.archive.add(item)
-
     def recall(self, query: str, k: int = 5) -> list[MemoryItem]:
         """
         関連する記憶を検索
@@ -399,20 +653,23 @@ class DummyEmbeddingProvider(EmbeddingProvider):
     def __init__(self, dimension: int = 128):
         self.dimension = dimension
 
-    def embed(self, text: str) -> list[float]:
+    def embed(self, text: str) -> np.ndarray:
         """テキストのハッシュに基づく疑似埋め込み"""
-        import hashlib
-
-        hash_bytes = hashlib.sha256(text.encode()).digest()
-        embedding = []
-        for i in range(0, self.dimension * 4, 4):
-            if i + 4 <= len(hash_bytes):
-                value = int.from_bytes(hash_bytes[i : i + 4], "big")
-                embedding.append((value / (2**32)) * 2 - 1)  # -1 to 1
-        return embedding[: self.dimension]
-
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        return [self.embed(text) for text in texts]
+        digest = hashlib.shake_128(text.encode()).digest(self.dimension * 4)
+        return self._to_vectors(digest)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """全テキストのハッシュを連結し、1回の変換で (N, dimension) 行列にする"""
+        digest = b"".join(
+            hashlib.shake_128(text.encode()).digest(self.dimension * 4) for text in texts
+        )
+        return self._to_vectors(digest).reshape(len(texts), self.dimension)
+
+    @staticmethod
+    def _to_vectors(digest: bytes) -> np.ndarray:
+        """ビッグエンディアン uint32 列を [-1, 1) の float32 に変換"""
+        values = np.frombuffer(digest, dtype=">u4").astype(np.float32)
+        return values * np.float32(2.0 / 2**32) - np.float32(1.0)
 
 
 # =============================================================================
@@ -13,7 +13,10 @@
 from __future__ import annotations
 
 import asyncio
+import operator
 from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Callable
@@ -82,29 +85,31 @@ class Agent(ABC):
             msg = Message(sender=self.name, receiver=receiver, content=content, **kwargs)
             self.message_bus.send(msg)
 
-    def receive_messages(self) -> list[Message]:
+    def receive_messages(self) -> Sequence[Message]:
         """自分宛のメッセージを受信"""
         if self.message_bus:
             return self.message_bus.receive(self.name)
-        return []
+        return ()
 
 
 class MessageBus:
     """エージェント間のメッセージバス"""
 
     def __init__(self):
-        self.messages: dict[str, list[Message]] = {}
+        self.messages: defaultdict[str, deque[Message]] = defaultdict(deque)
 
     def send(self, message: Message) -> None:
         """メッセージを送信"""
-        if message.receiver not in self.messages:
-            self.messages[message.receiver] = []
         self.messages[message.receiver].append(message)
 
-    def receive(self, agent_name: str) -> list[Message]:
-        """メッセージを受信"""
-        messages = self.messages.get(agent_name, [])
-        self.messages[agent_name] = []
+    def receive(self, agent_name: str) -> Sequence[Message]:
+        """メッセージを受信（受信キューは空にする）"""
+        queue = self.messages.get(agent_name)
+        if not queue:
+            # ポーリングで何も届いていない場合は新しいリストを作らない
+            return ()
+        messages = list(queue)
+        queue.clear()
         return messages
 
 
@@ -129,6 +134,7 @@ class AgentsAsToolsOrchestrator:
     def __init__(self):
         self.agents: dict[str, Agent] = {}
         self.context_scopes: dict[str, list[str]] = {}
+        self._scopers: dict[str, Callable[[dict], dict]] = {}
 
     def register_agent(
         self,
@@ -139,6 +145,8 @@ class AgentsAsToolsOrchestrator:
         """エージェントを登録"""
         self.agents[name] = agent
         self.context_scopes[name] = required_context or []
+        # 必要なキーは登録時に確定するので、スコープ関数もここで一度だけ作る
+        self._scopers[name] = self._build_scoper(self.context_scopes[name])
 
     def call_agent(
         self,
@@ -153,7 +161,7 @@ class AgentsAsToolsOrchestrator:
         agent = self.agents[agent_name]
 
         # コンテキストをスコープ（必要な情報のみ渡す）
-        scoped_context = self._scope_context(agent_name, full_context)
+        scoped_context = self._scopers[agent_name](full_context)
 
         print(f"  [CALL] {agent_name} with scoped context: {list(scoped_context.keys())}")
 
@@ -161,12 +169,28 @@ class AgentsAsToolsOrchestrator:
 
     def _scope_context(self, agent_name: str, full_context: dict) -> dict:
         """コンテキストを必要な範囲に制限"""
-        required = self.context_scopes.get(agent_name, [])
+        scoper = self._scopers.get(agent_name) or self._build_scoper([])
+        return scoper(full_context)
+
+    @staticmethod
+    def _build_scoper(required: list[str]) -> Callable[[dict], dict]:
+        """必要なキーだけを取り出す関数を作成"""
         if not required:
             # 何も指定がなければ最小限のコンテキスト
-            return {"task_id": full_context.get("task_id")}
+            return lambda context: {"task_id": context.get("task_id")}
+
+        keys = tuple(dict.fromkeys(required))
+        getter = operator.itemgetter(*keys)
 
-        return {k: v for k, v in full_context.items() if k in required}
+        def scope(context: dict) -> dict:
+            try:
+                values = getter(context)
+            except KeyError:
+                # 一部のキーが欠けている場合は存在するものだけを渡す
+                return {k: context[k] for k in keys if k in context}
+            return dict(zip(keys, values if len(keys) > 1 else (values,)))
+
+        return scope
 
 
 # =============================================================================
@@ -289,8 +313,8 @@ class DebateOrchestrator:
         """批評エージェントを追加"""
         self.critics.append(agent)
 
-    def debate(self, topic: str, context: dict = None) -> dict:
-        """議論を実行"""
+    async def debate(self, topic: str, context: dict = None) -> dict:
+        """議論を実行（各ラウンド内の批評は並列実行）"""
         print(f"\n{'=' * 50}")
         print(f"Debate: {topic}")
         print("=" * 50)
@@ -307,8 +331,13 @@ class DebateOrchestrator:
                     for o in all_opinions
                 ]
 
-            for critic in self.critics:
-                opinion = critic.critique(topic, round_context)
+            # ラウンド内の批評は互いに独立なので並列に実行する
+            opinions = await asyncio.gather(*[
+                asyncio.to_thread(critic.critique, topic, round_context)
+                for critic in self.critics
+            ])
+
+            for critic, opinion in zip(self.critics, opinions):
                 all_opinions.append(opinion)
                 print(f"\n[{critic.name} ({critic.perspective})]")
                 print(f"  Opinion: {opinion.opinion[:100]}...")
@@ -520,7 +549,7 @@ async def main():
     debate.add_critic(DebateAgent("performance_expert", "パフォーマンス"))
     debate.add_critic(DebateAgent("readability_expert", "可読性"))
 
-    result = debate.debate("この認証実装は適切か？")
+    result = await debate.debate("この認証実装は適切か？")
     print("\n" + result["synthesis"])
 
 
@@ -16,6 +16,11 @@ DAG（有向非巡回グラフ）ベースの並列実行 Executor
 from __future__ import annotations
 
 import asyncio
+import functools
+import hashlib
+import sys
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Callable
@@ -30,7 +35,19 @@ class StepStatus(Enum):
     SKIPPED = "skipped"
 
 
-@dataclass
+class UnknownDependencyError(ValueError):
+    """depends_on に存在しないステップIDが含まれている"""
+
+    pass
+
+
+class CycleDetectedError(ValueError):
+    """依存関係に循環がある（DAG ではない）"""
+
+    pass
+
+
+@dataclass(slots=True)
 class DAGStep:
     """DAG内のステップ"""
 
@@ -42,23 +59,40 @@ class DAGStep:
     status: StepStatus = StepStatus.PENDING
     result: str = ""
     error: str | None = None
+    # True なら入力（アクション・パラメータ・上流の結果）が前回の成功時と同じとき再実行しない
+    # （副作用のあるステップや、時刻などで結果が変わるステップでは False のままにする）
+    memoize: bool = False
+    # アクションを識別するキー。同じキーのアクションは同じ処理とみなす
+    # （省略時はアクションのオブジェクト自体で識別するので、作り直したラムダは別扱い）
+    cache_key: str | None = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class Schedule:
+    """DAG の静的な実行計画（DAGExecutor.compile で作成し、繰り返し実行で使い回す）"""
+
+    order: tuple[str, ...]  # トポロジカル順のステップID
+    levels: tuple[tuple[str, ...], ...]  # 同じレベルのステップは同時に実行可能
+    dependents: dict[str, tuple[str, ...]]  # ステップID -> それに依存するステップID
+    in_degree: dict[str, int]  # ステップID -> 依存するステップ数
+
+
+@dataclass(slots=True)
 class DAGExecutionResult:
     """DAG実行結果"""
 
     steps: list[DAGStep]
     total_time: float
     parallel_speedup: float  # 直列実行と比較した速度向上
+    counts: Counter[StepStatus] = field(default_factory=Counter)  # 最終状態ごとの件数
 
     @property
     def success_count(self) -> int:
-        return sum(1 for s in self.steps if s.status == StepStatus.COMPLETED)
+        return self.counts[StepStatus.COMPLETED]
 
     @property
     def failed_count(self) -> int:
-        return sum(1 for s in self.steps if s.status == StepStatus.FAILED)
+        return self.counts[StepStatus.FAILED]
 
 
 class DAGExecutor:
@@ -69,11 +103,58 @@ class DAGExecutor:
     - 依存関係が解決されたステップを自動的に並列実行
     - 失敗したステップに依存するステップは自動的にスキップ
     - 実行状況のリアルタイム表示
+    - memoize=True のステップは、入力（アクション・パラメータ・上流の結果）が
+      前回と同じなら再実行しない
     """
 
     def __init__(self, max_concurrency: int = 5):
         self.max_concurrency = max_concurrency
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # ステップの同期関数を実行するスレッドプール（全ステップ・全実行で共有）
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="dag")
+        # ステップID -> (入力のキー, 結果)。成功したステップのみ記録する
+        self._memo: dict[str, tuple[str, Callable[..., str], str]] = {}
+        # 進捗表示のバッファ（イベントループの1周ごとにまとめて書き出す）
+        self._log_buf: list[str] = []
+        # execute 中のイベントループ（ステップごとに取得し直さない）
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _log(self, line: str) -> None:
+        """進捗を1行追加（同じループ周回内の出力は1回の write にまとめる）"""
+        if not self._log_buf:
+            asyncio.get_running_loop().call_soon(self._flush_log)
+        self._log_buf.append(line)
+
+    def _flush_log(self) -> None:
+        if self._log_buf:
+            sys.stdout.write("\n".join(self._log_buf) + "\n")
+            self._log_buf.clear()
+
+    def invalidate(self, step_id: str | None = None) -> None:
+        """メモ化した結果を破棄（step_id 省略時は全ステップ）"""
+        if step_id is None:
+            self._memo.clear()
+        else:
+            self._memo.pop(step_id, None)
+
+    @staticmethod
+    def _memo_key(step: DAGStep, upstream_results: list[str]) -> str:
+        """ステップの入力（アクション・パラメータ・上流の結果のハッシュ）のキー
+
+        アクションは step.cache_key があればそれで、なければオブジェクトの id で識別する
+        （記録にアクション自体を保持するので、記録がある間に id が再利用されることはない）。
+        上流の結果は depends_on の順に並べる（入力が入れ替わったら別のキーになる）。
+        """
+        action_id = step.cache_key if step.cache_key is not None else id(step.action)
+        upstream_hashes = [
+            hashlib.blake2b(str(result).encode(), digest_size=16).hexdigest()
+            for result in upstream_results
+        ]
+        material = repr((step.id, action_id, sorted(step.params.items()), upstream_hashes))
+        return hashlib.blake2b(material.encode()).hexdigest()
+
+    async def aclose(self) -> None:
+        """スレッドプールを終了（実行中のステップの完了を待つ）"""
+        await asyncio.get_running_loop().run_in_executor(None, self._pool.shutdown)
 
     def build_dependency_graph(
         self, steps: list[DAGStep]
@@ -84,114 +165,192 @@ class DAGExecutor:
             graph[step.id] = set(step.depends_on)
         return graph
 
-    def get_ready_steps(
-        self, steps: list[DAGStep], completed: set[str], failed: set[str]
-    ) -> list[DAGStep]:
+    def compile(self, steps: list[DAGStep]) -> Schedule:
         """
-        実行可能なステップを取得
-        - 依存関係がすべて完了している
-        - まだ実行されていない
-        - 依存先が失敗していない
+        DAG を検証し、静的な実行計画を作成（Kahn のアルゴリズムで1回だけ走査）
+
+        同じ形の DAG を繰り返し実行する場合は、結果を execute に渡して使い回せる。
+
+        Raises:
+            UnknownDependencyError: 存在しないステップへの依存がある
+            CycleDetectedError: 循環があり、全ステップを処理できない
         """
-        ready = []
+        step_ids = {step.id for step in steps}
+        in_degree: dict[str, int] = {}
+        dependents: dict[str, list[str]] = {step.id: [] for step in steps}
         for step in steps:
-            if step.status != StepStatus.PENDING:
-                continue
+            unknown = [dep for dep in step.depends_on if dep not in step_ids]
+            if unknown:
+                raise UnknownDependencyError(
+                    f"Step '{step.id}' depends on unknown steps: {unknown}"
+                )
+            in_degree[step.id] = len(step.depends_on)
+            for dep in step.depends_on:
+                dependents[dep].append(step.id)
+
+        remaining = dict(in_degree)
+        level = [step_id for step_id, degree in in_degree.items() if degree == 0]
+        order: list[str] = []
+        levels: list[tuple[str, ...]] = []
+        while level:
+            order.extend(level)
+            levels.append(tuple(level))
+            next_level = []
+            for step_id in level:
+                for dependent_id in dependents[step_id]:
+                    remaining[dependent_id] -= 1
+                    if remaining[dependent_id] == 0:
+                        next_level.append(dependent_id)
+            level = next_level
+
+        if len(order) < len(in_degree):
+            cyclic = sorted(step_id for step_id, degree in remaining.items() if degree > 0)
+            raise CycleDetectedError(f"Dependency cycle among steps: {cyclic}")
+
+        return Schedule(
+            order=tuple(order),
+            levels=tuple(levels),
+            dependents={step_id: tuple(ids) for step_id, ids in dependents.items()},
+            in_degree=in_degree,
+        )
 
-            # 依存先が失敗していればスキップ
-            if any(dep in failed for dep in step.depends_on):
-                step.status = StepStatus.SKIPPED
-                step.error = "Dependency failed"
-                continue
+    async def execute_step(
+        self, step: DAGStep, upstream_results: list[str] | None = None
+    ) -> DAGStep:
+        """
+        1つのステップを非同期で実行
 
-            # すべての依存先が完了していれば実行可能
-            if all(dep in completed for dep in step.depends_on):
-                step.status = StepStatus.READY
-                ready.append(step)
+        Args:
+            upstream_results: 依存先ステップの結果。step.memoize が True で、入力が
+                前回の成功時と同じなら実行せずに記録済みの結果を返す
+        """
+        key = self._memo_key(step, upstream_results or []) if step.memoize else None
+        memo = self._memo.get(step.id) if key is not None else None
+        if memo is not None and memo[0] == key:
+            step.result = memo[2]
+            step.status = StepStatus.COMPLETED
+            self._log(f"  [CACHED]  {step.id}: {step.name}")
+            return step
 
-        return ready
+        step.status = StepStatus.RUNNING
+        self._log(f"  [RUNNING] {step.id}: {step.name}")
 
-    async def execute_step(self, step: DAGStep) -> DAGStep:
-        """1つのステップを非同期で実行"""
-        async with self.semaphore:
-            step.status = StepStatus.RUNNING
-            print(f"  [RUNNING] {step.id}: {step.name}")
+        try:
+            # 同期関数を非同期で実行
+            loop = self._loop or asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._pool, functools.partial(step.action, **step.params)
+            )
 
-            try:
-                # 同期関数を非同期で実行
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    None, lambda: step.action(**step.params)
-                )
+            step.result = result
+            step.status = StepStatus.COMPLETED
+            if key is not None:
+                self._memo[step.id] = (key, step.action, result)
+            self._log(f"  [DONE]    {step.id}: {step.name}")
 
-                step.result = result
-                step.status = StepStatus.COMPLETED
-                print(f"  [DONE]    {step.id}: {step.name}")
+        except Exception as e:
+            step.error = str(e)
+            step.status = StepStatus.FAILED
+            self._log(f"  [FAILED]  {step.id}: {step.name} - {e}")
 
-            except Exception as e:
-                step.error = str(e)
-                step.status = StepStatus.FAILED
-                print(f"  [FAILED]  {step.id}: {step.name} - {e}")
+        return step
 
-            return step
+    async def execute(
+        self, steps: list[DAGStep], schedule: Schedule | None = None
+    ) -> DAGExecutionResult:
+        """
+        DAGを並列実行（Kahn のアルゴリズム）
+
+        各ステップの未完了の依存数（入次数）と逆向きの隣接リストは compile で
+        一度だけ作り、入次数0のステップを待ち行列に入れる。ステップが完了するたびに
+        依存元の入次数を減らし、0 になったものをその場で待ち行列に追加する。
+        全ステップの再走査やポーリング待ちは発生しない。
 
-    async def execute(self, steps: list[DAGStep]) -> DAGExecutionResult:
-        """DAGを並列実行"""
+        Args:
+            schedule: compile 済みの実行計画（省略時はここで compile する）
+        """
         import time
 
+        if schedule is None:
+            schedule = self.compile(steps)
+        by_id = {step.id: step for step in steps}
+        if by_id.keys() != schedule.in_degree.keys():
+            raise ValueError("Schedule does not match the given steps")
         start_time = time.time()
-        completed: set[str] = set()
-        failed: set[str] = set()
 
         print("\n" + "=" * 50)
         print("DAG Parallel Execution")
         print("=" * 50)
 
-        # 依存関係のないステップは即座に実行可能
+        in_degree = dict(schedule.in_degree)  # 実行ごとに減らすのでコピーを使う
+        dependents = schedule.dependents
+
+        # 同時実行数は固定数のワーカーで制限する（ステップごとのタスク生成やセマフォ待ちはない）。
+        # ワーカー自身が依存元を投入するため、上限付きキューにすると全員が put で詰まりうる
+        ready: asyncio.Queue[DAGStep | None] = asyncio.Queue()
         for step in steps:
-            if not step.depends_on:
+            if in_degree[step.id] == 0:
                 step.status = StepStatus.READY
+                ready.put_nowait(step)
+        outstanding = ready.qsize()  # 待ち行列内と実行中のステップ数
+        counts: Counter[StepStatus] = Counter()  # 状態が確定するたびに加算
+        num_workers = max(1, min(self.max_concurrency, len(steps)))
+
+        def skip_dependents(step_id: str) -> None:
+            """失敗したステップに（推移的に）依存するステップをスキップ"""
+            stack = list(dependents[step_id])
+            while stack:
+                dependent = by_id[stack.pop()]
+                if dependent.status != StepStatus.PENDING:
+                    continue
+                dependent.status = StepStatus.SKIPPED
+                dependent.error = "Dependency failed"
+                counts[StepStatus.SKIPPED] += 1
+                stack.extend(dependents[dependent.id])
+
+        async def worker() -> None:
+            nonlocal outstanding
+            while (step := await ready.get()) is not None:
+                upstream_results = [by_id[dep].result for dep in step.depends_on]
+                await self.execute_step(step, upstream_results)
+                counts[step.status] += 1
 
-        iteration = 0
-        while True:
-            iteration += 1
-            print(f"\n--- Iteration {iteration} ---")
-
-            # 実行可能なステップを取得
-            ready_steps = self.get_ready_steps(steps, completed, failed)
-
-            if not ready_steps:
-                # 実行中のステップもなければ終了
-                running = [s for s in steps if s.status == StepStatus.RUNNING]
-                if not running:
-                    break
-                # 実行中があれば待機
-                await asyncio.sleep(0.1)
-                continue
-
-            print(f"Ready steps: {[s.id for s in ready_steps]}")
-
-            # 並列実行
-            tasks = [self.execute_step(step) for step in ready_steps]
-            results = await asyncio.gather(*tasks)
-
-            # 結果を記録
-            for step in results:
                 if step.status == StepStatus.COMPLETED:
-                    completed.add(step.id)
-                elif step.status == StepStatus.FAILED:
-                    failed.add(step.id)
+                    for dependent_id in dependents[step.id]:
+                        in_degree[dependent_id] -= 1
+                        dependent = by_id[dependent_id]
+                        if in_degree[dependent_id] > 0:
+                            continue
+                        if dependent.status == StepStatus.PENDING:
+                            dependent.status = StepStatus.READY
+                            ready.put_nowait(dependent)
+                            outstanding += 1
+                else:
+                    skip_dependents(step.id)
+
+                outstanding -= 1
+                if outstanding == 0:
+                    # 実行できるステップが尽きたので全ワーカーを終了させる
+                    for _ in range(num_workers):
+                        ready.put_nowait(None)
+
+        if outstanding:
+            print(f"Ready steps: {[s.id for s in steps if s.status == StepStatus.READY]}")
+            self._loop = asyncio.get_running_loop()
+            try:
+                await asyncio.gather(*(worker() for _ in range(num_workers)))
+            finally:
+                self._loop = None
+        self._flush_log()
 
         total_time = time.time() - start_time
 
         # 直列実行との比較（概算）
-        serial_time = sum(
-            1.0 for s in steps if s.status == StepStatus.COMPLETED
-        )  # 各ステップ1秒と仮定
+        serial_time = float(counts[StepStatus.COMPLETED])  # 各ステップ1秒と仮定
         speedup = serial_time / total_time if total_time > 0 else 1.0
 
         return DAGExecutionResult(
-            steps=steps, total_time=total_time, parallel_speedup=speedup
+            steps=steps, total_time=total_time, parallel_speedup=speedup, counts=counts
         )
 
 
@@ -212,6 +371,9 @@ def create_sample_dag() -> list[DAGStep]:
     """
     サンプルDAGを作成
 
+    fetch_data 以外は入力が同じなら結果も同じなので memoize=True にする
+    （DAG を作るたびにラムダが作り直されるので、cache_key で同じ処理だと示す）。
+
     依存関係グラフ:
         fetch_data ──┬──▶ process_a ──┬──▶ merge_results ──▶ generate_report
                      ├──▶ process_b ──┤
@@ -231,30 +393,40 @@ def create_sample_dag() -> list[DAGStep]:
             id="process_a",
             name="処理A（分析）",
             action=lambda: simulate_task("process_a"),
+            memoize=True,
+            cache_key="simulate_task:process_a",
             depends_on=["fetch_data"],
         ),
         DAGStep(
             id="process_b",
             name="処理B（変換）",
             action=lambda: simulate_task("process_b"),
+            memoize=True,
+            cache_key="simulate_task:process_b",
             depends_on=["fetch_data"],
         ),
         DAGStep(
             id="process_c",
             name="処理C（検証）",
             action=lambda: simulate_task("process_c"),
+            memoize=True,
+            cache_key="simulate_task:process_c",
             depends_on=["fetch_data"],
         ),
         DAGStep(
             id="merge_results",
             name="結果統合",
             action=lambda: simulate_task("merge_results"),
+            memoize=True,
+            cache_key="simulate_task:merge_results",
             depends_on=["process_a", "process_b", "process_c"],
         ),
         DAGStep(
             id="generate_report",
             name="レポート生成",
             action=lambda: simulate_task("generate_report"),
+            memoize=True,
+            cache_key="simulate_task:generate_report",
             depends_on=["merge_results"],
         ),
     ]
@@ -265,20 +437,28 @@ def visualize_dag(steps: list[DAGStep]) -> None:
     print("\nDAG Structure:")
     print("-" * 40)
 
-    # レベルごとにグループ化
-    levels: dict[int, list[DAGStep]] = {}
-    step_levels: dict[str, int] = {}
-
+    # レベルごとにグループ化（Kahn のアルゴリズムで入力の並び順に依存せず1回の走査で決める）
+    in_degree = {step.id: len(step.depends_on) for step in steps}
+    children: defaultdict[str, list[str]] = defaultdict(list)
     for step in steps:
-        if not step.depends_on:
-            level = 0
-        else:
-            level = max(step_levels.get(dep, 0) for dep in step.depends_on) + 1
-        step_levels[step.id] = level
-
-        if level not in levels:
-            levels[level] = []
-        levels[level].append(step)
+        for dep in step.depends_on:
+            children[dep].append(step.id)
+
+    step_levels = {step_id: 0 for step_id, degree in in_degree.items() if degree == 0}
+    queue = deque(step_levels)
+    while queue:
+        step_id = queue.popleft()
+        for child_id in children[step_id]:
+            # 最後の依存先が処理された時点で max(依存先のレベル) + 1 が確定する
+            step_levels[child_id] = max(step_levels.get(child_id, 0), step_levels[step_id] + 1)
+            in_degree[child_id] -= 1
+            if in_degree[child_id] == 0:
+                queue.append(child_id)
+
+    levels: defaultdict[int, list[DAGStep]] = defaultdict(list)
+    for step in steps:
+        if in_degree[step.id] == 0:
+            levels[step_levels[step.id]].append(step)
 
     for level in sorted(levels.keys()):
         step_names = [f"{s.id}" for s in levels[level]]
@@ -320,6 +500,15 @@ async def main():
         }.get(step.status, "?")
         print(f"  {status_icon} {step.id}: {step.status.value}")
 
+    # 同じ入力での再実行では、memoize=True のステップは記録済みの結果を使う
+    # （fetch_data は毎回実行する。DAG の形も同じなので実行計画も再利用）
+    print("\nRe-run with unchanged inputs:")
+    schedule = executor.compile(steps)
+    result = await executor.execute(create_sample_dag(), schedule)
+    print(f"Total time: {result.total_time:.2f}s")
+
+    await executor.aclose()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -9,27 +9,42 @@ src/ のReActエージェントとは独立した実装例として提供して
 
 必要な環境変数:
     GEMINI_API_KEY: Google Gemini API キー
+
+任意の環境変数:
+    PLAN_EXECUTE_NO_CACHE: 1 にすると LLM 応答のキャッシュを使わない
 """
 
 from __future__ import annotations
 
+import ast
+import asyncio
+import functools
+import hashlib
 import json
+import operator
 import os
-import re
+import sqlite3
 from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Callable
 from dataclasses import dataclass, field
-from typing import Any
+from pathlib import Path
+from typing import Any, TypeVar
 
 from google import genai
 from google.genai import types
 
+# LLM レスポンス中の JSON を最初の "{" から線形時間でデコードする
+# （正規表現の貪欲マッチや部分文字列のコピーを避ける）
+_JSON_DECODER = json.JSONDecoder()
+
 
 # =============================================================================
 # データ構造
 # =============================================================================
 
 
-@dataclass
+@dataclass(slots=True)
 class PlanStep:
     """計画の1ステップを表現"""
 
@@ -40,7 +55,7 @@ class PlanStep:
     depends_on: list[int] = field(default_factory=list)  # 依存するステップID
 
 
-@dataclass
+@dataclass(slots=True)
 class StepResult:
     """ステップの実行結果"""
 
@@ -50,7 +65,7 @@ class StepResult:
     error: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PlanExecuteState:
     """エージェントの状態"""
 
@@ -58,6 +73,7 @@ class PlanExecuteState:
     plan: list[PlanStep] = field(default_factory=list)
     current_step_index: int = 0
     step_results: list[StepResult] = field(default_factory=list)
+    status_counts: Counter[str] = field(default_factory=Counter)  # 結果の status ごとの件数
     status: str = "planning"  # planning, executing, replanning, completed, failed
 
     @property
@@ -93,12 +109,25 @@ class Tool(ABC):
 
 class ReadFileTool(Tool):
     name = "read_file"
-    description = "ファイルの内容を読み込む"
+    description = (
+        "ファイルの内容を読み込む（params: path, 任意で offset=開始バイト位置, "
+        "max_bytes=読み込む最大バイト数。既定は先頭から1MiBまで）"
+    )
+
+    MAX_BYTES = 1_048_576  # 巨大なファイルを丸ごとメモリに載せない
 
-    def execute(self, path: str) -> str:
+    def execute(self, path: str, offset: int = 0, max_bytes: int | None = None) -> str:
         try:
-            with open(path, encoding="utf-8") as f:
-                return f.read()
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(offset)
+                data = f.read(max_bytes or self.MAX_BYTES)
+            text = data.decode("utf-8", errors="replace")
+            end = offset + len(data)
+            if end < size:
+                # 続きはページングで読めるよう次の offset を伝える
+                text += f"\n... (truncated: {size - end} more bytes, use offset={end})"
+            return text
         except FileNotFoundError:
             return f"Error: File not found: {path}"
         except Exception as e:
@@ -139,42 +168,192 @@ class ListFilesTool(Tool):
             return f"Error: {e}"
 
 
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_MAX_EXPONENT = 1000  # 9**9**9 のような巨大な累乗で固まらないようにする
+# 整数の結果のビット数の上限（(10**1000)**1000 や 9**999*9**999*... で固まらないようにする）
+_MAX_INT_BITS = 10_000
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_expression(expression: str) -> ast.Expression:
+    """数式を構文木に変換（同じ式の繰り返しでは再パースしない）"""
+    return ast.parse(expression.strip(), mode="eval")
+
+
+def _evaluate(node: ast.AST) -> int | float:
+    """四則演算・累乗・単項符号と数値リテラルだけを評価（eval を使わない）"""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and abs(right) > _MAX_EXPONENT:
+            raise ValueError(f"Exponent too large: {right}")
+        _check_result_size(node.op, left, right)
+        result = _BINARY_OPERATORS[type(node.op)](left, right)
+        if isinstance(result, int) and result.bit_length() > _MAX_INT_BITS:
+            raise ValueError("Result too large")
+        return result
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+    raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+
+
+def _check_result_size(op: ast.operator, left: int | float, right: int | float) -> None:
+    """整数の乗算・累乗の結果が大きくなりすぎる場合は、計算する前にエラーにする"""
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return
+    if isinstance(op, ast.Pow) and right > 0:
+        bits = left.bit_length() * right
+    elif isinstance(op, ast.Mult):
+        bits = left.bit_length() + right.bit_length()
+    else:
+        return
+    if bits > _MAX_INT_BITS:
+        raise ValueError("Result too large")
+
+
 class CalculateTool(Tool):
     name = "calculate"
     description = "数式を計算する"
 
     def execute(self, expression: str) -> str:
         try:
-            # 安全のため、限定的な評価
-            allowed = set("0123456789+-*/().  ")
-            if not all(c in allowed for c in expression):
-                return "Error: Invalid characters in expression"
-            result = eval(expression)  # 教育目的のみ
+            # 構文木を走査して数値演算だけを評価する
+            result = _evaluate(_parse_expression(expression))
             return str(result)
+        except SyntaxError:
+            return "Error: Invalid expression"
         except Exception as e:
             return f"Error: {e}"
 
 
+# =============================================================================
+# LLM 呼び出しとプロンプトキャッシュ
+# =============================================================================
+
+
+MODEL = "gemini-2.0-flash"
+TEMPERATURE = 0.2
+
+
+class PromptCache:
+    """
+    プロンプトの BLAKE2b をキーにした LLM 応答の永続キャッシュ（SQLite）
+
+    同じゴール・同じツール構成での計画や再計画は API を呼ばずに
+    前回の応答を再利用する。キーにはモデル名と温度も含める。
+    """
+
+    DEFAULT_PATH = Path.home() / ".cache" / "plan_execute" / "prompts.sqlite"
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else self.DEFAULT_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, text TEXT)"
+        )
+
+    @staticmethod
+    def key(prompt: str, model: str = MODEL, temperature: float = TEMPERATURE) -> str:
+        return hashlib.blake2b(f"{model}\0{temperature}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, text: str) -> None:
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, text))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_T = TypeVar("_T")
+
+
+async def _generate_parsed(
+    llm: Any, prompt: str, cache: PromptCache | None, parse: Callable[[str], _T]
+) -> _T:
+    """
+    プロンプトを送信し、応答テキストを parse した結果を返す（キャッシュがあれば再利用）
+
+    キャッシュには parse できた応答だけを保存する（不正な応答を以降の実行で
+    再生し続けないようにする）。キャッシュ済みの応答を parse できなければ API を呼び直す。
+    """
+    key = PromptCache.key(prompt) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            try:
+                return parse(cached)
+            except ValueError:
+                pass
+
+    text = await _generate_text(llm, prompt)
+    result = parse(text)
+    if cache is not None and text:
+        cache.put(key, text)
+    return result
+
+
+async def _generate_text(llm: Any, prompt: str) -> str:
+    """プロンプトを送信して応答テキストを返す"""
+    response = await llm.aio.models.generate_content(
+        model=MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            temperature=TEMPERATURE,
+        ),
+    )
+    return response.text
+
+
 # =============================================================================
 # Planner（計画者）
 # =============================================================================
 
 
+@functools.lru_cache(maxsize=32)
+def _format_tools(tool_key: tuple[tuple[str, str], ...]) -> str:
+    """(ツール名, 説明) の組からプロンプト用のツール一覧を作成（同じ組は再利用）"""
+    return "\n".join(f"- {name}: {description}" for name, description in tool_key)
+
+
+def _tool_descriptions(tools: list[Tool]) -> str:
+    return _format_tools(tuple((tool.name, tool.description) for tool in tools))
+
+
 class Planner:
     """ユーザーのゴールから計画を生成"""
 
-    def __init__(self, llm_client: Any, tools: list[Tool]):
+    def __init__(
+        self, llm_client: Any, tools: list[Tool], cache: PromptCache | None = None
+    ):
         self.llm = llm_client
         self.tools = tools
-        self.tool_descriptions = self._format_tool_descriptions()
-
-    def _format_tool_descriptions(self) -> str:
-        return "\n".join(
-            f"- {tool.name}: {tool.description}" for tool in self.tools
-        )
+        self.cache = cache
+        self.tool_descriptions = _tool_descriptions(tools)
 
     def plan(self, goal: str) -> list[PlanStep]:
-        """ゴールから計画を生成"""
+        """ゴールから計画を生成（同期版）"""
+        return asyncio.run(self.aplan(goal))
+
+    async def aplan(self, goal: str) -> list[PlanStep]:
+        """ゴールから計画を生成（非同期クライアントを使い、他の処理と並行できる）"""
         prompt = f"""あなたはタスク計画の専門家です。
 以下のゴールを達成するための計画を作成してください。
 
@@ -210,25 +389,17 @@ class Planner:
 - JSONのみを出力し、他の説明は不要です
 """
 
-        response = self.llm.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-            ),
-        )
-
-        return self._parse_plan(response.text)
+        return await _generate_parsed(self.llm, prompt, self.cache, self._parse_plan)
 
     def _parse_plan(self, response: str) -> list[PlanStep]:
         """LLMのレスポンスから計画をパース"""
         # JSON部分を抽出
-        json_match = re.search(r"\{[\s\S]*\}", response)
-        if not json_match:
+        start = response.find("{")
+        if start < 0:
             raise ValueError(f"Could not parse plan from response: {response}")
 
         try:
-            data = json.loads(json_match.group())
+            data, _ = _JSON_DECODER.raw_decode(response, start)
             steps = []
             for step_data in data.get("steps", []):
                 steps.append(
@@ -257,9 +428,14 @@ class Executor:
         self.tools = {tool.name: tool for tool in tools}
 
     def execute_step(
-        self, step: PlanStep, previous_results: list[StepResult]
+        self, step: PlanStep, results_by_id: dict[int, StepResult]
     ) -> StepResult:
-        """1つのステップを実行"""
+        """
+        1つのステップを実行
+
+        Args:
+            results_by_id: 実行済みステップのID -> 結果（依存先の確認に使う）
+        """
         print(f"\n  [EXECUTE] Step {step.id}: {step.action}")
         print(f"            Tool: {step.tool}, Params: {step.params}")
 
@@ -274,9 +450,7 @@ class Executor:
 
         # 依存関係のチェック
         for dep_id in step.depends_on:
-            dep_result = next(
-                (r for r in previous_results if r.step.id == dep_id), None
-            )
+            dep_result = results_by_id.get(dep_id)
             if dep_result and dep_result.status == "failed":
                 return StepResult(
                     step=step,
@@ -313,12 +487,13 @@ class Executor:
 class Replanner:
     """実行結果に基づいて計画を修正"""
 
-    def __init__(self, llm_client: Any, tools: list[Tool]):
+    def __init__(
+        self, llm_client: Any, tools: list[Tool], cache: PromptCache | None = None
+    ):
         self.llm = llm_client
         self.tools = tools
-        self.tool_descriptions = "\n".join(
-            f"- {tool.name}: {tool.description}" for tool in tools
-        )
+        self.cache = cache
+        self.tool_descriptions = _tool_descriptions(tools)
 
     def should_replan(
         self, step_result: StepResult, remaining_steps: list[PlanStep]
@@ -336,7 +511,19 @@ class Replanner:
         current_result: StepResult,
         remaining_steps: list[PlanStep],
     ) -> list[PlanStep]:
-        """計画を修正"""
+        """計画を修正（同期版）"""
+        return asyncio.run(
+            self.areplan(original_goal, completed_results, current_result, remaining_steps)
+        )
+
+    async def areplan(
+        self,
+        original_goal: str,
+        completed_results: list[StepResult],
+        current_result: StepResult,
+        remaining_steps: list[PlanStep],
+    ) -> list[PlanStep]:
+        """計画を修正（非同期クライアントを使い、他の処理と並行できる）"""
         completed_summary = "\n".join(
             f"  Step {r.step.id}: {r.step.action} -> {r.status}"
             for r in completed_results
@@ -377,49 +564,45 @@ class Replanner:
 }}
 """
 
-        response = self.llm.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-            ),
-        )
-
-        return self._parse_replan(response.text, remaining_steps)
+        try:
+            return await _generate_parsed(
+                self.llm,
+                prompt,
+                self.cache,
+                lambda response: self._parse_replan(response, remaining_steps),
+            )
+        except ValueError:
+            # パース失敗時は残りの計画をそのまま返す
+            return remaining_steps
 
     def _parse_replan(
         self, response: str, remaining_steps: list[PlanStep]
     ) -> list[PlanStep]:
-        """再計画の結果をパース"""
-        json_match = re.search(r"\{[\s\S]*\}", response)
-        if not json_match:
-            # パース失敗時は残りの計画をそのまま返す
-            return remaining_steps
-
-        try:
-            data = json.loads(json_match.group())
-            decision = data.get("decision", "continue")
-
-            print(f"\n  [REPLAN] Decision: {decision}")
-            print(f"           Reason: {data.get('reason', 'N/A')}")
-
-            if decision == "abort":
-                return []
-            elif decision == "modify" and "new_steps" in data:
-                return [
-                    PlanStep(
-                        id=s["id"],
-                        action=s["action"],
-                        tool=s["tool"],
-                        params=s.get("params", {}),
-                        depends_on=s.get("depends_on", []),
-                    )
-                    for s in data["new_steps"]
-                ]
-            else:
-                return remaining_steps
-
-        except json.JSONDecodeError:
+        """再計画の結果をパース（JSON を取り出せなければ ValueError）"""
+        start = response.find("{")
+        if start < 0:
+            raise ValueError(f"Could not parse replan from response: {response}")
+
+        data, _ = _JSON_DECODER.raw_decode(response, start)
+        decision = data.get("decision", "continue")
+
+        print(f"\n  [REPLAN] Decision: {decision}")
+        print(f"           Reason: {data.get('reason', 'N/A')}")
+
+        if decision == "abort":
+            return []
+        elif decision == "modify" and "new_steps" in data:
+            return [
+                PlanStep(
+                    id=s["id"],
+                    action=s["action"],
+                    tool=s["tool"],
+                    params=s.get("params", {}),
+                    depends_on=s.get("depends_on", []),
+                )
+                for s in data["new_steps"]
+            ]
+        else:
             return remaining_steps
 
 
@@ -431,14 +614,32 @@ class Replanner:
 class PlanExecuteAgent:
     """Plan-and-Execute エージェント"""
 
-    def __init__(self, llm_client: Any, tools: list[Tool]):
-        self.planner = Planner(llm_client, tools)
+    def __init__(
+        self,
+        llm_client: Any,
+        tools: list[Tool],
+        prompt_cache: PromptCache | None = None,
+    ):
+        """
+        Args:
+            prompt_cache: 計画・再計画の LLM 応答を再利用する永続キャッシュ
+        """
+        self.planner = Planner(llm_client, tools, prompt_cache)
         self.executor = Executor(tools)
-        self.replanner = Replanner(llm_client, tools)
+        self.replanner = Replanner(llm_client, tools, prompt_cache)
         self.tools = tools
 
     def run(self, goal: str) -> str:
-        """エージェントを実行"""
+        """エージェントを実行（同期版）"""
+        return asyncio.run(self.arun(goal))
+
+    async def arun(self, goal: str) -> str:
+        """
+        エージェントを実行
+
+        LLM 呼び出し（計画・再計画）は非同期クライアントで待つため、
+        複数のエージェントを asyncio.gather で並行実行できる。
+        """
         state = PlanExecuteState(goal=goal)
 
         # Phase 1: PLAN
@@ -447,7 +648,7 @@ class PlanExecuteAgent:
         print("=" * 60)
         print(f"Goal: {goal}")
 
-        state.plan = self.planner.plan(goal)
+        state.plan = await self.planner.aplan(goal)
         state.status = "executing"
 
         print(f"\nGenerated Plan ({len(state.plan)} steps):")
@@ -460,12 +661,15 @@ class PlanExecuteAgent:
         print("Phase 2: EXECUTING")
         print("=" * 60)
 
+        results_by_id: dict[int, StepResult] = {}
         while state.current_step is not None:
             step = state.current_step
 
             # ステップを実行
-            result = self.executor.execute_step(step, state.step_results)
+            result = self.executor.execute_step(step, results_by_id)
             state.step_results.append(result)
+            state.status_counts[result.status] += 1
+            results_by_id[step.id] = result
 
             # 失敗時は再計画を検討
             if result.status == "failed":
@@ -473,7 +677,7 @@ class PlanExecuteAgent:
 
                 if self.replanner.should_replan(result, state.remaining_steps[1:]):
                     state.status = "replanning"
-                    new_remaining = self.replanner.replan(
+                    new_remaining = await self.replanner.areplan(
                         state.goal,
                         state.step_results,
                         result,
@@ -503,13 +707,9 @@ class PlanExecuteAgent:
         print(f"Status: {state.status}")
         print(f"Steps executed: {len(state.step_results)}")
 
-        success_count = sum(1 for r in state.step_results if r.status == "success")
-        failed_count = sum(1 for r in state.step_results if r.status == "failed")
-        skipped_count = sum(1 for r in state.step_results if r.status == "skipped")
-
-        print(f"  - Success: {success_count}")
-        print(f"  - Failed: {failed_count}")
-        print(f"  - Skipped: {skipped_count}")
+        print(f"  - Success: {state.status_counts['success']}")
+        print(f"  - Failed: {state.status_counts['failed']}")
+        print(f"  - Skipped: {state.status_counts['skipped']}")
 
         # 最後の成功結果を返す
         successful_results = [r for r in state.step_results if r.status == "success"]
@@ -542,8 +742,11 @@ def main():
         CalculateTool(),
     ]
 
+    # 同じプロンプトへの応答はキャッシュから再利用（PLAN_EXECUTE_NO_CACHE=1 で無効化）
+    prompt_cache = None if os.environ.get("PLAN_EXECUTE_NO_CACHE") == "1" else PromptCache()
+
     # エージェントを作成
-    agent = PlanExecuteAgent(client, tools)
+    agent = PlanExecuteAgent(client, tools, prompt_cache=prompt_cache)
 
     # デモタスクを実行
     print("\n" + "#" * 60)
@@ -552,7 +755,7 @@ def main():
 
     # シンプルなタスク
     goal = "カレントディレクトリのファイル一覧を表示してください"
-    result = agent.run(goal)
+    result = asyncio.run(agent.arun(goal))
     print(f"\nFinal Result:\n{result}")
 
 
@@ -15,13 +15,18 @@ https://arxiv.org/abs/2303.11366
 
 from __future__ import annotations
 
-import json
+import asyncio
+import functools
 import os
-import re
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any
+from string import Template
+from typing import Any, Literal
+
+import numpy as np
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 
 # =============================================================================
@@ -35,7 +40,7 @@ class EvaluationResult(Enum):
     FAILURE = "failure"
 
 
-@dataclass
+@dataclass(slots=True)
 class Evaluation:
     """評価結果"""
 
@@ -49,7 +54,7 @@ class Evaluation:
         return self.result == EvaluationResult.SUCCESS
 
 
-@dataclass
+@dataclass(slots=True)
 class Reflection:
     """反省内容"""
 
@@ -74,7 +79,37 @@ Trial {self.trial_number}:
 """
 
 
-@dataclass
+class ActionDTO(BaseModel):
+    """LLM の構造化出力（アクション）"""
+
+    action: str
+    result: str
+
+
+class ReflectionDTO(BaseModel):
+    """LLM の構造化出力（反省）"""
+
+    what_went_wrong: str
+    why_it_happened: str
+    how_to_improve: str
+
+
+class EvaluationDTO(BaseModel):
+    """LLM の構造化出力（評価）"""
+
+    result: Literal["success", "partial", "failure"]
+    score: float
+    feedback: str
+
+    def to_evaluation(self) -> Evaluation:
+        return Evaluation(
+            result=EvaluationResult(self.result),
+            score=self.score,
+            feedback=self.feedback,
+        )
+
+
+@dataclass(slots=True)
 class Trial:
     """1回の試行"""
 
@@ -85,6 +120,145 @@ class Trial:
     reflection: Reflection | None = None
 
 
+# =============================================================================
+# Episodic Memory
+# =============================================================================
+
+
+class ReflectionMemory:
+    """
+    反省を蓄積し、タスクに関連する上位k件をプロンプト用に詰める
+
+    embed を渡すと、反省の埋め込みを (N, dim) の float32 行列に保持し、
+    タスクとのコサイン類似度で上位k件を選ぶ。省略時は直近k件を使う。
+    選んだ反省は ID（追加順）でソートして連結し、同じ組み合わせなら
+    同じ文字列を返す（プレフィックスキャッシュが効きやすい）。
+    """
+
+    DEFAULT_K = 3
+
+    def __init__(self, embed: Callable[[str], Any] | None = None):
+        """
+        Args:
+            embed: テキストを埋め込みベクトルに変換する関数
+        """
+        self.reflections: list[Reflection] = []
+        self._embed = embed
+        self._vectors: list[np.ndarray] = []
+        self._matrix: np.ndarray | None = None  # 追加時に無効化し、pack 時に再構築
+        self._embed_query = functools.lru_cache(maxsize=256)(self._embed_normalized)
+        self._render = functools.lru_cache(maxsize=256)(self._render_uncached)
+
+    def append(self, reflection: Reflection) -> None:
+        """反省を追加（ID は追加順のインデックス）"""
+        vector = None
+        if self._embed is not None:
+            vector = self._embed_normalized(self._reflection_text(reflection))
+        self._add(reflection, vector)
+
+    async def aappend(self, reflection: Reflection) -> None:
+        """append の非同期版（埋め込みの API 呼び出しでイベントループを止めない）"""
+        vector = None
+        if self._embed is not None:
+            vector = await asyncio.to_thread(
+                self._embed_normalized, self._reflection_text(reflection)
+            )
+        self._add(reflection, vector)
+
+    def fork(self) -> ReflectionMemory:
+        """同じ埋め込み関数を使う空のメモリ（タスクごとに反省を分けるときに使う）"""
+        return ReflectionMemory(embed=self._embed)
+
+    def extend(self, other: ReflectionMemory) -> None:
+        """other の反省を追加（同じ埋め込み関数なら埋め込みは計算し直さない）"""
+        if other._embed is not self._embed:
+            for reflection in other:
+                self.append(reflection)
+            return
+        vectors = other._vectors if self._embed is not None else [None] * len(other)
+        for reflection, vector in zip(other.reflections, vectors):
+            self._add(reflection, vector)
+
+    def pack(self, task: str, k: int = DEFAULT_K) -> str:
+        """タスクに関連する上位k件の反省をプロンプト用の文字列にする"""
+        query = self._embed_query(task) if self._uses_similarity(k) else None
+        return self._pack(query, k)
+
+    async def apack(self, task: str, k: int = DEFAULT_K) -> str:
+        """pack の非同期版（クエリの埋め込みは別スレッドで計算する）"""
+        query = None
+        if self._uses_similarity(k):
+            query = await asyncio.to_thread(self._embed_query, task)
+        return self._pack(query, k)
+
+    def _add(self, reflection: Reflection, vector: np.ndarray | None) -> None:
+        self.reflections.append(reflection)
+        if vector is not None:
+            self._vectors.append(vector)
+            self._matrix = None
+
+    def _uses_similarity(self, k: int) -> bool:
+        """類似度で選ぶか（埋め込みがなく全件が収まる場合は直近k件を使う）"""
+        return self._embed is not None and 0 < k < len(self.reflections)
+
+    def _pack(self, query: np.ndarray | None, k: int) -> str:
+        if not self.reflections or k <= 0:
+            return ""
+
+        n = len(self.reflections)
+        if query is None:
+            ids = range(max(n - k, 0), n)
+        else:
+            if self._matrix is None:
+                self._matrix = np.stack(self._vectors)
+            scores = self._matrix @ query
+            ids = np.argpartition(-scores, k - 1)[:k]
+
+        return self._render(tuple(sorted(int(i) for i in ids)))
+
+    def _render_uncached(self, ids: tuple[int, ...]) -> str:
+        return "\n".join(self.reflections[i].to_prompt() for i in ids)
+
+    def _embed_normalized(self, text: str) -> np.ndarray:
+        vector = np.asarray(self._embed(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    @staticmethod
+    def _reflection_text(reflection: Reflection) -> str:
+        return (
+            f"{reflection.task}\n{reflection.what_went_wrong}\n"
+            f"{reflection.why_it_happened}\n{reflection.how_to_improve}"
+        )
+
+    def __len__(self) -> int:
+        return len(self.reflections)
+
+    def __iter__(self) -> Iterator[Reflection]:
+        return iter(self.reflections)
+
+    def __getitem__(self, index):
+        return self.reflections[index]
+
+
+def gemini_embedder(
+    client: Any, model: str = "text-embedding-004"
+) -> Callable[[str], list[float]]:
+    """Gemini の埋め込み API を使う embed 関数を作成"""
+
+    def embed(text: str) -> list[float]:
+        response = client.models.embed_content(model=model, contents=text)
+        return response.embeddings[0].values
+
+    return embed
+
+
+async def _pack_reflections(task: str, past_reflections: list[Reflection]) -> str:
+    """プロンプトに含める過去の反省を取得"""
+    if isinstance(past_reflections, ReflectionMemory):
+        return await past_reflections.apack(task)
+    return "\n".join(r.to_prompt() for r in past_reflections[-3:])  # 直近3件
+
+
 # =============================================================================
 # コンポーネント
 # =============================================================================
@@ -94,7 +268,7 @@ class Actor(ABC):
     """タスクを実行するコンポーネント"""
 
     @abstractmethod
-    def execute(
+    async def execute(
         self, task: str, past_reflections: list[Reflection]
     ) -> tuple[str, str]:
         """
@@ -114,7 +288,7 @@ class Evaluator(ABC):
     """結果を評価するコンポーネント"""
 
     @abstractmethod
-    def evaluate(self, task: str, action: str, result: str) -> Evaluation:
+    async def evaluate(self, task: str, action: str, result: str) -> Evaluation:
         """
         結果を評価
 
@@ -128,12 +302,26 @@ class Evaluator(ABC):
         """
         pass
 
+    async def evaluate_batch(
+        self, items: list[tuple[str, str, str]]
+    ) -> list[Evaluation]:
+        """
+        複数の (task, action, result) をまとめて評価
+
+        デフォルトでは evaluate を並行実行する。
+        1回のリクエストで評価できる実装はオーバーライドする。
+
+        Returns:
+            items と同じ順序の評価結果
+        """
+        return list(await asyncio.gather(*[self.evaluate(*item) for item in items]))
+
 
 class ReflectionGenerator(ABC):
     """反省を生成するコンポーネント"""
 
     @abstractmethod
-    def generate(
+    async def generate(
         self,
         task: str,
         trial: Trial,
@@ -158,13 +346,170 @@ class ReflectionGenerator(ABC):
 # =============================================================================
 
 
+# 静的な指示と出力形式はシステムプロンプトに置き、可変部分（タスク・結果・反省）は
+# contents の末尾に渡す。呼び出し間でプロンプトの先頭が一致するため、
+# プロバイダーのプレフィックスキャッシュが効く。
+
+ACTOR_SYSTEM_PROMPT = """あなたはタスクを実行するエージェントです。
+
+過去の失敗から学び、より良いアプローチを取ってください。
+
+実行するアクションを説明し、その結果を返してください。
+
+出力形式:
+{
+    "action": "取るアクションの説明",
+    "result": "アクションの結果"
+}
+"""
+
+EVALUATOR_SYSTEM_PROMPT = """あなたはタスク実行の評価者です。
+
+与えられたタスク・アクション・結果を評価してください。
+
+出力形式:
+{
+    "result": "success" | "partial" | "failure",
+    "score": 0.0-1.0,
+    "feedback": "評価の詳細"
+}
+"""
+
+REFLECTION_SYSTEM_PROMPT = """あなたはタスク実行の反省を行うエージェントです。
+
+与えられた試行を深く分析し、次回の改善につなげる反省を生成してください。
+
+重要: 具体的で実行可能な改善案を含めてください。
+
+出力形式:
+{
+    "what_went_wrong": "何が問題だったか",
+    "why_it_happened": "なぜその問題が発生したか",
+    "how_to_improve": "次回どう改善すべきか（具体的な手順）"
+}
+"""
+
+# 可変部分のテンプレート（モジュール読み込み時に一度だけ作成）
+ACTOR_PROMPT_TEMPLATE = Template("""タスク: $task
+$reflections""")
+
+EVALUATION_ENTRY_TEMPLATE = Template("""タスク: $task
+
+実行されたアクション:
+$action
+
+結果:
+$result
+""")
+
+EVALUATION_BATCH_TEMPLATE = Template(
+    """以下の${count}件をそれぞれ評価し、同じ順序の JSON 配列で返してください。
+$entries"""
+)
+
+REFLECTION_PROMPT_TEMPLATE = Template("""タスク: $task
+
+今回の試行:
+- アクション: $action
+- 結果: $result
+- 評価: $evaluation (score: $score)
+- フィードバック: $feedback
+$reflections""")
+
+
+class _JSONValueScanner:
+    """
+    ストリームで届くJSONテキストを逐次走査し、トップレベルの値
+    （オブジェクト/配列）が閉じた位置を検出する
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.offset = 0
+        self.end: int | None = None  # 閉じ括弧の直後の位置
+
+    def feed(self, text: str) -> bool:
+        """テキストを追加し、トップレベルの値が閉じたら True を返す"""
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    self.end = self.offset + i + 1
+                    return True
+        self.offset += len(text)
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def _type_adapter(schema: Any) -> TypeAdapter:
+    """スキーマごとの TypeAdapter（検証器の構築は一度だけ）"""
+    return TypeAdapter(schema)
+
+
+async def _generate_structured(
+    llm: Any, prompt: str, system_instruction: str, schema: Any
+) -> tuple[Any | None, str]:
+    """
+    構造化出力をストリーミングで生成
+
+    チャンクを受け取りながらJSONを走査し、トップレベルの値が閉じた時点で
+    ストリームを打ち切ってパースする。
+
+    Returns:
+        (パース結果（失敗時は None）, 受信したテキスト)
+    """
+    stream = await llm.aio.models.generate_content_stream(
+        model="gemini-2.0-flash",
+        contents=prompt,
+        config={
+            "system_instruction": system_instruction,
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+        },
+    )
+
+    scanner = _JSONValueScanner()
+    parts = []
+    try:
+        async for chunk in stream:
+            text = chunk.text or ""
+            parts.append(text)
+            if scanner.feed(text):
+                break
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    text = "".join(parts)
+    try:
+        return _type_adapter(schema).validate_json(text[: scanner.end]), text
+    except ValidationError:
+        return None, text
+
+
 class LLMActor(Actor):
     """LLMを使用したActor"""
 
     def __init__(self, llm_client: Any):
         self.llm = llm_client
 
-    def execute(
+    async def execute(
         self, task: str, past_reflections: list[Reflection]
     ) -> tuple[str, str]:
         # 過去の反省を含むプロンプトを構築
@@ -172,37 +517,16 @@ class LLMActor(Actor):
         if past_reflections:
             reflection_context = """
 過去の試行からの学び:
-""" + "\n".join(r.to_prompt() for r in past_reflections[-3:])  # 直近3件
+""" + await _pack_reflections(task, past_reflections)
 
-        prompt = f"""あなたはタスクを実行するエージェントです。
+        prompt = ACTOR_PROMPT_TEMPLATE.substitute(task=task, reflections=reflection_context)
 
-タスク: {task}
-
-{reflection_context}
-
-過去の失敗から学び、より良いアプローチを取ってください。
-
-実行するアクションを説明し、その結果を返してください。
-
-出力形式:
-{{
-    "action": "取るアクションの説明",
-    "result": "アクションの結果"
-}}
-"""
-
-        response = self.llm.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
+        parsed, text = await _generate_structured(
+            self.llm, prompt, ACTOR_SYSTEM_PROMPT, ActionDTO
         )
-
-        try:
-            data = json.loads(
-                re.search(r"\{[\s\S]*\}", response.text).group()
-            )
-            return data.get("action", ""), data.get("result", "")
-        except (json.JSONDecodeError, AttributeError):
-            return response.text, "結果を解析できませんでした"
+        if parsed is None:
+            return text, "結果を解析できませんでした"
+        return parsed.action, parsed.result
 
 
 class LLMEvaluator(Evaluator):
@@ -211,50 +535,54 @@ class LLMEvaluator(Evaluator):
     def __init__(self, llm_client: Any, success_criteria: str = ""):
         self.llm = llm_client
         self.success_criteria = success_criteria
+        # 成功基準はインスタンスごとに固定なのでシステムプロンプトに含める
+        self._system_prompt = (
+            EVALUATOR_SYSTEM_PROMPT
+            + f"\n成功基準: {success_criteria or 'タスクが正しく完了すること'}\n"
+        )
 
-    def evaluate(self, task: str, action: str, result: str) -> Evaluation:
-        prompt = f"""あなたはタスク実行の評価者です。
-
-タスク: {task}
-成功基準: {self.success_criteria or "タスクが正しく完了すること"}
-
-実行されたアクション:
-{action}
-
-結果:
-{result}
-
-この結果を評価してください。
-
-出力形式:
-{{
-    "result": "success" | "partial" | "failure",
-    "score": 0.0-1.0,
-    "feedback": "評価の詳細"
-}}
-"""
+    async def evaluate(self, task: str, action: str, result: str) -> Evaluation:
+        prompt = EVALUATION_ENTRY_TEMPLATE.substitute(task=task, action=action, result=result)
 
-        response = self.llm.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
+        parsed, _ = await _generate_structured(
+            self.llm, prompt, self._system_prompt, EvaluationDTO
         )
-
-        try:
-            data = json.loads(
-                re.search(r"\{[\s\S]*\}", response.text).group()
-            )
-            result_str = data.get("result", "failure")
-            return Evaluation(
-                result=EvaluationResult(result_str),
-                score=float(data.get("score", 0.0)),
-                feedback=data.get("feedback", ""),
-            )
-        except (json.JSONDecodeError, AttributeError, ValueError):
+        if parsed is None:
             return Evaluation(
                 result=EvaluationResult.FAILURE,
                 score=0.0,
                 feedback="評価を解析できませんでした",
             )
+        return parsed.to_evaluation()
+
+    async def evaluate_batch(
+        self, items: list[tuple[str, str, str]]
+    ) -> list[Evaluation]:
+        """1回の LLM 呼び出しで複数の結果を評価（JSON 配列で返させる）"""
+        if not items:
+            return []
+
+        entries = "\n".join(
+            f"\n[{i}]\n"
+            + EVALUATION_ENTRY_TEMPLATE.substitute(task=task, action=action, result=result)
+            for i, (task, action, result) in enumerate(items)
+        )
+
+        prompt = EVALUATION_BATCH_TEMPLATE.substitute(count=len(items), entries=entries)
+
+        parsed, _ = await _generate_structured(
+            self.llm, prompt, self._system_prompt, list[EvaluationDTO]
+        )
+        if not isinstance(parsed, list) or len(parsed) != len(items):
+            return [
+                Evaluation(
+                    result=EvaluationResult.FAILURE,
+                    score=0.0,
+                    feedback="評価を解析できませんでした",
+                )
+                for _ in items
+            ]
+        return [dto.to_evaluation() for dto in parsed]
 
 
 class LLMReflectionGenerator(ReflectionGenerator):
@@ -263,7 +591,7 @@ class LLMReflectionGenerator(ReflectionGenerator):
     def __init__(self, llm_client: Any):
         self.llm = llm_client
 
-    def generate(
+    async def generate(
         self,
         task: str,
         trial: Trial,
@@ -273,51 +601,22 @@ class LLMReflectionGenerator(ReflectionGenerator):
         if past_reflections:
             past_context = """
 過去の反省:
-""" + "\n".join(r.to_prompt() for r in past_reflections[-3:])
-
-        prompt = f"""あなたはタスク実行の反省を行うエージェントです。
-
-タスク: {task}
-
-今回の試行:
-- アクション: {trial.action}
-- 結果: {trial.result}
-- 評価: {trial.evaluation.result.value} (score: {trial.evaluation.score:.2f})
-- フィードバック: {trial.evaluation.feedback}
+""" + await _pack_reflections(task, past_reflections)
 
-{past_context}
-
-この試行を深く分析し、次回の改善につなげる反省を生成してください。
-
-重要: 具体的で実行可能な改善案を含めてください。
-
-出力形式:
-{{
-    "what_went_wrong": "何が問題だったか",
-    "why_it_happened": "なぜその問題が発生したか",
-    "how_to_improve": "次回どう改善すべきか（具体的な手順）"
-}}
-"""
-
-        response = self.llm.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
+        prompt = REFLECTION_PROMPT_TEMPLATE.substitute(
+            task=task,
+            action=trial.action,
+            result=trial.result,
+            evaluation=trial.evaluation.result.value,
+            score=f"{trial.evaluation.score:.2f}",
+            feedback=trial.evaluation.feedback,
+            reflections=past_context,
         )
 
-        try:
-            data = json.loads(
-                re.search(r"\{[\s\S]*\}", response.text).group()
-            )
-            return Reflection(
-                trial_number=trial.number,
-                task=task,
-                action_taken=trial.action,
-                evaluation=trial.evaluation,
-                what_went_wrong=data.get("what_went_wrong", ""),
-                why_it_happened=data.get("why_it_happened", ""),
-                how_to_improve=data.get("how_to_improve", ""),
-            )
-        except (json.JSONDecodeError, AttributeError):
+        parsed, _ = await _generate_structured(
+            self.llm, prompt, REFLECTION_SYSTEM_PROMPT, ReflectionDTO
+        )
+        if parsed is None:
             return Reflection(
                 trial_number=trial.number,
                 task=task,
@@ -327,6 +626,15 @@ class LLMReflectionGenerator(ReflectionGenerator):
                 why_it_happened="不明",
                 how_to_improve="再試行してください",
             )
+        return Reflection(
+            trial_number=trial.number,
+            task=task,
+            action_taken=trial.action,
+            evaluation=trial.evaluation,
+            what_went_wrong=parsed.what_went_wrong,
+            why_it_happened=parsed.why_it_happened,
+            how_to_improve=parsed.how_to_improve,
+        )
 
 
 # =============================================================================
@@ -342,7 +650,10 @@ class ReflexionAgent:
 
     使用方法:
         agent = ReflexionAgent(actor, evaluator, reflection_generator)
-        result = agent.run(task, max_trials=3)
+        result = agent.run(task)
+
+        # 複数タスクを並行実行（評価はバッチで1回にまとめる）
+        results = await agent.run_many(tasks, concurrency=10)
     """
 
     def __init__(
@@ -352,6 +663,7 @@ class ReflexionAgent:
         reflection_generator: ReflectionGenerator,
         max_trials: int = 3,
         success_threshold: float = 0.8,
+        reflection_memory: ReflectionMemory | None = None,
     ):
         self.actor = actor
         self.evaluator = evaluator
@@ -360,7 +672,7 @@ class ReflexionAgent:
         self.success_threshold = success_threshold
 
         # Episodic Memory: 過去の反省を蓄積
-        self.reflection_memory: list[Reflection] = []
+        self.reflection_memory = reflection_memory or ReflectionMemory()
         self.trial_history: list[Trial] = []
 
     def run(self, task: str) -> tuple[str, list[Trial]]:
@@ -373,6 +685,94 @@ class ReflexionAgent:
         Returns:
             (best_result, trials): 最良の結果と試行履歴
         """
+        return asyncio.run(self.arun(task))
+
+    async def run_many(
+        self, tasks: list[str], concurrency: int = 10
+    ) -> list[tuple[str, list[Trial]]]:
+        """
+        複数のタスクを並行実行
+
+        全タスクの試行を同じステップで進め、Actor と反省生成は並行に、
+        評価は evaluate_batch で1回にまとめて実行する。
+        反省はタスクごとのメモリに蓄積し（他のタスクの反省はプロンプトに入れない）、
+        終了後に self.reflection_memory へまとめて追加する。
+
+        Args:
+            tasks: 実行するタスクのリスト
+            concurrency: 同時に実行する LLM 呼び出し数の上限（レート制限用）
+
+        Returns:
+            タスクごとの (best_result, trials)（tasks と同じ順序）
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(coro):
+            async with semaphore:
+                return await coro
+
+        all_trials: list[list[Trial]] = [[] for _ in tasks]
+        memories = [self.reflection_memory.fork() for _ in tasks]
+        best: list[tuple[str, float]] = [("", 0.0) for _ in tasks]
+        active = list(range(len(tasks)))
+
+        for trial_num in range(1, self.max_trials + 1):
+            if not active:
+                break
+            print(f"\n--- Trial {trial_num}/{self.max_trials} ({len(active)} tasks) ---")
+
+            # 1. Actor: 全タスクを並行実行
+            outputs = await asyncio.gather(*[
+                limited(self.actor.execute(tasks[i], memories[i]))
+                for i in active
+            ])
+
+            # 2. Evaluator: 1回のバッチで評価
+            evaluations = await self.evaluator.evaluate_batch([
+                (tasks[i], action, result) for i, (action, result) in zip(active, outputs)
+            ])
+
+            next_active = []
+            to_reflect: list[tuple[int, Trial]] = []
+            for i, (action, result), evaluation in zip(active, outputs, evaluations):
+                trial = Trial(
+                    number=trial_num,
+                    action=action,
+                    result=result,
+                    evaluation=evaluation,
+                )
+                all_trials[i].append(trial)
+                print(f"  [{i}] {evaluation.result.value} (score: {evaluation.score:.2f})")
+
+                if evaluation.score > best[i][1]:
+                    best[i] = (result, evaluation.score)
+
+                if evaluation.is_success or evaluation.score >= self.success_threshold:
+                    continue
+
+                if trial_num < self.max_trials:
+                    to_reflect.append((i, trial))
+                    next_active.append(i)
+
+            # 3. 反省を並行生成
+            reflections = await asyncio.gather(*[
+                limited(self.reflection_generator.generate(tasks[i], trial, memories[i]))
+                for i, trial in to_reflect
+            ])
+            for (i, trial), reflection in zip(to_reflect, reflections):
+                trial.reflection = reflection
+                await memories[i].aappend(reflection)
+
+            active = next_active
+
+        for trials, memory in zip(all_trials, memories):
+            self.trial_history.extend(trials)
+            self.reflection_memory.extend(memory)
+
+        return [(best[i][0], all_trials[i]) for i in range(len(tasks))]
+
+    async def arun(self, task: str) -> tuple[str, list[Trial]]:
+        """run の非同期版"""
         print(f"\n{'=' * 60}")
         print(f"Reflexion Agent: {task}")
         print("=" * 60)
@@ -386,12 +786,12 @@ class ReflexionAgent:
 
             # 1. Actor: タスクを実行
             print("  [ACTOR] Executing task...")
-            action, result = self.actor.execute(task, self.reflection_memory)
+            action, result = await self.actor.execute(task, self.reflection_memory)
             print(f"  Action: {action[:100]}...")
 
             # 2. Evaluator: 結果を評価
             print("  [EVALUATOR] Evaluating result...")
-            evaluation = self.evaluator.evaluate(task, action, result)
+            evaluation = await self.evaluator.evaluate(task, action, result)
             print(
                 f"  Result: {evaluation.result.value} "
                 f"(score: {evaluation.score:.2f})"
@@ -420,11 +820,11 @@ class ReflexionAgent:
             # 最後の試行でなければ反省を生成
             if trial_num < self.max_trials:
                 print("  [REFLECTION] Generating reflection...")
-                reflection = self.reflection_generator.generate(
+                reflection = await self.reflection_generator.generate(
                     task, trial, self.reflection_memory
                 )
                 trial.reflection = reflection
-                self.reflection_memory.append(reflection)
+                await self.reflection_memory.aappend(reflection)
 
                 print(f"  What went wrong: {reflection.what_went_wrong}")
                 print(f"  Why: {reflection.why_it_happened}")
@@ -464,7 +864,7 @@ class SimpleActor(Actor):
     def __init__(self):
         self.attempt = 0
 
-    def execute(
+    async def execute(
         self, task: str, past_reflections: list[Reflection]
     ) -> tuple[str, str]:
         self.attempt += 1
@@ -486,7 +886,7 @@ class SimpleEvaluator(Evaluator):
     def __init__(self):
         self.call_count = 0
 
-    def evaluate(self, task: str, action: str, result: str) -> Evaluation:
+    async def evaluate(self, task: str, action: str, result: str) -> Evaluation:
         self.call_count += 1
 
         if "完全に成功" in result:
@@ -512,7 +912,7 @@ class SimpleEvaluator(Evaluator):
 class SimpleReflectionGenerator(ReflectionGenerator):
     """デモ用のシンプルな反省生成"""
 
-    def generate(
+    async def generate(
         self,
         task: str,
         trial: Trial,
@@ -581,6 +981,7 @@ def main_with_llm():
         evaluator=evaluator,
         reflection_generator=reflection_gen,
         max_trials=3,
+        reflection_memory=ReflectionMemory(embed=gemini_embedder(client)),
     )
 
     task = "FizzBuzz問題を解くPythonコードを生成"
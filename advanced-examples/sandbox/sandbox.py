@@ -14,14 +14,26 @@ LLMが生成したコードを安全に実行するための隔離環境を提
 
 from __future__ import annotations
 
+import _thread
 import ast
+import hashlib
 import io
+import json
+import os
+import pickle
+import select
 import signal
+import struct
+import subprocess
 import sys
 import threading
+import time
 import traceback
+from collections import OrderedDict
+from collections.abc import Sequence
 from contextlib import contextmanager
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 from typing import Any
 
 
@@ -30,7 +42,7 @@ from typing import Any
 # =============================================================================
 
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionResult:
     """コード実行の結果"""
 
@@ -41,55 +53,62 @@ class ExecutionResult:
     memory_used: int = 0  # bytes
 
 
-@dataclass
+# 許可されないモジュール（既定値。全ポリシーで共有する不変集合）
+_DEFAULT_BLOCKED_MODULES: frozenset[str] = frozenset(
+    {
+        "os",
+        "subprocess",
+        "sys",
+        "shutil",
+        "socket",
+        "requests",
+        "urllib",
+        "http",
+        "ftplib",
+        "smtplib",
+        "telnetlib",
+        "pickle",
+        "marshal",
+        "shelve",
+        "ctypes",
+        "multiprocessing",
+        "threading",
+        "_thread",
+    }
+)
+
+# 許可されないビルトイン（既定値）
+_DEFAULT_BLOCKED_BUILTINS: frozenset[str] = frozenset(
+    {
+        "open",
+        "exec",
+        "eval",
+        "compile",
+        "__import__",
+        "input",
+        "breakpoint",
+        "memoryview",
+        "globals",
+        "locals",
+        "vars",
+        "dir",
+        "getattr",
+        "setattr",
+        "delattr",
+        "hasattr",
+    }
+)
+
+
+@dataclass(slots=True)
 class SecurityPolicy:
     """セキュリティポリシー"""
 
     # 許可されないモジュール
-    blocked_modules: set[str] = field(
-        default_factory=lambda: {
-            "os",
-            "subprocess",
-            "sys",
-            "shutil",
-            "socket",
-            "requests",
-            "urllib",
-            "http",
-            "ftplib",
-            "smtplib",
-            "telnetlib",
-            "pickle",
-            "marshal",
-            "shelve",
-            "ctypes",
-            "multiprocessing",
-            "threading",
-            "_thread",
-        }
-    )
+    blocked_modules: frozenset[str] = _DEFAULT_BLOCKED_MODULES
 
     # 許可されないビルトイン
-    blocked_builtins: set[str] = field(
-        default_factory=lambda: {
-            "open",
-            "exec",
-            "eval",
-            "compile",
-            "__import__",
-            "input",
-            "breakpoint",
-            "memoryview",
-            "globals",
-            "locals",
-            "vars",
-            "dir",
-            "getattr",
-            "setattr",
-            "delattr",
-            "hasattr",
-        }
-    )
+    blocked_builtins: frozenset[str] = _DEFAULT_BLOCKED_BUILTINS
 
     # 実行制限
     max_execution_time: float = 5.0  # seconds
@@ -102,58 +121,91 @@ class SecurityPolicy:
 # =============================================================================
 
 
+class _ViolationVisitor(ast.NodeVisitor):
+    """1パスでASTを走査し、ノード種別ごとの visit_* で違反を収集する"""
+
+    def __init__(self, blocked_modules: frozenset[str], blocked_calls: frozenset[str]):
+        self.blocked_modules = blocked_modules
+        self.blocked_calls = blocked_calls
+        self.violations: list[str] = []
+
+    # Import文のチェック
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            module = alias.name.split(".")[0]
+            if module in self.blocked_modules:
+                self.violations.append(f"Blocked module import: {module}")
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module:
+            module = node.module.split(".")[0]
+            if module in self.blocked_modules:
+                self.violations.append(f"Blocked module import: {module}")
+        self.generic_visit(node)
+
+    # eval/exec/open 等の呼び出しチェック
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name) and node.func.id in self.blocked_calls:
+            if node.func.id == "open":
+                self.violations.append("File operations are not allowed")
+            else:
+                self.violations.append(f"Blocked function call: {node.func.id}")
+        self.generic_visit(node)
+
+    # __のアクセス（dunder）のチェック
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if node.attr.startswith("__") and node.attr.endswith("__"):
+            self.violations.append(f"Dunder attribute access: {node.attr}")
+        self.generic_visit(node)
+
+
 class CodeAnalyzer:
     """コードの静的解析"""
 
+    # 静的解析で呼び出しを禁止する関数名
+    BLOCKED_CALL_NAMES = frozenset({"eval", "exec", "compile", "open", "__import__"})
+    # 解析結果キャッシュの上限（エージェントのリトライで同じコードが繰り返し来る）
+    CACHE_SIZE = 1024
+
     def __init__(self, policy: SecurityPolicy):
         self.policy = policy
+        self._blocked_modules = frozenset(policy.blocked_modules)
+        self._blocked_call_names = self.BLOCKED_CALL_NAMES
+        # blake2bダイジェスト -> 違反タプル（LRU）
+        self._cache: OrderedDict[bytes, tuple[str, ...]] = OrderedDict()
 
     def analyze(self, code: str) -> list[str]:
         """
         コードを解析し、セキュリティ違反を検出
 
+        同一コードの解析結果はハッシュをキーにキャッシュされ、
+        2回目以降はパースとAST走査をスキップします。
+
         Returns:
             violations: 検出された違反のリスト
         """
-        violations = []
-
+        key = hashlib.blake2b(code.encode()).digest()
+        violations = self._cache.get(key)
+        if violations is None:
+            violations = self._analyze_impl(code)
+            self._cache[key] = violations
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return list(violations)
+
+    def _analyze_impl(self, code: str) -> tuple[str, ...]:
+        """キャッシュを介さずにパースとAST走査を行う"""
         try:
             tree = ast.parse(code)
         except SyntaxError as e:
-            return [f"Syntax error: {e}"]
-
-        for node in ast.walk(tree):
-            # Import文のチェック
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    module = alias.name.split(".")[0]
-                    if module in self.policy.blocked_modules:
-                        violations.append(f"Blocked module import: {module}")
-
-            elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    module = node.module.split(".")[0]
-                    if module in self.policy.blocked_modules:
-                        violations.append(f"Blocked module import: {module}")
-
-            # eval/exec のチェック
-            elif isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    if node.func.id in {"eval", "exec", "compile"}:
-                        violations.append(f"Blocked function call: {node.func.id}")
-
-            # ファイル操作のチェック
-            elif isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    if node.func.id == "open":
-                        violations.append("File operations are not allowed")
-
-            # __のアクセス（dunder）のチェック
-            elif isinstance(node, ast.Attribute):
-                if node.attr.startswith("__") and node.attr.endswith("__"):
-                    violations.append(f"Dunder attribute access: {node.attr}")
-
-        return violations
+            return (f"Syntax error: {e}",)
+
+        visitor = _ViolationVisitor(self._blocked_modules, self._blocked_call_names)
+        visitor.visit(tree)
+        return tuple(visitor.violations)
 
 
 # =============================================================================
@@ -200,11 +252,119 @@ def timeout_context_thread(seconds: float):
         timer.cancel()
 
 
+@contextmanager
+def timeout_context_interrupt(seconds: float):
+    """
+    interrupt_main によるタイムアウト（SIGALRMのない環境向け）
+
+    メインスレッドに KeyboardInterrupt を送り込んで実行を中断し、
+    TimeoutError に変換します。メインスレッドからのみ使用できます。
+    """
+    state = {"timed_out": False}
+
+    def interrupt():
+        state["timed_out"] = True
+        _thread.interrupt_main()
+
+    timer = threading.Timer(seconds, interrupt)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield state
+    except KeyboardInterrupt:
+        if not state["timed_out"]:
+            raise
+        raise TimeoutError(f"Execution timed out after {seconds} seconds") from None
+    finally:
+        timer.cancel()
+
+
+def bounded_timeout_context(seconds: float):
+    """
+    実行を実際に中断できるタイムアウトを選択
+
+    1. Unix系のメインスレッド: SIGALRM（timeout_context）
+    2. その他のメインスレッド: interrupt_main（timeout_context_interrupt）
+    3. ワーカースレッド: 中断できないため超過の記録のみ（timeout_context_thread）
+    """
+    if threading.current_thread() is threading.main_thread():
+        if hasattr(signal, "SIGALRM"):
+            return timeout_context(seconds)
+        return timeout_context_interrupt(seconds)
+    return timeout_context_thread(seconds)
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """
+    sys.stdout の代わりに置くプロキシ
+
+    書き込みを呼び出し元スレッドのバッファに振り分け、バッファのないスレッドでは
+    元の sys.stdout に書く。redirect_stdout はプロセス全体の sys.stdout を
+    差し替えるため、並行実行では互いの出力が混ざってしまう。
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "target", None) or self.default
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+
+_stdout_lock = threading.Lock()
+_stdout_proxy: _ThreadLocalStdout | None = None
+_stdout_users = 0
+
+
+@contextmanager
+def capture_stdout(buffer: io.StringIO):
+    """
+    このスレッドの print 出力だけを buffer に書き込む（スレッドセーフ）
+
+    最初の利用者が sys.stdout をプロキシに差し替え、最後の利用者が元に戻す。
+    """
+    global _stdout_proxy, _stdout_users
+    with _stdout_lock:
+        if _stdout_users == 0:
+            _stdout_proxy = _ThreadLocalStdout(sys.stdout)
+            sys.stdout = _stdout_proxy
+        _stdout_users += 1
+        proxy = _stdout_proxy
+
+    previous = getattr(proxy.local, "target", None)
+    proxy.local.target = buffer
+    try:
+        yield buffer
+    finally:
+        proxy.local.target = previous
+        with _stdout_lock:
+            _stdout_users -= 1
+            if _stdout_users == 0:
+                if sys.stdout is proxy:
+                    sys.stdout = proxy.default
+                _stdout_proxy = None
+
+
 # =============================================================================
 # サンドボックス
 # =============================================================================
 
 
+@lru_cache(maxsize=512)
+def _compile(code: str):
+    """コードをコードオブジェクトにコンパイル（同一コードの再実行ではキャッシュを使用）"""
+    return compile(code, "<sandbox>", "exec")
+
+
 class SimpleSandbox:
     """
     シンプルなサンドボックス（教育用）
@@ -216,6 +376,9 @@ class SimpleSandbox:
     def __init__(self, policy: SecurityPolicy | None = None):
         self.policy = policy or SecurityPolicy()
         self.analyzer = CodeAnalyzer(self.policy)
+        # ビルトインのフィルタは一度だけ行い、実行ごとに浅いコピーで使い回す
+        self._safe_globals_template = self._build_template()
+        self._tls = threading.local()
 
     def execute(self, code: str, inputs: dict | None = None) -> ExecutionResult:
         """
@@ -246,18 +409,18 @@ class SimpleSandbox:
         if inputs:
             safe_globals.update(inputs)
 
-        # 3. 出力をキャプチャ
-        output_buffer = io.StringIO()
-        old_stdout = sys.stdout
+        # 3. 出力をキャプチャ（スレッドごとのバッファを使い回す）
+        output_buffer = self._output_buffer()
 
         try:
-            sys.stdout = output_buffer
-
             # 4. タイムアウト付きで実行
-            with timeout_context_thread(self.policy.max_execution_time) as timeout_state:
-                exec(code, safe_globals)
+            with (
+                capture_stdout(output_buffer),
+                bounded_timeout_context(self.policy.max_execution_time) as timeout_state,
+            ):
+                exec(_compile(code), safe_globals)
 
-                if timeout_state["timed_out"]:
+                if timeout_state and timeout_state["timed_out"]:
                     return ExecutionResult(
                         success=False,
                         output=output_buffer.getvalue()[: self.policy.max_output_length],
@@ -291,11 +454,25 @@ class SimpleSandbox:
                 execution_time=time.time() - start_time,
             )
 
-        finally:
-            sys.stdout = old_stdout
+    def _output_buffer(self) -> io.StringIO:
+        """このスレッド用の出力バッファを空にして返す（なければ作成）"""
+        buffer = getattr(self._tls, "buffer", None)
+        if buffer is None:
+            buffer = self._tls.buffer = io.StringIO()
+        buffer.seek(0)
+        buffer.truncate()
+        return buffer
 
     def _create_safe_globals(self) -> dict[str, Any]:
-        """安全なグローバル環境を作成"""
+        """安全なグローバル環境を作成（テンプレートの浅いコピー）"""
+        safe_globals = self._safe_globals_template.copy()
+        # 実行中のコードがビルトインを書き換えても他の実行に漏れないよう、
+        # ビルトイン辞書だけは個別にコピーする（C実装のdictコピーなので安価）
+        safe_globals["__builtins__"] = safe_globals["__builtins__"].copy()
+        return safe_globals
+
+    def _build_template(self) -> dict[str, Any]:
+        """安全なグローバル環境のテンプレートを構築"""
         # 安全なビルトインのみを含める
         safe_builtins = {}
         for name, obj in __builtins__.__dict__.items() if hasattr(__builtins__, '__dict__') else __builtins__.items():
@@ -323,6 +500,167 @@ class SimpleSandbox:
         }
 
 
+# =============================================================================
+# 永続ワーカー サンドボックス
+# =============================================================================
+
+# フレーム形式: 4バイトのビッグエンディアン長 + ペイロード
+_FRAME_HEADER = struct.Struct("!I")
+
+
+def _write_frame(stream, payload: bytes) -> None:
+    """長さプレフィックス付きフレームを書き込む"""
+    stream.write(_FRAME_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def _read_frame(stream) -> bytes | None:
+    """フレームを1つ読み込む（EOFなら None）"""
+    header = stream.read(_FRAME_HEADER.size)
+    if len(header) < _FRAME_HEADER.size:
+        return None
+    (length,) = _FRAME_HEADER.unpack(header)
+    return stream.read(length)
+
+
+def _worker_main() -> None:
+    """
+    PersistentSandbox のワーカープロセス本体
+
+    最初のフレームでポリシーを受け取り、以降は (code, inputs) のフレームを
+    SimpleSandbox で順に実行して、結果をJSONフレームで返します。
+    """
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    # 実行コード以外の出力がプロトコルを壊さないよう、stdoutをstderrに向ける
+    sys.stdout = sys.stderr
+
+    header = _read_frame(stdin)
+    if header is None:
+        return
+    sandbox = SimpleSandbox(SecurityPolicy(**pickle.loads(header)))
+
+    while (payload := _read_frame(stdin)) is not None:
+        code, inputs = pickle.loads(payload)
+        result = sandbox.execute(code.decode(), inputs)
+        _write_frame(stdout, json.dumps(asdict(result)).encode())
+
+
+class PersistentSandbox:
+    """
+    永続ワーカープロセスを使うサンドボックス（Unix系のみ）
+
+    制限付きのPythonサブプロセスを1つだけ起動し、パイプ越しに
+    (code, inputs) を送って順に実行します。呼び出しごとのプロセス起動
+    （~30-100ms）を複数の実行で償却できます。
+
+    ワーカー内の実行は SimpleSandbox と同じ静的解析・タイムアウトを使い、
+    ワーカーが応答しない場合は強制終了して次回の実行時に再起動します。
+    inputs はpickle可能な組み込み型のみ渡せます。
+    """
+
+    # ワーカー内のタイムアウトに上乗せする猶予（秒）
+    RESPONSE_GRACE = 1.0
+
+    def __init__(self, policy: SecurityPolicy | None = None):
+        self.policy = policy or SecurityPolicy()
+        self._process: subprocess.Popen | None = None
+        self._lock = threading.Lock()
+
+    def execute(self, code: str, inputs: dict | None = None) -> ExecutionResult:
+        """
+        ワーカープロセスでコードを実行
+
+        Args:
+            code: 実行するPythonコード
+            inputs: コードに渡す入力変数
+
+        Returns:
+            ExecutionResult: 実行結果
+        """
+        with self._lock:
+            return self._execute_locked(code, inputs)
+
+    def execute_many(
+        self, codes: Sequence[str], inputs: dict | None = None
+    ) -> list[ExecutionResult]:
+        """複数のコードを同じワーカーで順に実行"""
+        with self._lock:
+            return [self._execute_locked(code, inputs) for code in codes]
+
+    def close(self) -> None:
+        """ワーカープロセスを終了"""
+        with self._lock:
+            self._stop_worker()
+
+    def __enter__(self) -> PersistentSandbox:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _execute_locked(self, code: str, inputs: dict | None) -> ExecutionResult:
+        start_time = time.time()
+        process = self._ensure_worker()
+        try:
+            _write_frame(process.stdin, pickle.dumps((code.encode(), inputs or {})))
+            deadline = time.monotonic() + self.policy.max_execution_time + self.RESPONSE_GRACE
+            header = self._read_exact(process, _FRAME_HEADER.size, deadline)
+            (length,) = _FRAME_HEADER.unpack(header)
+            payload = self._read_exact(process, length, deadline)
+        except (TimeoutError, BrokenPipeError, EOFError) as e:
+            # 応答しない・終了したワーカーは破棄し、次回に再起動する
+            self._stop_worker()
+            return ExecutionResult(
+                success=False,
+                output="",
+                error=f"Sandbox worker failed: {type(e).__name__}: {e}",
+                execution_time=time.time() - start_time,
+            )
+        return ExecutionResult(**json.loads(payload))
+
+    def _ensure_worker(self) -> subprocess.Popen:
+        """ワーカーが動いていなければ起動"""
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+
+        # -I: 環境変数・ユーザーsite-packagesを無視する隔離モード
+        self._process = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+        )
+        _write_frame(self._process.stdin, pickle.dumps(asdict(self.policy)))
+        return self._process
+
+    def _stop_worker(self) -> None:
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process.stdin.close()
+        self._process.stdout.close()
+        self._process = None
+
+    @staticmethod
+    def _read_exact(process: subprocess.Popen, size: int, deadline: float) -> bytes:
+        """期限までに size バイトを読み込む"""
+        fd = process.stdout.fileno()
+        chunks = []
+        while size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError("Sandbox worker did not respond in time")
+            chunk = os.read(fd, size)
+            if not chunk:
+                raise EOFError("Sandbox worker exited")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+
 # =============================================================================
 # Docker サンドボックス（概念実装）
 # =============================================================================
@@ -527,6 +865,16 @@ print("Done")
     print(f"Success: {result.success}")
     print(f"Execution time: {result.execution_time:.3f}s")
 
+    # テスト8: 永続ワーカーでのバッチ実行
+    print("\n--- Test 8: Persistent worker (batch) ---")
+    with PersistentSandbox() as persistent:
+        results = persistent.execute_many([f"print({i} ** 2)" for i in range(5)])
+    print(f"Success: {all(r.success for r in results)}")
+    print(f"Outputs: {[r.output.strip() for r in results]}")
+
 
 if __name__ == "__main__":
-    main()
+    if "--worker" in sys.argv:
+        _worker_main()
+    else:
+        main()
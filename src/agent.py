@@ -1,12 +1,35 @@
+import asyncio
+import json
+import os
+import time
+from collections.abc import Callable
+
 from .colors import (
     cyan, yellow, magenta, blue, gray, bold,
     print_agent, print_think, print_act, print_observe,
     print_separator, print_header,
 )
-from .llm_clients import BaseLLMClient, LLMResponse
+from .llm_clients import BaseLLMClient, LLMResponse, ToolCall
 from .message_history import MessageHistory
 from .tool_registry import ToolRegistry
 
+# 計測イベントを受け取る関数: (イベント名, 値[ns], タグ)
+Telemetry = Callable[[str, int, dict], None]
+
+# SRC_AGENT_PROFILE=1 のとき、計測結果をこのファイルに JSON Lines で追記する
+PROFILE_ENV = "SRC_AGENT_PROFILE"
+PROFILE_LOG = "agent_profile.jsonl"
+
+
+def file_telemetry(path: str = PROFILE_LOG) -> Telemetry:
+    """計測イベントをファイルに1行ずつ書き出す telemetry を作る"""
+
+    def emit(event: str, value_ns: int, tags: dict) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"event": event, "value_ns": value_ns, **tags}) + "\n")
+
+    return emit
+
 
 class Agent:
     """エージェントループを実行するコアクラス
@@ -26,6 +49,7 @@ class Agent:
         llm_client: BaseLLMClient,
         tool_registry: ToolRegistry,
         max_iterations: int | None = None,
+        telemetry: Telemetry | None = None,
     ):
         """エージェントを初期化
 
@@ -33,15 +57,37 @@ class Agent:
             llm_client: LLM APIクライアント
             tool_registry: 利用可能なツールのレジストリ
             max_iterations: 最大イテレーション数（無限ループ防止）
+            telemetry: LLM 呼び出しとツール実行の所要時間を受け取る関数
+                （省略時は SRC_AGENT_PROFILE=1 ならファイルに記録、それ以外は計測しない）
         """
         self.llm_client = llm_client
         self.tool_registry = tool_registry
         self.max_iterations = max_iterations or self.DEFAULT_MAX_ITERATIONS
         self.message_history = MessageHistory()
+        if telemetry is None and os.environ.get(PROFILE_ENV) == "1":
+            telemetry = file_telemetry()
+        self.telemetry = telemetry
+        # 同期版 run 用のイベントループ（実行ごとに作らず、LLM クライアントの接続を維持する）
+        self._runner: asyncio.Runner | None = None
 
     def run(self, user_input: str) -> str:
+        """エージェントループを実行（同期版）
+
+        Args:
+            user_input: ユーザーからの入力
+
+        Returns:
+            最終的なレスポンステキスト
+        """
+        if self._runner is None:
+            self._runner = asyncio.Runner()
+        return self._runner.run(self.arun(user_input))
+
+    async def arun(self, user_input: str) -> str:
         """エージェントループを実行
 
+        1回のレスポンスに複数のツール呼び出しが含まれる場合は並行して実行する。
+
         Args:
             user_input: ユーザーからの入力
 
@@ -57,6 +103,8 @@ class Agent:
         print_agent(f"User input: {user_input}")
 
         self.message_history.add_user_message(user_input)
+        # 前回の入力以降にユーザーがファイルを編集している可能性があるため
+        self.tool_registry.invalidate()
 
         for iteration in range(1, self.max_iterations + 1):
             print()
@@ -64,13 +112,55 @@ class Agent:
             print_agent(f"Iteration {bold(str(iteration))}/{self.max_iterations}")
             print_separator()
 
+            # 履歴が長くなっていたら古いやり取りを要約に置き換える（毎ターン全履歴を送るため）
+            self.message_history.compact()
+
             # ========== THINK ==========
             print_think("Calling LLM for next action...")
 
-            response: LLMResponse = self.llm_client.chat(
-                messages=self.message_history.get_messages(),
-                tools=self.tool_registry.get_tool_definitions(),
-            )
+            # ストリーミングで受け取り、ツール呼び出しが届いた時点で実行を始める
+            # （残りの生成を待つ間にツールが進む。結果は次のターンの前にまとめて待つ）
+            t0 = time.perf_counter_ns()
+            response: LLMResponse | None = None
+            tasks: list[asyncio.Task[str]] = []
+            barrier: asyncio.Task[str] | None = None  # 最後の副作用がありうるツール
+            try:
+                async for event in self.llm_client.astream_chat(
+                    messages=self.message_history.get_messages(),
+                    tools=self.tool_registry.get_tool_definitions(),
+                ):
+                    if isinstance(event, ToolCall):
+                        # ========== ACT ==========
+                        self._print_tool_call(event)
+                        # 読み取り専用のツールは並行に、それ以外は呼び出された順に実行する
+                        if self._is_read_only(event.name):
+                            prior = [barrier] if barrier is not None else []
+                        else:
+                            prior = list(tasks)
+                        task = asyncio.create_task(
+                            self._execute_tool_after(prior, event.name, event.input)
+                        )
+                        if not self._is_read_only(event.name):
+                            barrier = task
+                        tasks.append(task)
+                    else:
+                        response = event
+            except BaseException:
+                # まだ始まっていないツールは実行されない。execute_command の aexecute は
+                # プロセスを止めるが、別スレッドで実行中のツール（read_file, write_file など）は
+                # 取り消せず、最後まで実行される
+                for task in tasks:
+                    task.cancel()
+                raise
+            if response is None:
+                raise RuntimeError("LLM stream ended without a response")
+
+            if self.telemetry:
+                self.telemetry(
+                    "llm_latency_ns",
+                    time.perf_counter_ns() - t0,
+                    {"provider": self.llm_client.provider_name, "iteration": iteration},
+                )
 
             # アシスタントのレスポンスを履歴に追加
             assistant_msg = self.llm_client.format_assistant_message(response)
@@ -89,36 +179,68 @@ class Agent:
                 print_think("No tool calls found - ending loop")
                 return response.text or ""
 
-            for tool_call in response.tool_calls:
-                # ========== ACT ==========
-                print()
-                print_act(f"Executing tool: {magenta(tool_call.name)}")
-                print_act(f"Tool ID: {gray(tool_call.id)}")
-                print_act(f"Input: {tool_call.input}")
-
-                result = self.tool_registry.execute(
-                    tool_call.name,
-                    tool_call.input,
+            # ツールは応答の受信中から実行中（読み取り専用のものは並行に進む）
+            t0 = time.perf_counter_ns()
+            results = await asyncio.gather(*tasks)
+            if self.telemetry:
+                self.telemetry(
+                    "tools_latency_ns",
+                    time.perf_counter_ns() - t0,
+                    {"count": len(response.tool_calls), "iteration": iteration},
                 )
 
-                # ========== OBSERVE ==========
+            # ========== OBSERVE ==========
+            for tool_call, result in zip(response.tool_calls, results):
                 result_preview = result[:200] + "..." if len(result) > 200 else result
                 print()
                 print_observe("Result preview:")
                 print(gray(result_preview))
 
-                # ツール結果を履歴に追加
-                self.message_history.add_tool_result(
-                    tool_call.id,
-                    result,
-                    tool_name=tool_call.name,
-                )
+            # ツール結果をまとめて1件のメッセージとして履歴に追加
+            self.message_history.add_tool_results(response.tool_calls, results)
 
         # 最大イテレーション数に達した場合
         raise RuntimeError(
             f"Max iterations ({self.max_iterations}) reached without completion"
         )
 
+    def _is_read_only(self, name: str) -> bool:
+        """副作用のないツールか（ToolRegistry が結果をキャッシュする cacheable なツール）"""
+        tool = self.tool_registry.get(name)
+        return tool is not None and tool.cacheable
+
+    async def _execute_tool_after(
+        self,
+        prior: list[asyncio.Task[str]],
+        name: str,
+        arguments: dict,
+    ) -> str:
+        """先に呼び出されたツールの完了を待ってから実行
+
+        副作用がありうるツール（write_file, execute_command など）は、それより前の
+        すべてのツールの完了を待つ。読み取り専用のツールは直前の副作用がありうる
+        ツールだけを待つので、write_file(x) の後の read_file(x) は書き込み後の内容を読む。
+        """
+        if prior:
+            await asyncio.wait(prior)
+        return await self._execute_tool(name, arguments)
+
+    async def _execute_tool(self, name: str, arguments: dict) -> str:
+        """ツールを実行（telemetry があればツールごとの所要時間を記録）"""
+        if not self.telemetry:
+            return await self.tool_registry.aexecute(name, arguments)
+
+        t0 = time.perf_counter_ns()
+        result = await self.tool_registry.aexecute(name, arguments)
+        self.telemetry("tool_latency_ns", time.perf_counter_ns() - t0, {"tool": name})
+        return result
+
+    def _print_tool_call(self, tool_call: ToolCall) -> None:
+        print()
+        print_act(f"Executing tool: {magenta(tool_call.name)}")
+        print_act(f"Tool ID: {gray(tool_call.id)}")
+        print_act(f"Input: {tool_call.input}")
+
     def _print_response_content(self, response: LLMResponse) -> None:
         """レスポンス内容をデバッグ出力"""
         if response.text:
@@ -131,4 +253,5 @@ class Agent:
     def reset(self) -> None:
         """エージェントの状態をリセット"""
         self.message_history.clear()
+        self.llm_client.reset_conversation()
         print_agent("Agent state reset")
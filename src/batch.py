@@ -0,0 +1,85 @@
+import asyncio
+from collections.abc import Callable
+
+from .agent import Agent
+from .colors import print_agent
+
+
+class BatchProcessor:
+    """複数の入力をまとめてエージェントに処理させる
+
+    対話的に使わない処理（ディレクトリ内のファイルを1つずつ評価する、など）で、
+    入力ごとの LLM 往復を直列に待たずに並行して進める。
+
+    入力ごとに agent_factory で新しいエージェントを作るため、会話履歴は混ざらない。
+    LLM クライアントも会話の変換状態を持つので、agent_factory は呼ぶたびに
+    新しいクライアントを持つエージェントを返すこと。
+
+    使用例:
+        processor = BatchProcessor(lambda: create_agent("llama"), max_concurrency=4)
+        results = asyncio.run(processor.run_batch(["Summarize a.py", "Summarize b.py"]))
+    """
+
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], Agent],
+        max_concurrency: int | None = None,
+        rate_limit: float | None = None,
+    ):
+        """バッチ処理を初期化
+
+        Args:
+            agent_factory: 入力ごとに新しいエージェントを返す関数
+            max_concurrency: 同時に実行するエージェントの最大数
+            rate_limit: 1秒あたりに開始するエージェントの最大数（省略時は制限なし）
+        """
+        self.agent_factory = agent_factory
+        self.max_concurrency = max_concurrency or self.DEFAULT_MAX_CONCURRENCY
+        self.rate_limit = rate_limit
+
+    async def run_batch(self, inputs: list[str]) -> list[str | BaseException]:
+        """すべての入力を並行して処理
+
+        Args:
+            inputs: ユーザー入力のリスト
+
+        Returns:
+            入力と同じ順序の結果リスト（失敗した入力の位置には例外が入る）
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        start_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+
+        async def throttle() -> None:
+            # rate_limit があれば、開始時刻を 1/rate_limit 秒ずつずらす
+            nonlocal next_start
+            if not self.rate_limit:
+                return
+            async with start_lock:
+                delay = next_start - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_start = max(next_start, loop.time()) + 1 / self.rate_limit
+
+        async def run_one(index: int, user_input: str) -> str:
+            async with semaphore:
+                await throttle()
+                print_agent(f"Batch item {index + 1}/{len(inputs)} started")
+                agent = self.agent_factory()
+                return await agent.arun(user_input)
+
+        print_agent(
+            f"Running batch of {len(inputs)} inputs "
+            f"(max concurrency: {self.max_concurrency})"
+        )
+        return await asyncio.gather(
+            *(run_one(i, user_input) for i, user_input in enumerate(inputs)),
+            return_exceptions=True,
+        )
+
+    def run(self, inputs: list[str]) -> list[str | BaseException]:
+        """すべての入力を並行して処理（同期版）"""
+        return asyncio.run(self.run_batch(inputs))
@@ -4,6 +4,9 @@
 追加の依存関係なしで動作。
 """
 
+import os
+import sys
+
 
 class Colors:
     """ANSIエスケープコード"""
@@ -36,8 +39,14 @@ class Colors:
     UNDERLINE = "\033[4m"
 
 
+# 端末以外（パイプ・ログファイル）への出力や NO_COLOR 指定時は色を付けない（起動時に1回だけ判定）
+_ENABLED = sys.stdout.isatty() and "NO_COLOR" not in os.environ
+
+
 def colorize(text: str, color: str) -> str:
-    """テキストに色を付ける"""
+    """テキストに色を付ける（色が無効な環境ではそのまま返す）"""
+    if not _ENABLED:
+        return text
     return f"{color}{text}{Colors.RESET}"
 
 
@@ -70,38 +79,48 @@ def dim(text: str) -> str:
     return colorize(text, Colors.DIM)
 
 
-# タグ付きprint用
+# タグ付きprint用（タグ部分は呼び出しごとに組み立てず、モジュール読み込み時に作っておく）
+_PREFIX_INIT = f"{Colors.GREEN}[INIT]{Colors.RESET} " if _ENABLED else "[INIT] "
+_PREFIX_AGENT = f"{Colors.CYAN}[AGENT]{Colors.RESET} " if _ENABLED else "[AGENT] "
+_PREFIX_THINK = f"{Colors.YELLOW}[THINK]{Colors.RESET} " if _ENABLED else "[THINK] "
+_PREFIX_ACT = f"{Colors.MAGENTA}[ACT]{Colors.RESET} " if _ENABLED else "[ACT] "
+_PREFIX_OBSERVE = f"{Colors.BLUE}[OBSERVE]{Colors.RESET} " if _ENABLED else "[OBSERVE] "
+_PREFIX_LLM = f"{Colors.BRIGHT_BLACK}[LLM]{Colors.RESET} " if _ENABLED else "[LLM] "
+_PREFIX_ERROR = f"{Colors.RED}[ERROR]{Colors.RESET} " if _ENABLED else "[ERROR] "
+_PREFIX_HISTORY = f"{Colors.BRIGHT_BLACK}[HISTORY]{Colors.RESET} " if _ENABLED else "[HISTORY] "
+
+
 def print_init(msg: str) -> None:
     """[INIT] 緑色"""
-    print(f"{Colors.GREEN}[INIT]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_INIT}{msg}\n")
 
 def print_agent(msg: str) -> None:
     """[AGENT] シアン"""
-    print(f"{Colors.CYAN}[AGENT]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_AGENT}{msg}\n")
 
 def print_think(msg: str) -> None:
     """[THINK] 黄色"""
-    print(f"{Colors.YELLOW}[THINK]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_THINK}{msg}\n")
 
 def print_act(msg: str) -> None:
     """[ACT] マゼンタ"""
-    print(f"{Colors.MAGENTA}[ACT]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_ACT}{msg}\n")
 
 def print_observe(msg: str) -> None:
     """[OBSERVE] 青"""
-    print(f"{Colors.BLUE}[OBSERVE]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_OBSERVE}{msg}\n")
 
 def print_llm(msg: str) -> None:
     """[LLM] グレー"""
-    print(f"{Colors.BRIGHT_BLACK}[LLM]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_LLM}{msg}\n")
 
 def print_error(msg: str) -> None:
     """[ERROR] 赤"""
-    print(f"{Colors.RED}[ERROR]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_ERROR}{msg}\n")
 
 def print_history(msg: str) -> None:
     """[HISTORY] グレー"""
-    print(f"{Colors.BRIGHT_BLACK}[HISTORY]{Colors.RESET} {msg}")
+    sys.stdout.write(f"{_PREFIX_HISTORY}{msg}\n")
 
 def print_separator(char: str = "─", width: int = 60) -> None:
     """区切り線（グレー）"""
@@ -15,6 +15,8 @@ def create_llm_client(
     provider: str,
     api_key: str | None = None,
     model: str | None = None,
+    use_cache: bool = True,
+    semantic_cache: bool = False,
 ) -> BaseLLMClient:
     """プロバイダー名からLLMクライアントを作成するファクトリ関数
 
@@ -22,6 +24,8 @@ def create_llm_client(
         provider: プロバイダー名 ("gemini", "llama")
         api_key: APIキー（省略時は環境変数から取得、llamaは不要）
         model: モデル名（省略時はデフォルト）
+        use_cache: 同じリクエストへの応答をキャッシュするか（Gemini のみ）
+        semantic_cache: 言い換えた依頼にも応答を再利用するか（Gemini のみ）
 
     Returns:
         LLMクライアントインスタンス
@@ -32,7 +36,12 @@ def create_llm_client(
     provider = provider.lower()
 
     if provider == "gemini":
-        return GeminiClient(api_key=api_key, model=model)
+        return GeminiClient(
+            api_key=api_key,
+            model=model,
+            use_cache=use_cache,
+            semantic_cache=semantic_cache,
+        )
     elif provider == "llama":
         return LlamaClient(api_key=api_key, model=model)
     else:
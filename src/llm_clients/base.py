@@ -1,4 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 
 
@@ -56,6 +58,68 @@ class BaseLLMClient(ABC):
         """
         pass
 
+    async def achat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None = None,
+    ) -> LLMResponse:
+        """LLMにリクエストを送信（非同期版）
+
+        デフォルトでは chat を別スレッドで実行する。
+        非同期APIを持つプロバイダーはオーバーライドする。
+        """
+        return await asyncio.to_thread(self.chat, messages, tools, system)
+
+    async def astream_chat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None = None,
+    ) -> AsyncIterator[ToolCall | LLMResponse]:
+        """LLMにリクエストを送信し、結果を届いた順に返す（ストリーミング版）
+
+        ツール呼び出し（ToolCall）は生成全体の完了を待たずに届いた時点で yield し、
+        最後にすべてを含む LLMResponse を yield する。
+        デフォルトでは achat の結果をまとめて返す。
+        ストリーミングAPIを持つプロバイダーはオーバーライドする。
+        """
+        response = await self.achat(messages, tools, system)
+        for tool_call in response.tool_calls:
+            yield tool_call
+        yield response
+
+    async def abatch_chat(
+        self,
+        conversations: list[list[dict]],
+        tools: list[dict],
+        max_concurrency: int = 8,
+    ) -> list[LLMResponse]:
+        """独立した複数の会話を並行して送る
+
+        デフォルトでは achat を asyncio.gather で並行実行する（同時実行数は
+        max_concurrency まで）。会話ごとの状態を持つプロバイダーはオーバーライドする。
+
+        Args:
+            conversations: 共通形式のメッセージリストのリスト
+            tools: 利用可能なツール定義
+            max_concurrency: 同時に送るリクエストの最大数
+
+        Returns:
+            conversations と同じ順序のレスポンスリスト
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def chat_one(messages: list[dict]) -> LLMResponse:
+            async with semaphore:
+                return await self.achat(messages, tools)
+
+        return await asyncio.gather(*(chat_one(messages) for messages in conversations))
+
+    def reset_conversation(self) -> None:
+        """会話ごとに保持している状態を破棄（状態を持つプロバイダーはオーバーライドする）"""
+        pass
+
     @abstractmethod
     def format_tool_result(self, tool_call_id: str, result: str) -> dict:
         """ツール実行結果をプロバイダー固有の形式にフォーマット
@@ -1,12 +1,22 @@
+import asyncio
+import hashlib
+import json
+import logging
+import operator
 import os
+import time
 import uuid
+from collections.abc import AsyncIterator
 from dataclasses import dataclass, field
 
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 
-from ..colors import print_llm
 from .base import BaseLLMClient, LLMResponse, ToolCall
+from .response_cache import ResponseCache
+from .semantic_cache import SemanticCache
+
+_log = logging.getLogger(__name__)
 
 
 @dataclass
@@ -33,11 +43,17 @@ class GeminiClient(BaseLLMClient):
         "You are a helpful coding assistant. "
         "Use tools when needed to accomplish the user's request."
     )
+    # システムプロンプトとツール定義を Gemini のコンテキストキャッシュに置いておく時間
+    CONTEXT_CACHE_TTL = 600  # seconds
+    # 期限ぎりぎりのキャッシュは使わず作り直す
+    CONTEXT_CACHE_MARGIN = 30  # seconds
 
     def __init__(
         self,
         api_key: str | None = None,
         model: str | None = None,
+        use_cache: bool = True,
+        semantic_cache: bool = False,
     ):
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
         if not self.api_key:
@@ -48,6 +64,18 @@ class GeminiClient(BaseLLMClient):
 
         self.client = genai.Client(api_key=self.api_key)
         self.model = model or self.DEFAULT_MODEL
+        # 同じリクエストへの応答を再利用する（--no-cache で無効化）
+        self.cache = ResponseCache() if use_cache else None
+        # 言い換えた依頼にも応答を再利用する（任意: faiss と sentence-transformers が必要）
+        self.semantic_cache = SemanticCache() if use_cache and semantic_cache else None
+        # Gemini 形式のツール定義（同じ tools のリストの間は変換し直さない）
+        self._tools_src: list[dict] | None = None
+        self._gemini_tools: list[types.Tool] | None = None
+        self._tools_hash = ""
+        # (システムプロンプト, ツールのハッシュ) -> (キャッシュ名 or 使えない場合 None, 期限)
+        self._context_caches: dict[tuple[str, str], tuple[str | None, float]] = {}
+        # (変換済みのメッセージ, 変換結果) 次のターンでは増えた末尾だけを変換する
+        self._conv_cache: tuple[list[dict], list[types.Content]] | None = None
 
     @property
     def provider_name(self) -> str:
@@ -71,73 +99,87 @@ class GeminiClient(BaseLLMClient):
         self,
         messages: list[dict],
     ) -> list[types.Content]:
-        """共通形式のメッセージをGemini形式に変換"""
-        gemini_contents = []
-
-        for msg in messages:
+        """共通形式のメッセージをGemini形式に変換
+
+        履歴の先頭はターンをまたいで変わらないので、前回変換したメッセージと同じ
+        オブジェクトが先頭に並んでいれば、その変換結果を再利用して末尾だけを変換する。
+        """
+        gemini_contents: list[types.Content] = []
+        start = 0
+        if self._conv_cache is not None:
+            prev_messages, prev_contents = self._conv_cache
+            if len(prev_messages) <= len(messages) and all(
+                map(operator.is_, prev_messages, messages)
+            ):
+                gemini_contents = prev_contents.copy()
+                start = len(prev_messages)
+
+        Content = types.Content
+        from_text = types.Part.from_text
+        from_function_call = types.Part.from_function_call
+        from_function_response = types.Part.from_function_response
+
+        for msg in messages[start:]:
             role = msg["role"]
             content = msg["content"]
 
             if role == "user":
                 # tool_result の場合
                 if isinstance(content, list) and content and content[0].get("type") == "tool_result":
-                    parts = []
-                    for item in content:
-                        parts.append(types.Part.from_function_response(
+                    parts = [
+                        from_function_response(
                             name=item.get("tool_name", "unknown"),
                             response={"result": item["content"]},
-                        ))
-                    gemini_contents.append(types.Content(role="user", parts=parts))
+                        )
+                        for item in content
+                    ]
+                    gemini_contents.append(Content(role="user", parts=parts))
                 else:
-                    gemini_contents.append(types.Content(
+                    gemini_contents.append(Content(
                         role="user",
-                        parts=[types.Part.from_text(text=content)],
+                        parts=[from_text(text=content)],
                     ))
 
             elif role == "assistant":
                 if isinstance(content, list):
                     parts = []
                     for block in content:
-                        if hasattr(block, "type"):
-                            if block.type == "text":
-                                parts.append(types.Part.from_text(text=block.text))
-                            elif block.type == "tool_use":
-                                parts.append(types.Part.from_function_call(
-                                    name=block.name,
-                                    args=block.input,
-                                ))
+                        block_type = getattr(block, "type", None)
+                        if block_type == "text":
+                            parts.append(from_text(text=block.text))
+                        elif block_type == "tool_use":
+                            parts.append(from_function_call(
+                                name=block.name,
+                                args=block.input,
+                            ))
                     if parts:
-                        gemini_contents.append(types.Content(role="model", parts=parts))
+                        gemini_contents.append(Content(role="model", parts=parts))
                 else:
-                    gemini_contents.append(types.Content(
+                    gemini_contents.append(Content(
                         role="model",
-                        parts=[types.Part.from_text(text=content)],
+                        parts=[from_text(text=content)],
                     ))
 
+        # メッセージへの参照を持つので、同じ id の別オブジェクトと取り違えることはない
+        self._conv_cache = (list(messages), gemini_contents)
         return gemini_contents
 
+    def reset_conversation(self) -> None:
+        """変換済みメッセージのキャッシュを破棄（会話履歴をクリアしたときに呼ぶ）"""
+        self._conv_cache = None
+
     def chat(
         self,
         messages: list[dict],
         tools: list[dict],
         system: str | None = None,
     ) -> LLMResponse:
-        print()
-        print_llm(f"Sending request to {self.provider_name}...")
-        print_llm(f"Model: {self.model}")
-        print_llm(f"Messages count: {len(messages)}")
-        print_llm(f"Tools count: {len(tools)}")
+        pending, cached = self._lookup_cache(messages, tools, system)
+        if cached is not None:
+            return cached
 
-        gemini_contents = self._convert_messages_to_gemini_format(messages)
-        gemini_tools = self._convert_tools_to_gemini_format(tools) if tools else None
-
-        config = types.GenerateContentConfig(
-            system_instruction=system or self.DEFAULT_SYSTEM_PROMPT,
-            tools=gemini_tools,
-            automatic_function_calling=types.AutomaticFunctionCallingConfig(
-                disable=True  # 手動でfunction callを処理する
-            ),
-        )
+        cached_content = self._context_cache(system, tools)
+        gemini_contents, config = self._build_request(messages, tools, system, cached_content)
 
         response = self.client.models.generate_content(
             model=self.model,
@@ -145,7 +187,287 @@ class GeminiClient(BaseLLMClient):
             config=config,
         )
 
-        # 統一形式に変換
+        return self._store_cache(pending, self._convert_response(response))
+
+    async def achat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None = None,
+    ) -> LLMResponse:
+        """非同期版（genai の非同期クライアント client.aio を使う）
+
+        スレッドを使わずにレスポンスを待つため、abatch_chat で多数のリクエストを
+        並行して送っても待ち時間が重なり合う。
+        """
+        pending, cached = await self._alookup_cache(messages, tools, system)
+        if cached is not None:
+            return cached
+
+        gemini_contents, config = await self._abuild_request(messages, tools, system)
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=gemini_contents,
+            config=config,
+        )
+
+        return self._store_cache(pending, self._convert_response(response))
+
+    async def astream_chat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None = None,
+    ) -> AsyncIterator[ToolCall | LLMResponse]:
+        """ストリーミング版（generate_content_stream）
+
+        Gemini の function_call は引数が揃った状態でチャンクに含まれるので、
+        届いた時点で ToolCall として yield する（残りの生成中にツールを実行できる）。
+        """
+        pending, cached = await self._alookup_cache(messages, tools, system)
+        if cached is not None:
+            for tool_call in cached.tool_calls:
+                yield tool_call
+            yield cached
+            return
+
+        gemini_contents, config = await self._abuild_request(messages, tools, system)
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=gemini_contents,
+            config=config,
+        )
+
+        texts = []
+        tool_calls = []
+        last_chunk = None
+        async for chunk in stream:
+            last_chunk = chunk
+            if not (chunk.candidates and chunk.candidates[0].content):
+                continue
+            for part in chunk.candidates[0].content.parts or ():
+                if part.text:
+                    texts.append(part.text)
+                elif part.function_call:
+                    tool_call = self._convert_function_call(part.function_call)
+                    tool_calls.append(tool_call)
+                    yield tool_call
+
+        stop_reason = "tool_use" if tool_calls else "end_turn"
+        _log.debug("Response stop_reason: %s", stop_reason)
+
+        yield self._store_cache(pending, LLMResponse(
+            text="".join(texts) or None,
+            tool_calls=tool_calls,
+            stop_reason=stop_reason,
+            raw_response=last_chunk,
+        ))
+
+    async def abatch_chat(
+        self,
+        conversations: list[list[dict]],
+        tools: list[dict],
+        max_concurrency: int = 8,
+        qpm: int | None = None,
+    ) -> list[LLMResponse]:
+        """独立した複数の会話を並行して Gemini に送る
+
+        qpm（1分あたりのリクエスト数の上限）を指定すると、リクエストの開始時刻を
+        60/qpm 秒ずつずらして API のレート制限を超えないようにする。
+        """
+        if not qpm:
+            return await super().abatch_chat(conversations, tools, max_concurrency)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        start_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+
+        async def chat_one(messages: list[dict]) -> LLMResponse:
+            nonlocal next_start
+            async with semaphore:
+                async with start_lock:
+                    delay = next_start - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_start = max(next_start, loop.time()) + 60 / qpm
+                return await self.achat(messages, tools)
+
+        return await asyncio.gather(*(chat_one(messages) for messages in conversations))
+
+    def batch_chat(
+        self,
+        conversations: list[list[dict]],
+        tools: list[dict],
+        max_concurrency: int = 8,
+        qpm: int | None = None,
+    ) -> list[LLMResponse]:
+        """abatch_chat の同期版（イベントループの外から呼ぶ）"""
+        return asyncio.run(self.abatch_chat(conversations, tools, max_concurrency, qpm))
+
+    async def _alookup_cache(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None,
+    ) -> tuple[tuple, LLMResponse | None]:
+        """_lookup_cache の非同期版"""
+        if self.semantic_cache is None:
+            return self._lookup_cache(messages, tools, system)
+        # 埋め込みの計算（初回はモデルの読み込み）でイベントループを止めない
+        return await asyncio.to_thread(self._lookup_cache, messages, tools, system)
+
+    async def _abuild_request(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None,
+    ) -> tuple[list[types.Content], types.GenerateContentConfig]:
+        """コンテキストキャッシュを用意してから _build_request する"""
+        ready, cached_content = self._ready_context_cache(system, tools)
+        if not ready:
+            # キャッシュの作成は同期 API なので別スレッドで（作成済みなら呼ばない）
+            cached_content = await asyncio.to_thread(self._context_cache, system, tools)
+        return self._build_request(messages, tools, system, cached_content)
+
+    def _lookup_cache(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None,
+    ) -> tuple[tuple, LLMResponse | None]:
+        """完全一致キャッシュ → セマンティックキャッシュの順に引く
+
+        Returns:
+            (応答を保存するときに _store_cache に渡す値, キャッシュ済みの応答（なければ None）)
+        """
+        key = query = None
+        if self.cache is not None:
+            key = ResponseCache.key(self.model, system, tools, messages)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return (None, None), cached
+
+        # 言い換えへの再利用は文脈のない最初の依頼だけ（ツール呼び出し後の履歴には使わない）
+        if self.semantic_cache is not None and self._is_first_request(messages):
+            query = (
+                self.semantic_cache.embed(messages[0]["content"]),
+                SemanticCache.context_key(self.model, system, tools),
+            )
+            cached = self.semantic_cache.lookup(*query)
+            if cached is not None:
+                return (key, None), cached
+
+        return (key, query), None
+
+    def _store_cache(self, pending: tuple, response: LLMResponse) -> LLMResponse:
+        key, query = pending
+        if key is not None:
+            self.cache.put(key, response)
+        if query is not None:
+            self.semantic_cache.add(*query, response)
+        return response
+
+    @staticmethod
+    def _is_first_request(messages: list[dict]) -> bool:
+        return (
+            len(messages) == 1
+            and messages[0]["role"] == "user"
+            and isinstance(messages[0]["content"], str)
+        )
+
+    def _get_gemini_tools(self, tools: list[dict]) -> list[types.Tool] | None:
+        """Gemini 形式のツール定義（同じ tools のリストならキャッシュを返す）"""
+        if tools is not self._tools_src:
+            self._gemini_tools = self._convert_tools_to_gemini_format(tools) if tools else None
+            self._tools_hash = hashlib.blake2b(
+                json.dumps(tools, sort_keys=True).encode()
+            ).hexdigest()
+            self._tools_src = tools
+        return self._gemini_tools
+
+    def _ready_context_cache(
+        self,
+        system: str | None,
+        tools: list[dict],
+    ) -> tuple[bool, str | None]:
+        """API を呼ばずに決まる場合は (True, キャッシュ名 or 使えない場合 None)"""
+        self._get_gemini_tools(tools)
+        entry = self._context_caches.get((system or self.DEFAULT_SYSTEM_PROMPT, self._tools_hash))
+        if entry is not None and entry[1] > time.monotonic():
+            return True, entry[0]
+        return False, None
+
+    def _context_cache(self, system: str | None, tools: list[dict]) -> str | None:
+        """システムプロンプトとツール定義を置いたコンテキストキャッシュ名
+
+        毎ターン同じ内容を送らずに済むよう、(システムプロンプト, ツール) ごとに
+        Gemini のコンテキストキャッシュを作って再利用する（期限が近づいたら作り直す）。
+        モデルが対応していない・内容が最小トークン数に満たないなどで作れない場合は
+        None を返し、以降は通常どおり毎回送る。
+        """
+        gemini_tools = self._get_gemini_tools(tools)
+        system_instruction = system or self.DEFAULT_SYSTEM_PROMPT
+        key = (system_instruction, self._tools_hash)
+        entry = self._context_caches.get(key)
+        if entry is not None and (entry[0] is None or entry[1] > time.monotonic()):
+            return entry[0]
+
+        try:
+            cache = self.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    tools=gemini_tools,
+                    ttl=f"{self.CONTEXT_CACHE_TTL}s",
+                ),
+            )
+        except errors.APIError as e:
+            _log.debug("Context caching unavailable, sending the full prompt: %s", e)
+            self._context_caches[key] = (None, float("inf"))
+            return None
+
+        _log.debug("Created context cache: %s", cache.name)
+        expires = time.monotonic() + self.CONTEXT_CACHE_TTL - self.CONTEXT_CACHE_MARGIN
+        self._context_caches[key] = (cache.name, expires)
+        return cache.name
+
+    def _build_request(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None,
+        cached_content: str | None = None,
+    ) -> tuple[list[types.Content], types.GenerateContentConfig]:
+        """リクエストの contents と config を組み立てる
+
+        cached_content があれば、システムプロンプトとツール定義はそちらから使う。
+        """
+        _log.debug("Sending request to %s...", self.provider_name)
+        _log.debug("Model: %s", self.model)
+        _log.debug("Messages count: %d", len(messages))
+        _log.debug("Tools count: %d", len(tools))
+
+        gemini_contents = self._convert_messages_to_gemini_format(messages)
+        afc = types.AutomaticFunctionCallingConfig(
+            disable=True  # 手動でfunction callを処理する
+        )
+
+        if cached_content is not None:
+            config = types.GenerateContentConfig(
+                cached_content=cached_content,
+                automatic_function_calling=afc,
+            )
+        else:
+            config = types.GenerateContentConfig(
+                system_instruction=system or self.DEFAULT_SYSTEM_PROMPT,
+                tools=self._get_gemini_tools(tools),
+                automatic_function_calling=afc,
+            )
+        return gemini_contents, config
+
+    def _convert_response(self, response: types.GenerateContentResponse) -> LLMResponse:
+        """Gemini のレスポンスを統一形式に変換"""
         text = None
         tool_calls = []
 
@@ -155,15 +477,10 @@ class GeminiClient(BaseLLMClient):
                 if part.text:
                     text = part.text
                 elif part.function_call:
-                    # Gemini はツールIDを返さないので生成
-                    tool_calls.append(ToolCall(
-                        id=f"call_{uuid.uuid4().hex[:8]}",
-                        name=part.function_call.name,
-                        input=dict(part.function_call.args) if part.function_call.args else {},
-                    ))
+                    tool_calls.append(self._convert_function_call(part.function_call))
 
         stop_reason = "tool_use" if tool_calls else "end_turn"
-        print_llm(f"Response stop_reason: {stop_reason}")
+        _log.debug("Response stop_reason: %s", stop_reason)
 
         return LLMResponse(
             text=text,
@@ -172,6 +489,15 @@ class GeminiClient(BaseLLMClient):
             raw_response=response,
         )
 
+    @staticmethod
+    def _convert_function_call(function_call: types.FunctionCall) -> ToolCall:
+        # Gemini はツールIDを返さないので生成
+        return ToolCall(
+            id=f"call_{uuid.uuid4().hex[:8]}",
+            name=function_call.name,
+            input=dict(function_call.args) if function_call.args else {},
+        )
+
     def format_tool_result(self, tool_call_id: str, result: str, tool_name: str = "unknown") -> dict:
         """Gemini形式: function_response として追加"""
         return {
@@ -1,11 +1,98 @@
+import asyncio
 import json
+import logging
 import os
+import re
 import uuid
+import weakref
 
 import httpx
 
 from .base import BaseLLMClient, LLMResponse, ToolCall
 
+try:
+    import h2  # noqa: F401  任意: httpx の HTTP/2 サポート（pip install "httpx[http2]"）
+except ImportError:
+    HTTP2_AVAILABLE = False
+else:
+    HTTP2_AVAILABLE = True
+
+try:
+    import orjson  # 任意: 高速な JSON シリアライザ（pip install orjson）
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(obj: object, indent: bool = False) -> str:
+    """JSON 文字列に変換（orjson があれば使う。非 ASCII 文字はエスケープしない）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+
+def _json_body(obj: object) -> bytes:
+    """リクエストボディ用の JSON バイト列（httpx の json= による json.dumps を通さない）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode()
+
+
+def _json_loads(data: str | bytes) -> object:
+    """JSON をパース（orjson.JSONDecodeError は json.JSONDecodeError のサブクラス）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# ==================================================
+# 共有 HTTP クライアント
+# ==================================================
+# LlamaClient のインスタンスごとに接続プールを持たず、プロセス全体で共有する
+# （BatchProcessor などで複数のエージェントを動かしても接続を使い回せる）。
+# AsyncClient はイベントループに紐づくため、ループごとに1つ作る。
+
+# 生成には時間がかかるので読み込みは長く待つが、
+# Ollama が起動していない場合などは接続ですぐに失敗させる
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+# 接続の確立に失敗したときだけ再試行する（リクエストは送られていないので POST でも安全）
+_HTTP_RETRIES = 2
+_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_http() -> httpx.AsyncClient:
+    """実行中のイベントループ用の共有 httpx.AsyncClient"""
+    loop = asyncio.get_running_loop()
+    client = _HTTP_CLIENTS.get(loop)
+    if client is None:
+        client = _HTTP_CLIENTS[loop] = httpx.AsyncClient(
+            timeout=_HTTP_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(
+                limits=_HTTP_LIMITS,
+                http2=HTTP2_AVAILABLE,
+                retries=_HTTP_RETRIES,
+            ),
+        )
+    return client
+
+
+async def aclose_http() -> None:
+    """実行中のイベントループ用の共有 HTTP クライアントを閉じる"""
+    client = _HTTP_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# 変換済みの Ollama 形式を共通形式のメッセージに保存するキー
+_OLLAMA_CACHE_KEY = "_ollama"
+
+# ```json ... ``` のようなコードブロックの中身
+_FENCE_RE = re.compile(r"\A```[^\n]*\n(.*?)\n?```\Z", re.DOTALL)
+
+_log = logging.getLogger(__name__)
+
 
 class LlamaClient(BaseLLMClient):
     """Llama APIクライアント（Ollama経由）
@@ -21,6 +108,7 @@ class LlamaClient(BaseLLMClient):
 
     DEFAULT_MODEL = "llama3.1:8b"
     DEFAULT_BASE_URL = "http://localhost:11434"
+    JSON_HEADERS = {"Content-Type": "application/json"}
 
     SYSTEM_PROMPT_TEMPLATE = '''You are a helpful coding assistant. You have access to the following tools:
 
@@ -45,7 +133,10 @@ IMPORTANT:
 - Always respond with valid JSON only, no other text
 - Use "tool_call" when you need to use a tool
 - Use "response" when you're done and want to reply to the user
-- Never include both "tool_call" and "response" in the same message'''
+- Never include both "tool_call" and "response" in the same message
+
+Tool results are sent back to you as {{"tool_result": {{"name": ..., "result": ...}}}},
+or as {{"tool_results": [{{"name": ..., "result": ...}}, ...]}} when several tools ran at once.'''
 
     def __init__(
         self,
@@ -55,69 +146,147 @@ IMPORTANT:
     ):
         self.model = model or self.DEFAULT_MODEL
         self.base_url = base_url or os.environ.get("OLLAMA_BASE_URL", self.DEFAULT_BASE_URL)
-        self.client = httpx.Client(timeout=120.0)
+        # 同期版 chat 用のイベントループ（呼び出しごとに作らず、接続プールを維持する）
+        self._runner: asyncio.Runner | None = None
+        # システムプロンプトは tools のリストが同じ間は作り直さない
+        self._system_prompt: str | None = None
+        self._system_prompt_tools: list[dict] | None = None
+        # Ollama 形式に変換済みのメッセージ（共通形式の messages[:_converted_upto] に対応）
+        self._ollama_messages: list[dict] = []
+        self._converted_upto = 0
+        self._last_converted: dict | None = None
 
     @property
     def provider_name(self) -> str:
         return "Llama (Ollama)"
 
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        """実行中のイベントループ用の httpx.AsyncClient（全インスタンスで共有）"""
+        return _get_http()
+
+    async def aclose(self) -> None:
+        """HTTP 接続を閉じる（共有クライアントのため、同じループの他のインスタンスにも影響する）"""
+        await aclose_http()
+
     def _format_tools_for_prompt(self, tools: list[dict]) -> str:
-        """ツール定義をシステムプロンプト用にフォーマット"""
-        tool_descriptions = []
-        for tool in tools:
-            desc = f"- {tool['name']}: {tool['description']}\n"
-            desc += f"  Parameters: {json.dumps(tool['input_schema'], indent=2)}"
-            tool_descriptions.append(desc)
-        return "\n\n".join(tool_descriptions)
+        """ツール定義をシステムプロンプト用にフォーマット
+
+        結果は _get_system_prompt でキャッシュされるため、tools が変わったときだけ呼ばれる。
+        """
+        return "\n\n".join(
+            f"- {tool['name']}: {tool['description']}\n"
+            f"  Parameters: {_json_dumps(tool['input_schema'], indent=True)}"
+            for tool in tools
+        )
+
+    def _get_system_prompt(self, tools: list[dict]) -> str:
+        """ツール定義を埋め込んだシステムプロンプト（同じ tools のリストならキャッシュを返す）"""
+        if self._system_prompt is None or tools is not self._system_prompt_tools:
+            self._system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
+                tool_definitions=self._format_tools_for_prompt(tools)
+            )
+            self._system_prompt_tools = tools
+        return self._system_prompt
 
     def _convert_messages_to_ollama_format(
         self,
         messages: list[dict],
         tools: list[dict],
     ) -> list[dict]:
-        """メッセージを Ollama 形式に変換"""
-        ollama_messages = []
+        """メッセージを Ollama 形式に変換
 
-        # システムプロンプトを先頭に追加
-        system_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
-            tool_definitions=self._format_tools_for_prompt(tools)
-        )
-        ollama_messages.append({"role": "system", "content": system_prompt})
-
-        for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
-
-            if role == "user":
-                # tool_result の場合
-                if isinstance(content, list) and content and content[0].get("type") == "tool_result":
-                    for item in content:
-                        # ツール結果を JSON で伝える
-                        result_json = json.dumps({
-                            "tool_result": {
-                                "name": item.get("tool_name", "unknown"),
-                                "result": item["content"]
-                            }
-                        }, ensure_ascii=False)
-                        ollama_messages.append({"role": "user", "content": result_json})
+        変換済みのメッセージは保持しておき、前回以降に追加された分だけを変換する
+        （毎ターン履歴全体を JSON にし直さない）。履歴が前回の続きでなければ作り直す。
+        """
+        upto = self._converted_upto
+        if upto > len(messages) or (upto and messages[upto - 1] is not self._last_converted):
+            self.reset_conversation()
+            upto = 0
+
+        if not self._ollama_messages:
+            self._ollama_messages.append({"role": "system", "content": ""})
+        # システムプロンプトを先頭に置く（tools が変わった場合も差し替える）
+        self._ollama_messages[0]["content"] = self._get_system_prompt(tools)
+
+        for msg in messages[upto:]:
+            self._ollama_messages.extend(self._convert_message(msg))
+        if messages:
+            self._last_converted = messages[-1]
+        self._converted_upto = len(messages)
+        return self._ollama_messages
+
+    @classmethod
+    def _convert_message(cls, msg: dict) -> list[dict]:
+        """共通形式のメッセージ1件を Ollama 形式（0件以上）に変換
+
+        変換結果（JSON 文字列を含む）はメッセージ自身の "_ollama" に保存しておき、
+        バッファを作り直すときや abatch_chat でも再シリアライズしない。
+        """
+        converted = msg.get(_OLLAMA_CACHE_KEY)
+        if converted is None:
+            converted = msg[_OLLAMA_CACHE_KEY] = cls._serialize_message(msg)
+        return converted
+
+    @staticmethod
+    def _serialize_message(msg: dict) -> list[dict]:
+        role = msg["role"]
+        content = msg["content"]
+
+        if role == "user":
+            # tool_result の場合
+            if isinstance(content, list) and content and content[0].get("type") == "tool_result":
+                # ツール結果を JSON で伝える（複数ある場合は1件のメッセージに配列でまとめる）
+                results = [
+                    {"name": item.get("tool_name", "unknown"), "result": item["content"]}
+                    for item in content
+                ]
+                if len(results) == 1:
+                    envelope = {"tool_result": results[0]}
                 else:
-                    ollama_messages.append({"role": "user", "content": content})
+                    envelope = {"tool_results": results}
+                return [{"role": "user", "content": _json_dumps(envelope)}]
+            return [{"role": "user", "content": content}]
+
+        elif role == "assistant":
+            # アシスタントメッセージ
+            if isinstance(content, str):
+                return [{"role": "assistant", "content": content}]
+            elif isinstance(content, dict):
+                # 保存された JSON 形式
+                return [{
+                    "role": "assistant",
+                    "content": _json_dumps(content)
+                }]
+
+        return []
+
+    def reset_conversation(self) -> None:
+        """変換済みメッセージのバッファを破棄（会話履歴をクリアしたときに呼ぶ）"""
+        self._ollama_messages = []
+        self._converted_upto = 0
+        self._last_converted = None
+
+    def _parse_json_mode_response(
+        self,
+        response_text: str,
+    ) -> tuple[str | None, list[ToolCall], str]:
+        """JSON モード（"format": "json"）のレスポンスをパース
 
-            elif role == "assistant":
-                # アシスタントメッセージ
-                if isinstance(content, str):
-                    ollama_messages.append({"role": "assistant", "content": content})
-                elif isinstance(content, dict):
-                    # 保存された JSON 形式
-                    ollama_messages.append({
-                        "role": "assistant",
-                        "content": json.dumps(content, ensure_ascii=False)
-                    })
+        Ollama の JSON モードでは本文がそのまま JSON なので、コードブロックの除去を省いて
+        直接パースする。パースできなければ _parse_llm_response で読み直す。
 
-        return ollama_messages
+        Returns:
+            tuple: (text, tool_calls, stop_reason)
+        """
+        try:
+            data = _json_loads(response_text)
+        except json.JSONDecodeError:
+            return self._parse_llm_response(response_text)
+        return self._interpret_response(data, response_text)
 
     def _parse_llm_response(self, response_text: str) -> tuple[str | None, list[ToolCall], str]:
-        """LLM のレスポンスをパース
+        """LLM のレスポンスをパース（コードブロックで囲まれた JSON にも対応）
 
         Returns:
             tuple: (text, tool_calls, stop_reason)
@@ -126,80 +295,147 @@ IMPORTANT:
             # JSON をパース
             response_text = response_text.strip()
 
-            # コードブロックで囲まれている場合は除去
+            # コードブロックで囲まれている場合は除去（行への分割はしない）
             if response_text.startswith("```"):
-                lines = response_text.split("\n")
-                # 最初と最後の ``` を除去
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                if lines and lines[-1].strip() == "```":
-                    lines = lines[:-1]
-                response_text = "\n".join(lines)
-
-            data = json.loads(response_text)
-
-            thought = data.get("thought", "")
-
-            # tool_call がある場合
-            if "tool_call" in data and data["tool_call"]:
-                tool_call_data = data["tool_call"]
-                tool_calls = [
-                    ToolCall(
-                        id=f"call_{uuid.uuid4().hex[:8]}",
-                        name=tool_call_data["name"],
-                        input=tool_call_data.get("input", {}),
-                    )
-                ]
-                return thought, tool_calls, "tool_use"
+                match = _FENCE_RE.match(response_text)
+                # 閉じる ``` がなければ最初の行だけ除去
+                response_text = match.group(1) if match else response_text.partition("\n")[2]
 
-            # response がある場合（タスク完了）
-            if "response" in data:
-                return data["response"], [], "end_turn"
-
-            # どちらもない場合はテキストとして返す
-            return response_text, [], "end_turn"
+            data = _json_loads(response_text)
 
         except json.JSONDecodeError as e:
             # JSON パースに失敗した場合はそのままテキストとして返す
-            print(f"[LLM] Warning: Failed to parse JSON response: {e}")
+            _log.warning("Failed to parse JSON response: %s", e)
+            return response_text, [], "end_turn"
+
+        return self._interpret_response(data, response_text)
+
+    @staticmethod
+    def _interpret_response(
+        data: object,
+        response_text: str,
+    ) -> tuple[str | None, list[ToolCall], str]:
+        """パース済みの JSON からテキスト・ツール呼び出し・stop_reason を取り出す"""
+        # 配列や文字列など、オブジェクト以外の JSON はテキストとして返す
+        if not isinstance(data, dict):
             return response_text, [], "end_turn"
 
+        thought = data.get("thought", "")
+
+        # tool_call がある場合
+        if "tool_call" in data and data["tool_call"]:
+            tool_call_data = data["tool_call"]
+            tool_calls = [
+                ToolCall(
+                    id=f"call_{uuid.uuid4().hex[:8]}",
+                    name=tool_call_data["name"],
+                    input=tool_call_data.get("input", {}),
+                )
+            ]
+            return thought, tool_calls, "tool_use"
+
+        # response がある場合（タスク完了）
+        if "response" in data:
+            return data["response"], [], "end_turn"
+
+        # どちらもない場合はテキストとして返す
+        return response_text, [], "end_turn"
+
     def chat(
         self,
         messages: list[dict],
         tools: list[dict],
         system: str | None = None,
     ) -> LLMResponse:
-        print(f"\n[LLM] Sending request to {self.provider_name}...")
-        print(f"[LLM] Model: {self.model}")
-        print(f"[LLM] Messages count: {len(messages)}")
-        print(f"[LLM] Tools count: {len(tools)}")
+        """同期版（専用のイベントループで achat を実行）"""
+        if self._runner is None:
+            self._runner = asyncio.Runner()
+        return self._runner.run(self.achat(messages, tools, system))
+
+    async def achat(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        system: str | None = None,
+    ) -> LLMResponse:
+        _log.debug("Sending request to %s...", self.provider_name)
+        _log.debug("Model: %s", self.model)
+        _log.debug("Messages count: %d", len(messages))
+        _log.debug("Tools count: %d", len(tools))
 
         ollama_messages = self._convert_messages_to_ollama_format(messages, tools)
+        return await self._request(ollama_messages)
+
+    async def abatch_chat(
+        self,
+        conversations: list[list[dict]],
+        tools: list[dict],
+        max_concurrency: int = 8,
+    ) -> list[LLMResponse]:
+        """独立した複数の会話を並行して Ollama に送る
+
+        achat と違い、変換済みメッセージのバッファ（会話の状態）は使わない。
+
+        Args:
+            conversations: 共通形式のメッセージリストのリスト
+            tools: 利用可能なツール定義
+            max_concurrency: 同時に送るリクエストの最大数
 
-        # Ollama API を呼び出し
+        Returns:
+            conversations と同じ順序のレスポンスリスト
+        """
+        _log.debug("Sending %d requests to %s...", len(conversations), self.provider_name)
+        system_message = {"role": "system", "content": self._get_system_prompt(tools)}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def chat_one(messages: list[dict]) -> LLMResponse:
+            ollama_messages = [system_message]
+            for msg in messages:
+                ollama_messages.extend(self._convert_message(msg))
+            async with semaphore:
+                return await self._request(ollama_messages)
+
+        return await asyncio.gather(*(chat_one(messages) for messages in conversations))
+
+    async def _request(self, ollama_messages: list[dict]) -> LLMResponse:
+        """Ollama 形式のメッセージを /api/chat に送り、レスポンスをパース"""
+        # Ollama API を呼び出し（ストリーミングで受け取り、転送と並行して本文を溜める）
+        chunks: list[str] = []
+        result: dict = {}
         try:
-            response = self.client.post(
+            async with self.aclient.stream(
+                "POST",
                 f"{self.base_url}/api/chat",
-                json={
+                content=_json_body({
                     "model": self.model,
                     "messages": ollama_messages,
-                    "stream": False,
+                    "stream": True,
                     "format": "json",  # JSON モードを強制
-                },
-            )
-            response.raise_for_status()
-            result = response.json()
+                }),
+                headers=self.JSON_HEADERS,
+            ) as response:
+                response.raise_for_status()
+                # 1行に1つの JSON オブジェクト（NDJSON）が届く
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    result = _json_loads(line)
+                    chunks.append(result.get("message", {}).get("content", ""))
+                    if result.get("done"):
+                        break
         except httpx.HTTPError as e:
             raise RuntimeError(f"Failed to call Ollama API: {e}")
 
-        response_text = result.get("message", {}).get("content", "")
-        print(f"[LLM] Raw response: {response_text[:200]}...")
+        # JSON としてのパースは全体が揃ってから1回だけ行う
+        response_text = "".join(chunks)
+        # raw_response は非ストリーミング時と同じ形（最後のチャンク + 本文全体）にしておく
+        result["message"] = {"role": "assistant", "content": response_text}
+        _log.debug("Raw response: %.200s...", response_text)
 
-        # レスポンスをパース
-        text, tool_calls, stop_reason = self._parse_llm_response(response_text)
+        # レスポンスをパース（JSON モードで送っているので高速パスを使う）
+        text, tool_calls, stop_reason = self._parse_json_mode_response(response_text)
 
-        print(f"[LLM] Response stop_reason: {stop_reason}")
+        _log.debug("Response stop_reason: %s", stop_reason)
 
         return LLMResponse(
             text=text,
@@ -0,0 +1,83 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+
+from .base import LLMResponse
+
+_log = logging.getLogger(__name__)
+
+
+def _jsonable(obj: object) -> object:
+    """json.dumps で直接扱えないオブジェクト（TextBlock などの dataclass）を変換"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    return str(obj)
+
+
+class ResponseCache:
+    """リクエスト内容の BLAKE2b をキーにした LLM 応答の永続キャッシュ（SQLite）
+
+    同じモデル・システムプロンプト・ツール・メッセージ履歴のリクエストは
+    API を呼ばずに前回の LLMResponse を返す（リトライや同じ質問の繰り返し）。
+    raw_response は保存しないため、キャッシュから返した応答では None になる。
+    """
+
+    DEFAULT_PATH = Path.home() / ".cache" / "glassbox-llm" / "responses.sqlite"
+    DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+    def __init__(self, path: str | Path | None = None, ttl: float | None = None):
+        self.path = Path(path) if path is not None else self.DEFAULT_PATH
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # BatchProcessor などで別スレッドから使われても良いように
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response BLOB, created REAL)"
+        )
+
+    @staticmethod
+    def key(
+        model: str,
+        system: str | None,
+        tools: list[dict],
+        messages: list[dict],
+    ) -> str:
+        """リクエスト内容から決定的なキャッシュキーを作る"""
+        payload = json.dumps(
+            {"model": model, "s": system, "t": tools, "m": messages},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=_jsonable,
+        )
+        return hashlib.blake2b(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> LLMResponse | None:
+        row = self._conn.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl:
+            with self._conn:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        _log.debug("Response cache hit: %s", key[:16])
+        return pickle.loads(row[0])
+
+    def put(self, key: str, response: LLMResponse) -> None:
+        data = pickle.dumps(dataclasses.replace(response, raw_response=None))
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, data, time.time()),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
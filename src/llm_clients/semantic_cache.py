@@ -0,0 +1,104 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import pickle
+import threading
+from pathlib import Path
+
+from .base import LLMResponse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import faiss  # 任意: ベクトル検索（pip install faiss-cpu）
+    from sentence_transformers import SentenceTransformer  # 任意: pip install sentence-transformers
+except ImportError:
+    faiss = None
+    SentenceTransformer = None
+
+SEMANTIC_CACHE_AVAILABLE = np is not None and faiss is not None
+
+_log = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """言い回しが違うだけの依頼に、前回の LLM 応答を再利用するキャッシュ
+
+    ユーザーの依頼文を小さなローカルモデルで埋め込み、FAISS の内積検索で
+    コサイン類似度が threshold 以上の過去の依頼が見つかれば、その応答を返す
+    （「Python ファイルを一覧して」と「.py ファイルを全部見せて」など）。
+
+    文脈を考慮しないため、会話の最初の依頼（ツール呼び出しもまだない状態）にだけ使う。
+    応答はモデル・システムプロンプト・ツール構成ごとに区別する。
+    """
+
+    DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    DIMENSION = 384
+    DEFAULT_THRESHOLD = 0.92
+    DEFAULT_DIR = Path.home() / ".cache" / "glassbox-llm" / "semantic"
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        threshold: float | None = None,
+        model_name: str | None = None,
+    ):
+        if not SEMANTIC_CACHE_AVAILABLE:
+            raise ImportError(
+                "SemanticCache requires faiss and sentence-transformers. "
+                "Install them with: pip install faiss-cpu sentence-transformers"
+            )
+        self.directory = Path(directory) if directory is not None else self.DEFAULT_DIR
+        self.threshold = threshold or self.DEFAULT_THRESHOLD
+        self.model_name = model_name or self.DEFAULT_MODEL
+        self._model: SentenceTransformer | None = None  # 初回の検索時に読み込む
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.directory / "index.faiss"
+        self._entries_path = self.directory / "entries.pickle"
+        if self._index_path.exists() and self._entries_path.exists():
+            self._index = faiss.read_index(str(self._index_path))
+            with open(self._entries_path, "rb") as f:
+                # (コンテキストのキー, 応答) を index と同じ順序で保持
+                self._entries: list[tuple[str, LLMResponse]] = pickle.load(f)
+        else:
+            self._index = faiss.IndexFlatIP(self.DIMENSION)
+            self._entries = []
+
+    @staticmethod
+    def context_key(model: str, system: str | None, tools: list[dict]) -> str:
+        """応答を区別するためのキー（モデル・システムプロンプト・ツール構成）"""
+        payload = json.dumps({"model": model, "s": system, "t": tools}, sort_keys=True)
+        return hashlib.blake2b(payload.encode()).hexdigest()
+
+    def embed(self, text: str) -> "np.ndarray":
+        """依頼文を正規化済みの埋め込み（1 x DIMENSION）に変換"""
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model.encode([text], normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, embedding: "np.ndarray", context_key: str) -> LLMResponse | None:
+        """最も近い過去の依頼が threshold 以上で、同じコンテキストなら応答を返す"""
+        with self._lock:
+            if self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(embedding, 1)
+            score, i = float(scores[0][0]), int(ids[0][0])
+            if score < self.threshold or self._entries[i][0] != context_key:
+                return None
+            _log.debug("Semantic cache hit (similarity %.3f)", score)
+            return self._entries[i][1]
+
+    def add(self, embedding: "np.ndarray", context_key: str, response: LLMResponse) -> None:
+        """応答を登録してディスクに保存"""
+        with self._lock:
+            self._index.add(embedding)
+            self._entries.append((context_key, dataclasses.replace(response, raw_response=None)))
+            faiss.write_index(self._index, str(self._index_path))
+            with open(self._entries_path, "wb") as f:
+                pickle.dump(self._entries, f)
@@ -10,6 +10,7 @@
 """
 
 import argparse
+import logging
 import sys
 from pathlib import Path
 
@@ -37,12 +38,19 @@ SUPPORTED_PROVIDERS = ["gemini", "llama"]
 DEFAULT_PROVIDER = "gemini"
 
 
-def create_agent(provider: str, model: str | None = None) -> Agent:
+def create_agent(
+    provider: str,
+    model: str | None = None,
+    use_cache: bool = True,
+    semantic_cache: bool = False,
+) -> Agent:
     """エージェントを初期化して返す
 
     Args:
         provider: LLMプロバイダー名
         model: モデル名（省略時はプロバイダーのデフォルト）
+        use_cache: LLM の応答をキャッシュするか
+        semantic_cache: 言い換えた依頼にもキャッシュした応答を使うか
 
     Returns:
         設定済みのAgentインスタンス
@@ -51,7 +59,12 @@ def create_agent(provider: str, model: str | None = None) -> Agent:
 
     # LLMクライアントの初期化
     print_init(f"Initializing LLM client ({cyan(provider)})...")
-    llm_client = create_llm_client(provider=provider, model=model)
+    llm_client = create_llm_client(
+        provider=provider,
+        model=model,
+        use_cache=use_cache,
+        semantic_cache=semantic_cache,
+    )
     print_init(f"Provider: {cyan(llm_client.provider_name)}")
 
     # ツールレジストリの初期化
@@ -138,6 +151,7 @@ Examples:
 Environment Variables:
   GEMINI_API_KEY     - Required for Gemini provider
   OLLAMA_BASE_URL    - Ollama API URL (default: http://localhost:11434)
+  SRC_AGENT_PROFILE  - Set to 1 to record latencies to agent_profile.jsonl
         """,
     )
 
@@ -155,15 +169,43 @@ Environment Variables:
         help="Model name (uses provider default if not specified)",
     )
 
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not reuse cached LLM responses for identical requests (Gemini)",
+    )
+
+    parser.add_argument(
+        "--semantic-cache",
+        action="store_true",
+        help="Also reuse responses for reworded first requests "
+             "(Gemini; requires faiss-cpu and sentence-transformers)",
+    )
+
+    parser.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="Show debug logs (LLM requests, message history, tool registry)",
+    )
+
     return parser.parse_args()
 
 
 def main() -> None:
     """エントリーポイント"""
     args = parse_args()
+    logging.basicConfig(format="[%(name)s] %(levelname)s: %(message)s")
+    if args.verbose:
+        # 依存ライブラリ（httpx など）のログは出さず、このパッケージの分だけ詳細にする
+        logging.getLogger(__package__).setLevel(logging.DEBUG)
 
     try:
-        agent = create_agent(provider=args.provider, model=args.model)
+        agent = create_agent(
+            provider=args.provider,
+            model=args.model,
+            use_cache=not args.no_cache,
+            semantic_cache=args.semantic_cache,
+        )
         run_interactive(agent)
     except ValueError as e:
         print_error(f"Configuration error: {e}")
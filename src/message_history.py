@@ -1,4 +1,9 @@
-from .colors import print_history
+import logging
+from collections import Counter
+
+from .llm_clients import ToolCall
+
+_log = logging.getLogger(__name__)
 
 
 class MessageHistory:
@@ -6,10 +11,34 @@ class MessageHistory:
 
     各プロバイダー共通のメッセージ形式で履歴を管理する。
     LLMクライアント側で適切な形式に変換される。
+
+    履歴は毎ターン丸ごと LLM に送られるため、長くなったら compact() で
+    古いやり取りを1件の要約メッセージに置き換える。
     """
 
+    # compact() のデフォルト: 直近何件を残すか / 何文字を超えたら圧縮するか
+    DEFAULT_KEEP_RECENT = 6
+    DEFAULT_MAX_CHARS = 32_000
+
     def __init__(self):
         self.messages: list[dict] = []
+        # 各メッセージのおおよその文字数（compact の判定を毎回数え直さない）
+        self._sizes: list[int] = []
+        self._total_chars = 0
+        # 直前の compact で作った要約メッセージとその集計（次の compact で合算する）
+        self._summary: dict | None = None
+        self._summary_stats: tuple[int, Counter[str], dict[str, None], list[str]] | None = None
+
+    def _append(self, message: dict) -> None:
+        size = self._message_chars(message)
+        self.messages.append(message)
+        self._sizes.append(size)
+        self._total_chars += size
+
+    @property
+    def total_chars(self) -> int:
+        """履歴全体のおおよその文字数"""
+        return self._total_chars
 
     def add_user_message(self, content: str) -> None:
         """ユーザーメッセージを追加
@@ -17,8 +46,8 @@ class MessageHistory:
         Args:
             content: ユーザーの入力テキスト
         """
-        self.messages.append({"role": "user", "content": content})
-        print_history(f"Added user message: {content[:50]}...")
+        self._append({"role": "user", "content": content})
+        _log.debug("Added user message: %.50s...", content)
 
     def add_raw_message(self, message: dict) -> None:
         """生のメッセージを追加（プロバイダー固有形式）
@@ -26,14 +55,15 @@ class MessageHistory:
         Args:
             message: メッセージ辞書
         """
-        self.messages.append(message)
-        print_history(f"Added {message.get('role', 'unknown')} message")
+        self._append(message)
+        _log.debug("Added %s message", message.get("role", "unknown"))
 
     def add_tool_result(
         self,
         tool_use_id: str,
         result: str,
         tool_name: str = "unknown",
+        tool_input: dict | None = None,
     ) -> None:
         """ツール実行結果を追加
 
@@ -44,27 +74,170 @@ class MessageHistory:
             tool_use_id: ツール呼び出しのID
             result: ツール実行結果の文字列
             tool_name: ツール名（Gemini用）
+            tool_input: ツールに渡した引数（compact の要約用）
+        """
+        self._append({
+            "role": "user",
+            "content": [self._tool_result_item(tool_use_id, result, tool_name, tool_input)],
+        })
+        _log.debug("Added tool result for %s (%s)", tool_use_id, tool_name)
+
+    def add_tool_results(self, tool_calls: list[ToolCall], results: list[str]) -> None:
+        """1回のレスポンスで呼ばれた複数のツールの結果を、1件のメッセージとして追加
+
+        結果ごとにメッセージを分けるより、プロンプト上のメッセージ数が少なくて済む。
+
+        Args:
+            tool_calls: ツール呼び出しのリスト
+            results: tool_calls と同じ順序の実行結果
         """
-        self.messages.append({
+        self._append({
             "role": "user",
-            "content": [{
-                "type": "tool_result",
-                "tool_use_id": tool_use_id,
-                "tool_name": tool_name,
-                "content": result,
-            }],
+            "content": [
+                self._tool_result_item(tool_call.id, result, tool_call.name, tool_call.input)
+                for tool_call, result in zip(tool_calls, results)
+            ],
         })
-        print_history(f"Added tool result for {tool_use_id} ({tool_name})")
+        _log.debug("Added %d tool results", len(results))
+
+    @staticmethod
+    def _tool_result_item(
+        tool_use_id: str,
+        result: str,
+        tool_name: str,
+        tool_input: dict | None,
+    ) -> dict:
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use_id,
+            "tool_name": tool_name,
+            "tool_input": tool_input or {},
+            "content": result,
+        }
 
     def get_messages(self) -> list[dict]:
-        """メッセージ履歴のコピーを取得
+        """メッセージ履歴を取得
+
+        毎ターン呼ばれるため、コピーせずに内部のリストをそのまま返す。
+        呼び出し側（LLMクライアント）は読み取りのみで、変更してはいけない
+        （変換結果のキャッシュを "_" で始まるキーに付け足すのは可）。
+
+        Returns:
+            メッセージリスト（読み取り専用として扱う）
+        """
+        return self.messages
+
+    def compact(
+        self,
+        keep_recent: int | None = None,
+        max_chars: int | None = None,
+    ) -> bool:
+        """履歴が長すぎる場合に、中間のやり取りを1件の要約に置き換える
+
+        最初のユーザーメッセージと直近 keep_recent 件は残し、その間を
+        「ユーザーの依頼、何回どのツールを呼んだか、どのファイルを触ったか」の要約にする。
+        対応する呼び出しのないツール結果が残らないよう、境界はツール結果の後ろにずらす。
+
+        Args:
+            keep_recent: 残す直近のメッセージ数
+            max_chars: この文字数を超えたら圧縮する
 
         Returns:
-            メッセージリストのコピー
+            圧縮した場合は True
         """
-        return self.messages.copy()
+        keep_recent = keep_recent or self.DEFAULT_KEEP_RECENT
+        max_chars = max_chars or self.DEFAULT_MAX_CHARS
+        if self._total_chars <= max_chars:
+            return False
+
+        start = max(len(self.messages) - keep_recent, 1)
+        while start < len(self.messages) and self._is_tool_result(self.messages[start]):
+            start += 1
+        if start <= 2:
+            # 要約するほどの中間部分がない
+            return False
+
+        middle = self.messages[1:start]
+        summary = {"role": "user", "content": self._summarize(middle)}
+        self._summary = summary
+        self.messages[1:start] = [summary]
+        self._sizes[1:start] = [self._message_chars(summary)]
+        before = self._total_chars
+        self._total_chars = sum(self._sizes)
+        _log.debug("Compacted %d messages (%d -> %d chars)", len(middle), before, self._total_chars)
+        return True
+
+    @staticmethod
+    def _is_tool_result(message: dict) -> bool:
+        content = message["content"]
+        return (
+            isinstance(content, list)
+            and bool(content)
+            and isinstance(content[0], dict)
+            and content[0].get("type") == "tool_result"
+        )
+
+    def _summarize(self, messages: list[dict]) -> str:
+        """要約メッセージの本文（ユーザーの依頼、ツール呼び出しの回数、触ったファイル）
+
+        以前の要約が含まれていれば、ユーザーの依頼として入れ子にせず集計を合算する。
+        """
+        omitted = 0
+        requests: list[str] = []
+        tool_counts: Counter[str] = Counter()
+        files: dict[str, None] = {}  # 順序を保った集合
+        for message in messages:
+            if message is self._summary and self._summary_stats is not None:
+                prev_omitted, prev_counts, prev_files, prev_requests = self._summary_stats
+                omitted += prev_omitted
+                tool_counts.update(prev_counts)
+                files.update(prev_files)
+                requests.extend(prev_requests)
+                continue
+            omitted += 1
+            if not self._is_tool_result(message):
+                # ユーザーの依頼は要約しても失わないように本文を残す
+                if message["role"] == "user" and isinstance(message["content"], str):
+                    requests.append(message["content"])
+                continue
+            for item in message["content"]:
+                tool_counts[item.get("tool_name", "unknown")] += 1
+                path = item.get("tool_input", {}).get("path")
+                if path:
+                    files[str(path)] = None
+
+        self._summary_stats = (omitted, tool_counts, files, requests)
+        tools = ", ".join(f"{name} x{count}" for name, count in tool_counts.most_common())
+        return (
+            f"<summary of earlier turns: {omitted} messages omitted, "
+            f"{tool_counts.total()} tool calls ({tools or 'none'}), "
+            f"files touched: {', '.join(files) or 'none'}"
+            + "".join(f"\nuser request: {request}" for request in requests)
+            + ">"
+        )
+
+    @staticmethod
+    def _message_chars(message: dict) -> int:
+        """メッセージのおおよその文字数（トークン数の目安）"""
+        content = message.get("content")
+        if isinstance(content, str):
+            return len(content)
+        if isinstance(content, list):
+            total = 0
+            for item in content:
+                if isinstance(item, dict):
+                    total += len(str(item.get("content", "")))
+                else:
+                    # Gemini の TextBlock / ToolUseBlock
+                    total += len(getattr(item, "text", None) or str(getattr(item, "input", "")))
+            return total
+        return len(str(content))
 
     def clear(self) -> None:
         """履歴をクリア"""
         self.messages = []
-        print_history("Cleared message history")
+        self._sizes = []
+        self._total_chars = 0
+        self._summary = None
+        self._summary_stats = None
+        _log.debug("Cleared message history")
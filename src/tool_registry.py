@@ -1,17 +1,39 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
 from typing import Any
 
 from .tools.base import Tool
 
+_log = logging.getLogger(__name__)
+
 
 class ToolRegistry:
     """ツールの登録・検索・実行を管理するレジストリ
 
     エージェントが利用可能なツールを一元管理し、
     LLMからのツール呼び出しを適切なツール実装にディスパッチする。
+
+    cacheable なツール（read_file, list_files など）の結果は
+    (ツール名, 引数) をキーに LRU でキャッシュする。副作用がありうる
+    ツール（write_file, execute_command など）を実行するとキャッシュを破棄する。
     """
 
+    CACHE_SIZE = 128
+
     def __init__(self):
         self._tools: dict[str, Tool] = {}
+        # execute のディスパッチ用（ツール名 → バインド済みの tool.execute）
+        self._exec_table: dict[str, Callable[..., str]] = {}
+        self._cacheable: set[str] = set()
+        self._definitions: list[dict] | None = None  # register 時に破棄
+        self._cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._cache_lock = threading.Lock()  # aexecute で複数スレッドから使われる
+        # invalidate のたびに増やす。実行中に破棄された読み取り結果を保存しないため
+        self._generation = 0
 
     def register(self, tool: Tool) -> None:
         """ツールを登録
@@ -20,10 +42,16 @@ class ToolRegistry:
             tool: 登録するツールインスタンス
         """
         if tool.name in self._tools:
-            print(f"[REGISTRY] Warning: Overwriting existing tool: {tool.name}")
+            _log.warning("Overwriting existing tool: %s", tool.name)
 
         self._tools[tool.name] = tool
-        print(f"[REGISTRY] Registered tool: {tool.name}")
+        self._exec_table[tool.name] = tool.execute
+        if tool.cacheable:
+            self._cacheable.add(tool.name)
+        else:
+            self._cacheable.discard(tool.name)
+        self._definitions = None
+        _log.debug("Registered tool: %s", tool.name)
 
     def register_all(self, tools: list[Tool]) -> None:
         """複数のツールを一括登録
@@ -48,10 +76,15 @@ class ToolRegistry:
     def get_tool_definitions(self) -> list[dict]:
         """LLMに渡すツール定義リストを取得
 
+        登録後は変わらないため一度だけ生成し、以降は同じリストを返す
+        （呼び出し側は変更しないこと）。
+
         Returns:
             すべての登録済みツールの定義リスト
         """
-        return [tool.to_tool_definition() for tool in self._tools.values()]
+        if self._definitions is None:
+            self._definitions = [tool.to_tool_definition() for tool in self._tools.values()]
+        return self._definitions
 
     def execute(self, name: str, arguments: dict[str, Any]) -> str:
         """ツールを名前で検索して実行
@@ -63,18 +96,87 @@ class ToolRegistry:
         Returns:
             ツールの実行結果
         """
-        tool = self.get(name)
+        fn = self._exec_table.get(name)
 
-        if tool is None:
+        if fn is None:
             return f"Error: Unknown tool: {name}"
 
+        if name not in self._cacheable:
+            result = self._execute_tool(fn, name, arguments)
+            # ファイルを書き換えた可能性があるので、読み取り結果のキャッシュを破棄
+            self.invalidate()
+            return result
+
+        key = (name, json.dumps(arguments, sort_keys=True, default=str))
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            generation = self._generation
+
+        result = self._execute_tool(fn, name, arguments)
+        if not result.startswith("Error"):
+            with self._cache_lock:
+                # 実行中に別のツールがキャッシュを破棄していたら、古い内容かもしれないので保存しない
+                if generation != self._generation:
+                    return result
+                self._cache[key] = result
+                if len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _execute_tool(fn: Callable[..., str], name: str, arguments: dict[str, Any]) -> str:
         try:
-            return tool.execute(**arguments)
+            return fn(**arguments)
         except TypeError as e:
             return f"Error: Invalid arguments for {name}: {e}"
         except Exception as e:
             return f"Error executing {name}: {e}"
 
+    def invalidate(self, name: str | None = None) -> None:
+        """キャッシュしたツール結果を破棄
+
+        Args:
+            name: 破棄するツール名（省略時はすべて）
+        """
+        with self._cache_lock:
+            self._generation += 1
+            if name is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == name]:
+                    del self._cache[key]
+
+    async def aexecute(self, name: str, arguments: dict[str, Any]) -> str:
+        """ツールを非同期で実行
+
+        複数のツール呼び出しを asyncio.gather で並行実行するために使う。
+        ツール自身が aexecute を持っていればそれを await し、
+        なければ（またはキャッシュ対象なら）execute を別スレッドで実行する。
+
+        Args:
+            name: 実行するツールの名前
+            arguments: ツールに渡す引数
+
+        Returns:
+            ツールの実行結果
+        """
+        tool = self.get(name)
+        aexecute = getattr(tool, "aexecute", None)
+        if aexecute is None or tool.cacheable:
+            return await asyncio.to_thread(self.execute, name, arguments)
+
+        try:
+            result = await aexecute(**arguments)
+        except TypeError as e:
+            result = f"Error: Invalid arguments for {name}: {e}"
+        except Exception as e:
+            result = f"Error executing {name}: {e}"
+        # execute と同じく、副作用がありうるのでキャッシュを破棄
+        self.invalidate()
+        return result
+
     def list_tools(self) -> list[str]:
         """登録済みツール名のリストを取得
 
@@ -0,0 +1,87 @@
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+
+class FileCache:
+    """ファイル内容の LRU キャッシュ（ツール間で共有）
+
+    ToolRegistry の結果キャッシュは write_file や execute_command を実行するたびに
+    全部破棄されるが、こちらはファイルごとに (mtime, サイズ, inode) で変更を確認するので、
+    変更されていないファイルはその後もディスクから読み直さず、デコードもしない。
+    """
+
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes: int | None = None):
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        # 絶対パス -> ((mtime_ns, size, inode), 内容)
+        self._entries: OrderedDict[str, tuple[tuple[int, int, int], str]] = OrderedDict()
+        self._total = 0  # キャッシュしている内容のバイト数（ファイルサイズの合計）
+        self._lock = threading.Lock()  # aexecute で複数スレッドから使われる
+
+    @staticmethod
+    def _signature(st: os.stat_result) -> tuple[int, int, int]:
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def read(self, path: str) -> str:
+        """ファイルを UTF-8 で読む（前回から変更されていなければメモリから返す）
+
+        ファイルがない場合などは open と同じ例外（FileNotFoundError など）を送出する。
+        """
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        if stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(path)
+
+        signature = self._signature(st)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        with open(key, "rb") as f:
+            st = os.fstat(f.fileno())
+            text = f.read().decode("utf-8")
+        self._put(key, self._signature(st), text)
+        return text
+
+    def update(self, path: str, text: str) -> None:
+        """書き込んだ内容でキャッシュを更新（書き込み直後に呼ぶ）"""
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            self.invalidate(key)
+            return
+        self._put(key, self._signature(st), text)
+
+    def invalidate(self, path: str | None = None) -> None:
+        """指定したファイル（省略時はすべて）をキャッシュから破棄"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._total = 0
+                return
+            entry = self._entries.pop(os.path.abspath(path), None)
+            if entry is not None:
+                self._total -= entry[0][1]
+
+    def _put(self, key: str, signature: tuple[int, int, int], text: str) -> None:
+        size = signature[1]
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old[0][1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (signature, text)
+            self._total += size
+            while self._total > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._total -= evicted[1]
+
+
+file_cache = FileCache()
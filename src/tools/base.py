@@ -8,6 +8,10 @@ class Tool(ABC):
     LLMが利用できる形式でツール定義を提供する。
     """
 
+    # 同じ引数なら同じ結果を返し、副作用のないツールは True にする
+    # （ToolRegistry が結果をキャッシュする）
+    cacheable: bool = False
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -1,3 +1,4 @@
+import asyncio
 import subprocess
 
 from .base import Tool
@@ -65,23 +66,71 @@ class ExecuteCommandTool(Tool):
                 timeout=timeout,
             )
 
-            output_parts = []
+            return self._format_output(result.stdout, result.stderr, result.returncode)
 
-            if result.stdout:
-                output_parts.append(f"[stdout]\n{result.stdout}")
+        except subprocess.TimeoutExpired:
+            return f"Error: Command timed out after {timeout} seconds"
+        except Exception as e:
+            return f"Error executing command: {e}"
 
-            if result.stderr:
-                output_parts.append(f"[stderr]\n{result.stderr}")
+    async def aexecute(self, command: str, timeout: int | None = None, **kwargs) -> str:
+        """コマンドを非同期で実行
 
-            if result.returncode != 0:
-                output_parts.append(f"[exit code: {result.returncode}]")
+        待っている間もイベントループを止めないので、他のツール呼び出しや
+        複数の execute_command を並行して進められる。
 
-            if not output_parts:
-                return "[Command completed with no output]"
+        Args:
+            command: 実行するシェルコマンド
+            timeout: タイムアウト秒数
 
-            return "\n".join(output_parts)
+        Returns:
+            コマンドの出力（stdout + stderr）、またはエラーメッセージ
+        """
+        timeout = timeout or self.DEFAULT_TIMEOUT
+
+        try:
+            proc = await asyncio.create_subprocess_shell(
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                return f"Error: Command timed out after {timeout} seconds"
+            except asyncio.CancelledError:
+                # エージェントが取り消した場合も、コマンドを実行したまま残さない
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+
+            return self._format_output(
+                stdout.decode(errors="replace"),
+                stderr.decode(errors="replace"),
+                proc.returncode,
+            )
 
-        except subprocess.TimeoutExpired:
-            return f"Error: Command timed out after {timeout} seconds"
         except Exception as e:
             return f"Error executing command: {e}"
+
+    @staticmethod
+    def _format_output(stdout: str, stderr: str, returncode: int) -> str:
+        """stdout / stderr / 終了コードを1つの文字列にまとめる"""
+        output_parts = []
+
+        if stdout:
+            output_parts.append(f"[stdout]\n{stdout}")
+
+        if stderr:
+            output_parts.append(f"[stderr]\n{stderr}")
+
+        if returncode != 0:
+            output_parts.append(f"[exit code: {returncode}]")
+
+        if not output_parts:
+            return "[Command completed with no output]"
+
+        return "\n".join(output_parts)
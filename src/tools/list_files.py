@@ -1,7 +1,17 @@
+import fnmatch
+import heapq
+import os
+import re
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
 from .base import Tool
 
+# ファイル名がパターンに一致するか（コンパイル済み正規表現の match）
+_Match = Callable[[str], object]
+
 
 class ListFilesTool(Tool):
     """ディレクトリ内のファイル一覧を取得するツール
@@ -10,6 +20,17 @@ class ListFilesTool(Tool):
     Claude CodeのGlobツールに相当。
     """
 
+    cacheable = True
+
+    # これより多い場合は走査を打ち切る（巨大なツリーを全部たどらない）
+    MAX_ENTRIES = 1000
+    # 出力の文字数の上限（長い名前が多いツリーで結果が巨大にならないように）
+    MAX_CHARS = 100_000
+    # 再帰的な一覧で、トップレベルのサブディレクトリを並列に走査するスレッド数
+    MAX_WORKERS = 8
+    # 再帰的な一覧で中までたどらないディレクトリ（巨大で、ソースコードを含まないもの）
+    SKIP_DIRS = frozenset({".git", "node_modules", "__pycache__", ".venv"})
+
     @property
     def name(self) -> str:
         return "list_files"
@@ -18,7 +39,9 @@ class ListFilesTool(Tool):
     def description(self) -> str:
         return (
             "List files and directories in the specified directory. "
-            "Returns a tree-like structure showing the contents."
+            "Returns a tree-like structure showing the contents. "
+            "Use pattern (e.g. '*.py') to list only matching files; "
+            "directories are always shown."
         )
 
     @property
@@ -35,16 +58,27 @@ class ListFilesTool(Tool):
                     "description": "Whether to list files recursively (default: False)",
                     "default": False,
                 },
+                "pattern": {
+                    "type": "string",
+                    "description": "Glob pattern for file names, e.g. '*.py' (default: all files)",
+                },
             },
             "required": ["path"],
         }
 
-    def execute(self, path: str, recursive: bool = False, **kwargs) -> str:
+    def execute(
+        self,
+        path: str,
+        recursive: bool = False,
+        pattern: str | None = None,
+        **kwargs,
+    ) -> str:
         """ディレクトリ内のファイル一覧を取得
 
         Args:
             path: 一覧を取得するディレクトリのパス
             recursive: 再帰的に取得するかどうか
+            pattern: ファイル名のグロブパターン（ディレクトリは常に表示する）
 
         Returns:
             ファイル一覧、またはエラーメッセージ
@@ -58,10 +92,26 @@ class ListFilesTool(Tool):
             if not dir_path.is_dir():
                 return f"Error: Path is not a directory: {path}"
 
+            # fnmatch.filter と同じく、パターンは一度だけ正規表現にコンパイルする
+            match = re.compile(fnmatch.translate(pattern)).match if pattern else None
             if recursive:
-                items = self._list_recursive(dir_path, prefix="")
+                lines = self._list_tree(path, match)
             else:
-                items = self._list_flat(dir_path)
+                lines = self._list_flat(path, match)
+
+            # 行は必要な分だけ生成し、上限に達したら残りは走査しない
+            items = []
+            chars = 0
+            for line in lines:
+                if len(items) == self.MAX_ENTRIES:
+                    items.append(f"... (truncated: more than {self.MAX_ENTRIES} entries)")
+                    break
+                chars += len(line) + 1
+                if chars > self.MAX_CHARS:
+                    items.append(f"... (truncated: more than {self.MAX_CHARS} characters)")
+                    break
+                items.append(line)
+            lines.close()
 
             if not items:
                 return f"Directory is empty: {path}"
@@ -73,32 +123,127 @@ class ListFilesTool(Tool):
         except Exception as e:
             return f"Error listing directory: {e}"
 
-    def _list_flat(self, dir_path: Path) -> list[str]:
-        """フラットなファイル一覧を取得"""
-        items = []
-        for item in sorted(dir_path.iterdir()):
-            if item.is_dir():
-                items.append(f"{item.name}/")
+    @staticmethod
+    def _scan(dir_path: str, match: _Match | None) -> Iterator[os.DirEntry]:
+        """ディレクトリのエントリを生成（match があれば、一致するファイルとディレクトリだけ）
+
+        Path.iterdir と違い Path オブジェクトを作らず、DirEntry.is_dir() も
+        多くの場合 stat を呼ばずにディレクトリエントリの型情報から判定できる。
+        """
+        with os.scandir(dir_path) as entries:
+            if match is None:
+                yield from entries
             else:
-                items.append(item.name)
-        return items
+                for entry in entries:
+                    if entry.is_dir() or match(entry.name):
+                        yield entry
+
+    def _sorted_entries(self, dir_path: str, match: _Match | None) -> list[os.DirEntry]:
+        """ディレクトリのエントリを名前順で取得"""
+        return sorted(self._scan(dir_path, match), key=lambda entry: entry.name)
+
+    def _skip_note(self, entry: os.DirEntry) -> str | None:
+        """再帰的な一覧でたどらないディレクトリなら、その注記を返す
+
+        シンボリックリンクのディレクトリはたどらない（同じツリーを二重に走査したり、
+        リンクの循環で走査が終わらなくなったりしないように）。
+        """
+        if entry.is_symlink():
+            return " (symlink, not followed)"
+        if entry.name in self.SKIP_DIRS:
+            return " (skipped)"
+        return None
 
-    def _list_recursive(self, dir_path: Path, prefix: str) -> list[str]:
-        """再帰的なファイル一覧を取得（ツリー表示）"""
-        items = []
-        children = sorted(dir_path.iterdir())
+    def _list_flat(self, dir_path: str, match: _Match | None) -> Iterator[str]:
+        """フラットなファイル一覧を1行ずつ生成
 
-        for i, item in enumerate(children):
-            is_last = i == len(children) - 1
+        出力は MAX_ENTRIES 件で打ち切られるので、巨大なディレクトリでも全エントリを
+        ソートせず、名前順で先頭の MAX_ENTRIES + 1 件だけをヒープで取り出す。
+        """
+        head = heapq.nsmallest(
+            self.MAX_ENTRIES + 1, self._scan(dir_path, match), key=lambda entry: entry.name
+        )
+        for entry in head:
+            yield f"{entry.name}/" if entry.is_dir() else entry.name
+
+    def _list_tree(self, dir_path: str, match: _Match | None) -> Iterator[str]:
+        """再帰的なファイル一覧を1行ずつ生成（ツリー表示）
+
+        ディレクトリの走査は I/O 待ちが主なので、トップレベルの各サブディレクトリを
+        スレッドプールで並列に走査し、結果を名前順につなげる。
+        途中で打ち切られた場合、まだ始まっていない走査は取り消す。
+        """
+        children = self._sorted_entries(dir_path, match)
+        subdirs = [
+            i for i, entry in enumerate(children)
+            if entry.is_dir() and self._skip_note(entry) is None
+        ]
+
+        subtrees = {}
+        pool = None
+        if subdirs:
+            pool = ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(subdirs)))
+            for i in subdirs:
+                extension = "    " if i == len(children) - 1 else "│   "
+                subtrees[i] = pool.submit(self._subtree, children[i].path, extension, match)
+
+        try:
+            for i, entry in enumerate(children):
+                connector = "└── " if i == len(children) - 1 else "├── "
+                if i in subtrees:
+                    yield f"{connector}{entry.name}/"
+                    yield from subtrees[i].result()
+                elif entry.is_dir():
+                    yield f"{connector}{entry.name}/{self._skip_note(entry)}"
+                else:
+                    yield f"{connector}{entry.name}"
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def _subtree(self, dir_path: str, prefix: str, match: _Match | None) -> list[str]:
+        # 別スレッドで実行するので、出力に必要な最大件数までをリストにして返す
+        return list(islice(self._list_recursive(dir_path, prefix, match), self.MAX_ENTRIES))
+
+    def _list_recursive(
+        self,
+        dir_path: str,
+        prefix: str,
+        match: _Match | None,
+    ) -> Iterator[str]:
+        """再帰的なファイル一覧を1行ずつ生成（ツリー表示）
+
+        深いツリーでも Python の再帰呼び出しにならないよう、
+        まだ出力していないエントリをスタックに積んで深さ優先でたどる。
+        """
+        stack: list[tuple[os.DirEntry, str, bool]] = []
+        self._push_children(stack, dir_path, prefix, match)
+
+        while stack:
+            entry, prefix, is_last = stack.pop()
             connector = "└── " if is_last else "├── "
-            extension = "    " if is_last else "│   "
 
-            if item.is_dir():
-                items.append(f"{prefix}{connector}{item.name}/")
-                items.extend(
-                    self._list_recursive(item, prefix + extension)
-                )
+            if entry.is_dir():
+                note = self._skip_note(entry)
+                if note is not None:
+                    yield f"{prefix}{connector}{entry.name}/{note}"
+                    continue
+                yield f"{prefix}{connector}{entry.name}/"
+                extension = "    " if is_last else "│   "
+                self._push_children(stack, entry.path, prefix + extension, match)
             else:
-                items.append(f"{prefix}{connector}{item.name}")
-
-        return items
+                yield f"{prefix}{connector}{entry.name}"
+
+    def _push_children(
+        self,
+        stack: list[tuple[os.DirEntry, str, bool]],
+        dir_path: str,
+        prefix: str,
+        match: _Match | None,
+    ) -> None:
+        """ディレクトリの子を (エントリ, 接頭辞, 最後の子か) としてスタックに積む"""
+        children = self._sorted_entries(dir_path, match)
+        last = len(children) - 1
+        # 名前順に取り出せるよう逆順に積む
+        for i in range(last, -1, -1):
+            stack.append((children[i], prefix, i == last))
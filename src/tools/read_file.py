@@ -1,5 +1,4 @@
-from pathlib import Path
-
+from ._cache import file_cache
 from .base import Tool
 
 
@@ -10,6 +9,8 @@ class ReadFileTool(Tool):
     Claude CodeのReadツールに相当。
     """
 
+    cacheable = True
+
     @property
     def name(self) -> str:
         return "read_file"
@@ -43,18 +44,14 @@ class ReadFileTool(Tool):
         Returns:
             ファイルの内容、またはエラーメッセージ
         """
+        # 存在確認は事前にせず例外で判定する（変更されていないファイルはメモリから返す）
         try:
-            file_path = Path(path)
-
-            if not file_path.exists():
-                return f"Error: File not found: {path}"
-
-            if not file_path.is_file():
-                return f"Error: Path is not a file: {path}"
-
-            content = file_path.read_text(encoding="utf-8")
-            return content
+            return file_cache.read(path)
 
+        except FileNotFoundError:
+            return f"Error: File not found: {path}"
+        except IsADirectoryError:
+            return f"Error: Path is not a file: {path}"
         except PermissionError:
             return f"Error: Permission denied: {path}"
         except Exception as e:
@@ -1,7 +1,14 @@
+import os
+import tempfile
 from pathlib import Path
 
+from ._cache import file_cache
 from .base import Tool
 
+# 新規ファイルのパーミッション用（スレッドから os.umask を呼ばないよう読み込み時に取得）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 class WriteFileTool(Tool):
     """ファイルに書き込むツール
@@ -50,15 +57,45 @@ class WriteFileTool(Tool):
             成功メッセージ、またはエラーメッセージ
         """
         try:
-            file_path = Path(path)
+            # シンボリックリンクの場合はリンク先を書き換える
+            file_path = Path(os.path.realpath(path))
 
             # 親ディレクトリが存在しない場合は作成
             file_path.parent.mkdir(parents=True, exist_ok=True)
 
-            file_path.write_text(content, encoding="utf-8")
+            self._write_atomic(file_path, content.encode("utf-8"))
+            # 直後に read_file されてもディスクから読み直さない
+            file_cache.update(str(file_path), content)
             return f"Successfully wrote to {path}"
 
         except PermissionError:
             return f"Error: Permission denied: {path}"
         except Exception as e:
             return f"Error writing file: {e}"
+
+    @staticmethod
+    def _write_atomic(file_path: Path, data: bytes) -> None:
+        """同じディレクトリの一時ファイルに書いてから置き換える
+
+        直接上書きすると、書き込み途中で落ちたときに中身が切り詰められたファイルが残る。
+        rename（os.replace）はアトミックなので、古い内容か新しい内容のどちらかになる。
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=".write.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp は 0600 で作るので、既存ファイルのパーミッション（新規なら umask）に合わせる
+            try:
+                mode = os.stat(file_path).st_mode & 0o7777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise